@@ -0,0 +1,201 @@
+"""
+Admin Broadcast Service - push channel for admin dashboards
+Violations and session status published from the proctoring path are
+coalesced per exam and sent to subscribed admin sockets as one delta per tick,
+instead of every insert fanning out to every admin browser.
+"""
+import asyncio
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN_EXAM = "unknown"
+# details keys the admin views render; the rest (e.g. snapshots) stay in the database
+BROADCAST_DETAIL_KEYS = ('message', 'student_name', 'session_id', 'subject_code', 'subject_name')
+
+
+class _ExamDelta:
+    """Everything that happened to one exam since the last tick"""
+
+    __slots__ = ('violations', 'dropped', 'by_type', 'sessions')
+
+    def __init__(self):
+        self.violations: List[Dict] = []
+        self.dropped = 0
+        self.by_type: Counter = Counter()
+        self.sessions: Dict[str, Dict] = {}
+
+    def to_dict(self) -> Dict:
+        return {
+            'violations': self.violations,
+            'new_violations': len(self.violations) + self.dropped,
+            'dropped_violations': self.dropped,
+            'violations_by_type': dict(self.by_type),
+            'sessions': self.sessions,
+        }
+
+
+class _Subscriber:
+    __slots__ = ('websocket', 'exam_ids')
+
+    def __init__(self, websocket: WebSocket, exam_ids: Optional[Set[str]]):
+        self.websocket = websocket
+        self.exam_ids = exam_ids  # None = every exam
+
+    def wants(self, exam_id: str) -> bool:
+        return self.exam_ids is None or exam_id in self.exam_ids
+
+
+class AdminBroadcaster:
+    """Coalesces per-exam updates and flushes them to admin sockets at a fixed tick"""
+
+    SEND_TIMEOUT_SEC = 5.0
+
+    def __init__(self, tick_sec: float = 1.0, max_violations_per_tick: int = 50):
+        self.tick_sec = tick_sec
+        self.max_violations_per_tick = max_violations_per_tick
+        self._pending: Dict[str, _ExamDelta] = {}
+        self._sessions: Dict[str, Dict] = {}  # latest status per live session
+        self._lock = threading.Lock()  # publishers may run off the event loop
+        self._subscribers: List[_Subscriber] = []
+        self._task: Optional[asyncio.Task] = None
+        self.ticks = 0
+        self.messages_sent = 0
+
+    # --- publishing (called from the proctoring path) ---
+    def publish_violation(self, record: Dict):
+        details = record.get('details') or {}
+        violation = {
+            'id': record.get('id'),
+            'exam_id': record.get('exam_id'),
+            'student_id': record.get('student_id'),
+            'violation_type': record.get('violation_type'),
+            'severity': record.get('severity'),
+            'timestamp': record.get('timestamp'),
+            'image_url': record.get('image_url'),
+            'details': {k: details.get(k) for k in BROADCAST_DETAIL_KEYS if details.get(k) is not None},
+        }
+        with self._lock:
+            delta = self._pending.setdefault(record.get('exam_id') or UNKNOWN_EXAM, _ExamDelta())
+            delta.by_type[violation['violation_type']] += 1
+            if len(delta.violations) < self.max_violations_per_tick:
+                delta.violations.append(violation)
+            else:
+                delta.dropped += 1
+
+    def publish_session(self, session_id: str, exam_id: Optional[str], status: str, **fields):
+        """Record the latest status of a proctoring session; only the last one per tick is sent"""
+        exam_key = exam_id or UNKNOWN_EXAM
+        with self._lock:
+            # merge so student details sent on connect stay attached to later updates
+            state = {
+                **self._sessions.get(session_id, {}),
+                'session_id': session_id,
+                'exam_id': exam_id,
+                'status': status,
+                'updated_at': datetime.utcnow().isoformat(),
+                **fields,
+            }
+            if status == 'disconnected':
+                self._sessions.pop(session_id, None)
+            else:
+                self._sessions[session_id] = state
+            self._pending.setdefault(exam_key, _ExamDelta()).sessions[session_id] = state
+
+    # --- subscriptions ---
+    async def connect(self, websocket: WebSocket, exam_ids: Optional[Iterable[str]] = None) -> _Subscriber:
+        subscriber = _Subscriber(websocket, set(exam_ids) if exam_ids else None)
+        self._subscribers.append(subscriber)
+        await self.send_snapshot(subscriber)
+        return subscriber
+
+    def disconnect(self, subscriber: _Subscriber):
+        if subscriber in self._subscribers:
+            self._subscribers.remove(subscriber)
+
+    def subscribe(self, subscriber: _Subscriber, exam_ids: Optional[Iterable[str]]):
+        """Replace the exam filter; None or empty subscribes to every exam"""
+        subscriber.exam_ids = set(exam_ids) if exam_ids else None
+
+    def active_sessions(self, subscriber: Optional[_Subscriber] = None) -> List[Dict]:
+        with self._lock:
+            sessions = list(self._sessions.values())
+        if subscriber is None:
+            return sessions
+        return [s for s in sessions if subscriber.wants(s.get('exam_id') or UNKNOWN_EXAM)]
+
+    async def send_snapshot(self, subscriber: _Subscriber):
+        await subscriber.websocket.send_json({
+            'type': 'snapshot',
+            'data': {
+                'exam_ids': sorted(subscriber.exam_ids) if subscriber.exam_ids is not None else None,
+                'sessions': self.active_sessions(subscriber),
+                'tick_sec': self.tick_sec,
+                'timestamp': datetime.utcnow().isoformat(),
+            }
+        })
+
+    # --- ticking ---
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.tick_sec)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"❌ Admin broadcast tick failed: {e}")
+
+    async def flush(self):
+        """Send one coalesced delta per subscriber covering only the exams it follows"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        self.ticks += 1
+        if not pending or not self._subscribers:
+            return
+        exams = {exam_id: delta.to_dict() for exam_id, delta in pending.items()}
+        timestamp = datetime.utcnow().isoformat()
+        sends = []
+        for subscriber in list(self._subscribers):
+            visible = {k: v for k, v in exams.items() if subscriber.wants(k)}
+            if visible:
+                sends.append(self._send(subscriber, {
+                    'type': 'delta',
+                    'data': {'tick': self.ticks, 'timestamp': timestamp, 'exams': visible}
+                }))
+        # send concurrently so one slow admin browser does not hold up the others
+        await asyncio.gather(*sends)
+
+    async def _send(self, subscriber: _Subscriber, message: Dict):
+        try:
+            await asyncio.wait_for(subscriber.websocket.send_json(message), timeout=self.SEND_TIMEOUT_SEC)
+            self.messages_sent += 1
+        except Exception as e:
+            logger.warning(f"Dropping admin subscriber after send failure: {e!r}")
+            self.disconnect(subscriber)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            pending_exams = len(self._pending)
+            live_sessions = len(self._sessions)
+        return {
+            'subscribers': len(self._subscribers),
+            'pending_exams': pending_exams,
+            'live_sessions': live_sessions,
+            'ticks': self.ticks,
+            'messages_sent': self.messages_sent,
+            'tick_sec': self.tick_sec,
+        }
@@ -0,0 +1,172 @@
+"""
+Analytics Service - server-side exam analytics aggregation
+Computes the totals, violation breakdowns, top violators and score statistics
+shown on ExamAnalytics.tsx. Rows are streamed page by page with only the
+columns needed, and the aggregates are cached per filter set for a short TTL.
+"""
+from collections import Counter
+from typing import Dict, List, Optional
+import logging
+
+import numpy as np
+
+from db_paging import chunked, iter_rows
+from ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+SCORE_BUCKETS = [(0, 20, '0-20%'), (20, 40, '20-40%'), (40, 60, '40-60%'), (60, 80, '60-80%'), (80, 101, '80-100%')]
+
+
+class AnalyticsService:
+    """Aggregates exams, violations and answers into dashboard summary rows"""
+
+    CACHE_TTL_SEC = 10.0
+
+    def __init__(self, supabase):
+        self.supabase = supabase
+        self.cache = TTLCache(ttl_sec=self.CACHE_TTL_SEC, max_entries=128)
+
+    @staticmethod
+    def _filter_key(exam_template_id: Optional[str], start: Optional[str], end: Optional[str]):
+        return (exam_template_id or None, start or None, end or None)
+
+    def aggregate(self, exam_template_id: Optional[str] = None, start: Optional[str] = None,
+                  end: Optional[str] = None) -> Dict:
+        """All aggregates for one filter set, cached for CACHE_TTL_SEC"""
+        key = self._filter_key(exam_template_id, start, end)
+        return self.cache.get_or_compute(key, lambda: self._compute(*key))
+
+    # --- loading ---
+    def _load_exams(self, exam_template_id, start, end) -> List[Dict]:
+        def build():
+            query = self.supabase.table('exams').select('id, student_id, status, exam_template_id')
+            if exam_template_id:
+                query = query.eq('exam_template_id', exam_template_id)
+            if start:
+                query = query.gte('created_at', start)
+            if end:
+                query = query.lte('created_at', end)
+            return query.order('id')
+        return list(iter_rows(build))
+
+    def _iter_scoped(self, table: str, columns: str, exam_ids: Optional[List[str]], time_column: Optional[str],
+                     start: Optional[str], end: Optional[str]):
+        """Stream rows of `table`, scoped to exam_ids when given and to the time range"""
+        def build_for(ids):
+            def build():
+                query = self.supabase.table(table).select(columns)
+                if ids is not None:
+                    query = query.in_('exam_id', list(ids))
+                if time_column and start:
+                    query = query.gte(time_column, start)
+                if time_column and end:
+                    query = query.lte(time_column, end)
+                return query.order('id')
+            return build
+
+        if exam_ids is None:
+            yield from iter_rows(build_for(None))
+            return
+        for ids in chunked(exam_ids):
+            yield from iter_rows(build_for(ids))
+
+    def _load_answer_key(self, template_ids: List[str]) -> Dict:
+        key = {}
+        for ids in chunked(template_ids):
+            def build(ids=ids):
+                return (self.supabase.table('exam_questions')
+                        .select('id, exam_template_id, question_number, correct_answer, question_type')
+                        .in_('exam_template_id', list(ids))
+                        .order('id'))
+            for q in iter_rows(build):
+                if q.get('question_type') == 'mcq':
+                    key[(q['exam_template_id'], q['question_number'])] = (q.get('correct_answer') or '').strip()
+        return key
+
+    # --- aggregation ---
+    def _compute(self, exam_template_id, start, end) -> Dict:
+        exams = self._load_exams(exam_template_id, start, end)
+        exam_template = {e['id']: e.get('exam_template_id') for e in exams}
+        # Scope child tables to the filtered exam set; only the unfiltered view reads them whole
+        scope_ids = list(exam_template) if (exam_template_id or start or end) else None
+
+        violations_by_type: Counter = Counter()
+        violations_by_severity: Counter = Counter()
+        violations_by_student: Counter = Counter()
+        total_violations = 0
+        for v in self._iter_scoped('violations', 'id, student_id, violation_type, severity',
+                                   scope_ids, 'timestamp', start, end):
+            total_violations += 1
+            violations_by_type[v.get('violation_type')] += 1
+            violations_by_severity[v.get('severity')] += 1
+            if v.get('student_id'):
+                violations_by_student[v['student_id']] += 1
+
+        # MCQ scoring matches the browser calculation: correct / answered MCQ questions
+        template_ids = sorted({t for t in exam_template.values() if t})
+        answer_key = self._load_answer_key(template_ids) if template_ids else {}
+        correct = Counter()
+        answered = Counter()
+        if answer_key:
+            for a in self._iter_scoped('exam_answers', 'id, exam_id, question_number, answer',
+                                       scope_ids, None, None, None):
+                template_id = exam_template.get(a.get('exam_id'))
+                expected = answer_key.get((template_id, a.get('question_number')))
+                if expected is None:
+                    continue
+                answered[a['exam_id']] += 1
+                if (a.get('answer') or '').strip() == expected:
+                    correct[a['exam_id']] += 1
+
+        scores = np.array([round(correct[e] / answered[e] * 100) for e in answered], dtype=np.float64)
+        top_violators = self._top_violators(violations_by_student, limit=20)
+
+        return {
+            'filters': {'exam_template_id': exam_template_id, 'start': start, 'end': end},
+            'total_students': len({e.get('student_id') for e in exams if e.get('student_id')}),
+            'total_exams': len(exams),
+            'completed_exams': sum(1 for e in exams if e.get('status') == 'completed'),
+            'total_violations': total_violations,
+            'violations_by_type': [
+                {'type': t, 'count': c} for t, c in violations_by_type.most_common()
+            ],
+            'violations_by_severity': [
+                {'severity': s, 'count': c} for s, c in violations_by_severity.most_common()
+            ],
+            'top_violators': top_violators,
+            'scores': {
+                'scored_exams': int(scores.size),
+                'avg_score': int(round(scores.mean())) if scores.size else 0,
+                'median_score': float(np.median(scores)) if scores.size else None,
+                'min_score': float(scores.min()) if scores.size else None,
+                'max_score': float(scores.max()) if scores.size else None,
+                'std_score': float(scores.std()) if scores.size else None,
+                'distribution': [
+                    {'range': label, 'count': int(((scores >= lo) & (scores < hi)).sum())}
+                    for lo, hi, label in SCORE_BUCKETS
+                ],
+            },
+        }
+
+    def _top_violators(self, violations_by_student: Counter, limit: int) -> List[Dict]:
+        top = violations_by_student.most_common(limit)
+        if not top:
+            return []
+        students = {}
+        try:
+            rows = (self.supabase.table('students').select('id, student_id, name, email')
+                    .in_('id', [student_id for student_id, _ in top]).execute().data or [])
+            students = {s['id']: s for s in rows}
+        except Exception as e:
+            logger.warning(f"Top violator name lookup failed: {e}")
+        return [
+            {
+                'student_id': student_id,
+                'name': students.get(student_id, {}).get('name', 'Unknown Student'),
+                'roll_number': students.get(student_id, {}).get('student_id'),
+                'email': students.get(student_id, {}).get('email'),
+                'violations': count,
+            }
+            for student_id, count in top
+        ]
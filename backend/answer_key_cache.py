@@ -0,0 +1,57 @@
+"""
+Answer Key Cache - read-through cache of compiled answer keys for grading
+Keeps the compiled key per exam_template_id and the exam -> template lookup in
+memory so a cohort submitting at the deadline does not refetch the same key.
+"""
+import logging
+from typing import Dict, Optional
+
+from grading_service import CompiledAnswerKey, grading_service
+from ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class AnswerKeyCache:
+    """Compiled answer keys per template plus exam -> template ids, both TTL bound"""
+
+    def __init__(self, supabase, key_ttl_sec: float = 600.0, exam_ttl_sec: float = 3600.0):
+        self.supabase = supabase
+        self.keys = TTLCache(ttl_sec=key_ttl_sec, max_entries=256)
+        # an exam's template never changes once the exam row exists
+        self.exam_templates = TTLCache(ttl_sec=exam_ttl_sec, max_entries=10000)
+
+    def template_for_exam(self, exam_id: str) -> str:
+        hit, template_id = self.exam_templates.get(exam_id)
+        if hit:
+            return template_id
+        exam_response = self.supabase.table('exams').select('exam_template_id').eq('id', exam_id).single().execute()
+        template_id = exam_response.data['exam_template_id']
+        if template_id:
+            self.exam_templates.set(exam_id, template_id)
+        return template_id
+
+    def answer_key(self, exam_template_id: str) -> CompiledAnswerKey:
+        hit, key = self.keys.get(exam_template_id)
+        if hit:
+            return key
+        questions = (self.supabase.table('exam_questions')
+                     .select('question_number, correct_answer, points')
+                     .eq('exam_template_id', exam_template_id)
+                     .execute().data or [])
+        key = grading_service.compile_answer_key(questions)
+        # an empty key usually means the questions are still being uploaded; don't pin it
+        if len(key):
+            self.keys.set(exam_template_id, key)
+        logger.info(f"🔑 Answer key compiled for template {exam_template_id}: {len(key)} questions")
+        return key
+
+    def invalidate(self, exam_template_id: Optional[str] = None) -> int:
+        """Drop one template's key, or every key when no template is given"""
+        if exam_template_id:
+            return self.keys.invalidate(exam_template_id)
+        self.exam_templates.invalidate()
+        return self.keys.invalidate()
+
+    def stats(self) -> Dict:
+        return {'answer_keys': self.keys.stats(), 'exam_templates': self.exam_templates.stats()}
@@ -0,0 +1,274 @@
+"""
+Audio Window Service - per-session noise episodes from the audio level stream
+Each session keeps a rolling window of recent levels (mean, peak, seconds above
+threshold). A level at or above the threshold opens a noise episode; it closes
+once the room has been quiet for hangover_sec, or after max_episode_sec, and
+becomes one excessive_noise incident with its start, end, peak and mean.
+Incident rows wait in a queue and are written in batches; a row the database
+rejects is dropped rather than blocking the queue. The audio_level echo
+to the student is sent at most every echo_interval_sec unless the level moves
+by echo_min_delta or crosses the threshold.
+"""
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+# (minimum level, severity, message) checked from the top
+SEVERITY_LEVELS = ((70, 'high', 'Very loud background noise'),
+                   (55, 'medium', 'Loud background noise'),
+                   (0, 'low', 'Moderate background noise'))
+
+
+def noise_severity(level: float) -> Tuple[str, str]:
+    """(severity, message) for a noise level in percent"""
+    for minimum, severity, message in SEVERITY_LEVELS:
+        if level >= minimum:
+            return severity, message
+    return SEVERITY_LEVELS[-1][1:]
+
+
+class _Episode:
+    """One stretch of noise: first and last loud sample, level stats and the identity it belongs to"""
+
+    __slots__ = ('start', 'last_loud', 'peak', 'total', 'samples', 'loud_sec', 'context')
+
+    def __init__(self, now: float, level: float, context: Dict):
+        self.start = now
+        self.last_loud = now
+        self.peak = level
+        self.total = 0.0
+        self.samples = 0
+        self.loud_sec = 0.0
+        self.context = context
+
+    def add(self, now: float, level: float):
+        self.total += level
+        self.samples += 1
+        self.peak = max(self.peak, level)
+        self.last_loud = now
+
+    def to_incident(self, session_id: str, reason: str) -> Dict:
+        return {
+            'session_id': session_id,
+            'start': self.start,
+            'end': self.last_loud,
+            'duration_sec': round(self.last_loud - self.start, 2),
+            'loud_sec': round(self.loud_sec, 2),
+            'peak': round(self.peak, 1),
+            'mean': round(self.total / self.samples, 1) if self.samples else round(self.peak, 1),
+            'samples': self.samples,
+            'closed_by': reason,
+            **self.context,
+        }
+
+
+class _SessionWindow:
+    """Recent (time, level) samples of one session and its open episode, if any"""
+
+    __slots__ = ('samples', 'total', 'last_time', 'last_loud', 'episode',
+                 'last_echo_time', 'last_echo_level', 'last_echo_loud')
+
+    def __init__(self):
+        self.samples: deque = deque()
+        self.total = 0.0
+        self.last_time: Optional[float] = None
+        self.last_loud = False
+        self.episode: Optional[_Episode] = None
+        self.last_echo_time: Optional[float] = None
+        self.last_echo_level = 0.0
+        self.last_echo_loud = False
+
+
+class AudioWindowService:
+    """Turns audio level messages into rolling stats, debounced echoes and one incident per noise episode"""
+
+    def __init__(self, threshold: float = 40.0, window_sec: float = 10.0, hangover_sec: float = 5.0,
+                 max_episode_sec: float = 60.0, echo_interval_sec: float = 1.0, echo_min_delta: float = 10.0,
+                 max_pending: int = 5000):
+        self.threshold = threshold
+        self.window_sec = window_sec
+        self.hangover_sec = hangover_sec
+        self.max_episode_sec = max_episode_sec
+        self.echo_interval_sec = echo_interval_sec
+        self.echo_min_delta = echo_min_delta
+        self.max_pending = max_pending
+        self._sessions: Dict[str, _SessionWindow] = {}
+        self._pending: deque = deque()
+        self._attempts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.samples = 0
+        self.echoes = 0
+        self.episodes_opened = 0
+        self.incidents = 0
+        self.written = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    # --- samples (called from the proctoring socket) ---
+    def observe(self, session_id: str, level: float, context: Optional[Dict] = None,
+                now: Optional[float] = None) -> Dict:
+        """
+        Add one level sample. Returns the window stats, whether to echo the level,
+        whether this sample opened an episode and any incidents it closed.
+        """
+        now = time.time() if now is None else now
+        loud = level >= self.threshold
+        incidents = []
+        opened = False
+        with self._lock:
+            self.samples += 1
+            window = self._sessions.setdefault(session_id, _SessionWindow())
+            # each sample holds until the next one, capped so a stalled client is not counted as loud
+            held = min(now - window.last_time, self.hangover_sec) if window.last_time is not None else 0.0
+            episode = window.episode
+            if episode is not None:
+                if window.last_loud:
+                    episode.loud_sec += held
+                if now - episode.last_loud >= self.hangover_sec:
+                    incidents.append(self._close(session_id, window, 'quiet'))
+                elif loud and now - episode.start >= self.max_episode_sec:
+                    incidents.append(self._close(session_id, window, 'max_duration'))
+            if loud:
+                if window.episode is None:
+                    window.episode = _Episode(now, level, dict(context or {}))
+                    self.episodes_opened += 1
+                    opened = True
+                else:
+                    window.episode.context = dict(context or window.episode.context)
+                window.episode.add(now, level)
+
+            window.samples.append((now, level, held if window.last_loud else 0.0))
+            window.total += level
+            while window.samples and now - window.samples[0][0] > self.window_sec:
+                window.total -= window.samples.popleft()[1]
+            window.last_time = now
+            window.last_loud = loud
+
+            echo = (window.last_echo_time is None
+                    or now - window.last_echo_time >= self.echo_interval_sec
+                    or abs(level - window.last_echo_level) >= self.echo_min_delta
+                    or loud != window.last_echo_loud)
+            if echo:
+                window.last_echo_time = now
+                window.last_echo_level = level
+                window.last_echo_loud = loud
+                self.echoes += 1
+            stats = self._window_stats(window)
+        return {'window': stats, 'loud': loud, 'echo': echo, 'opened': opened, 'incidents': incidents}
+
+    def _window_stats(self, window: _SessionWindow) -> Dict:
+        count = len(window.samples)
+        return {
+            'mean': round(window.total / count, 1) if count else 0.0,
+            'peak': round(max(level for _, level, _ in window.samples), 1) if count else 0.0,
+            'above_sec': round(sum(held for _, _, held in window.samples), 2),
+            'samples': count,
+            'window_sec': self.window_sec,
+            'in_episode': window.episode is not None,
+        }
+
+    def _close(self, session_id: str, window: _SessionWindow, reason: str) -> Dict:
+        incident = window.episode.to_incident(session_id, reason)
+        window.episode = None
+        self.incidents += 1
+        return incident
+
+    def close_idle(self, now: Optional[float] = None) -> List[Dict]:
+        """Close episodes with no loud sample for hangover_sec, e.g. when the client stopped sending"""
+        now = time.time() if now is None else now
+        with self._lock:
+            return [
+                self._close(session_id, window, 'quiet')
+                for session_id, window in self._sessions.items()
+                if window.episode is not None and now - window.episode.last_loud >= self.hangover_sec
+            ]
+
+    def end_session(self, session_id: str) -> List[Dict]:
+        """Drop the session's window; an open episode is closed and returned"""
+        with self._lock:
+            window = self._sessions.pop(session_id, None)
+            if window is None or window.episode is None:
+                return []
+            return [self._close(session_id, window, 'disconnected')]
+
+    def close_all(self) -> List[Dict]:
+        with self._lock:
+            return [self._close(session_id, window, 'shutdown')
+                    for session_id, window in self._sessions.items() if window.episode is not None]
+
+    # --- write queue ---
+    def enqueue(self, records: List[Dict]):
+        """Queue violation rows for the next batch; the oldest are dropped past max_pending"""
+        with self._lock:
+            self._pending.extend(records)
+            while len(self._pending) > self.max_pending:
+                self._pending.popleft()
+                self.dropped += 1
+
+    def drain(self, limit: int = 500) -> List[Dict]:
+        with self._lock:
+            return [self._pending.popleft() for _ in range(min(limit, len(self._pending)))]
+
+    def requeue(self, records: List[Dict], max_attempts: Optional[int] = None) -> List[Dict]:
+        """
+        Put rows whose write failed back at the front of the queue. With max_attempts,
+        rows that have failed that many times are rejected instead and returned.
+        """
+        with self._lock:
+            given_up = []
+            if max_attempts is not None:
+                retry = []
+                for record in records:
+                    attempts = self._attempts.get(record.get('id'), 0) + 1
+                    if attempts >= max_attempts:
+                        given_up.append(record)
+                    else:
+                        self._attempts[record.get('id')] = attempts
+                        retry.append(record)
+                records = retry
+                self._reject(given_up)
+            self._pending.extendleft(reversed(records))
+            while len(self._pending) > self.max_pending:
+                self._attempts.pop(self._pending.pop().get('id'), None)
+                self.dropped += 1
+            return given_up
+
+    def reject(self, records: List[Dict]):
+        """Count rows the database would not accept; they are not retried"""
+        with self._lock:
+            self._reject(records)
+
+    def _reject(self, records: List[Dict]):
+        for record in records:
+            self._attempts.pop(record.get('id'), None)
+        self.rejected += len(records)
+
+    def mark_written(self, records: List[Dict]):
+        with self._lock:
+            for record in records:
+                self._attempts.pop(record.get('id'), None)
+            self.written += len(records)
+
+    def session_stats(self, session_id: str) -> Optional[Dict]:
+        with self._lock:
+            window = self._sessions.get(session_id)
+            return self._window_stats(window) if window else None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'open_episodes': sum(1 for w in self._sessions.values() if w.episode is not None),
+                'samples': self.samples,
+                'echoes': self.echoes,
+                'episodes_opened': self.episodes_opened,
+                'incidents': self.incidents,
+                'pending_writes': len(self._pending),
+                'written': self.written,
+                'dropped': self.dropped,
+                'rejected': self.rejected,
+                'threshold': self.threshold,
+                'hangover_sec': self.hangover_sec,
+                'max_episode_sec': self.max_episode_sec,
+            }
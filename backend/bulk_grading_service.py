@@ -0,0 +1,126 @@
+"""
+Bulk Grading Service - regrade a whole exam cohort in one pass
+Loads every exam and answer for a template, grades them as one NumPy answer
+matrix and writes the scores back with one update per distinct result.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+import logging
+import time
+
+import numpy as np
+
+from db_paging import chunked, iter_rows
+from grading_service import grading_service
+
+logger = logging.getLogger(__name__)
+
+
+class EmptyAnswerKeyError(ValueError):
+    """The template has no gradable questions (unknown id, or questions not uploaded yet)"""
+
+
+class BulkGradingService:
+    """Cohort regrading on top of the cached answer keys"""
+
+    def __init__(self, supabase, answer_key_cache):
+        self.supabase = supabase
+        self.answer_key_cache = answer_key_cache
+
+    def load_exams(self, exam_template_id: str, statuses: Optional[Sequence[str]]) -> List[Dict]:
+        def build():
+            query = (self.supabase.table('exams').select('id, student_id, status, completed_at')
+                     .eq('exam_template_id', exam_template_id))
+            if statuses:
+                query = query.in_('status', list(statuses))
+            return query.order('id')
+        return list(iter_rows(build))
+
+    def iter_answers(self, exam_ids: List[str]):
+        for ids in chunked(exam_ids):
+            yield from iter_rows(lambda ids=ids: (self.supabase.table('exam_answers')
+                                                  .select('id, exam_id, question_number, answer')
+                                                  .in_('exam_id', list(ids))
+                                                  .order('id')))
+
+    def _write_back(self, exam_ids: List[str], grades: Dict[str, np.ndarray], max_score: int) -> int:
+        """One update per (score, letter) pair and id chunk instead of one per exam"""
+        groups = defaultdict(list)
+        for exam_id, score, letter in zip(exam_ids, grades['total_scores'], grades['grade_letters']):
+            groups[(int(score), str(letter))].append(exam_id)
+        graded_at = datetime.utcnow().isoformat()
+        requests = 0
+        for (score, letter), ids in groups.items():
+            for id_chunk in chunked(ids):
+                self.supabase.table('exams').update({
+                    'total_score': score,
+                    'max_score': max_score,
+                    'graded': True,
+                    'graded_at': graded_at,
+                    'grade_letter': letter
+                }).in_('id', list(id_chunk)).execute()
+                requests += 1
+        return requests
+
+    def regrade(self, exam_template_id: str, statuses: Optional[Sequence[str]] = ('completed',),
+                dry_run: bool = False, include_results: bool = False) -> Dict:
+        started = time.perf_counter()
+        # always reload the key: a regrade usually follows an answer key fix
+        self.answer_key_cache.invalidate(exam_template_id)
+        key = self.answer_key_cache.answer_key(exam_template_id)
+        # grading against an empty key would write 0 / F to every exam, with no way back
+        if len(key) == 0 or key.max_score <= 0:
+            raise EmptyAnswerKeyError(f"Exam template {exam_template_id} has no answer key "
+                                      f"({len(key)} questions, max score {key.max_score})")
+        exams = self.load_exams(exam_template_id, statuses)
+        exam_ids = [e['id'] for e in exams]
+        loaded_at = time.perf_counter()
+
+        matrix = grading_service.build_answer_matrix(key, exam_ids, self.iter_answers(exam_ids))
+        grades = grading_service.grade_matrix(matrix, key.max_score)
+        graded_at = time.perf_counter()
+
+        update_requests = 0
+        if exam_ids and not dry_run:
+            update_requests = self._write_back(exam_ids, grades, key.max_score)
+        finished = time.perf_counter()
+
+        percentages = grades['percentages']
+        letters, letter_counts = np.unique(grades['grade_letters'], return_counts=True)
+        summary = {
+            'exam_template_id': exam_template_id,
+            'graded_exams': len(exam_ids),
+            'questions': len(key),
+            'max_score': key.max_score,
+            'dry_run': dry_run,
+            'update_requests': update_requests,
+            'avg_percentage': round(float(percentages.mean()), 2) if percentages.size else None,
+            'grade_distribution': {str(l): int(c) for l, c in zip(letters, letter_counts)},
+            'timings_ms': {
+                'load_exams': round((loaded_at - started) * 1000, 1),
+                # answers are streamed into the matrix, so their fetch is part of this step
+                'load_answers_and_grade': round((graded_at - loaded_at) * 1000, 1),
+                'write': round((finished - graded_at) * 1000, 1),
+            },
+        }
+        if include_results:
+            student_ids = [e.get('student_id') for e in exams]
+            summary['results'] = [
+                {
+                    'exam_id': exam_id,
+                    'student_id': student_id,
+                    'total_score': int(score),
+                    'percentage': float(pct),
+                    'grade_letter': str(letter),
+                    'correct_count': int(correct),
+                    'incorrect_count': int(incorrect),
+                    'unanswered_count': int(unanswered),
+                }
+                for exam_id, student_id, score, pct, letter, correct, incorrect, unanswered in zip(
+                    exam_ids, student_ids, grades['total_scores'], percentages, grades['grade_letters'],
+                    grades['correct_count'], grades['incorrect_count'], grades['unanswered_count'])
+            ]
+        logger.info(f"📝 Bulk graded {len(exam_ids)} exams for template {exam_template_id} "
+                    f"in {summary['timings_ms']['load_answers_and_grade']}ms ({update_requests} update requests)")
+        return summary
@@ -0,0 +1,70 @@
+"""
+Paged reads from Supabase tables
+PostgREST caps responses (1000 rows by default), so large reads have to be
+fetched in ranges. These helpers keep only one page in memory at a time.
+"""
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_PAGE_SIZE = 1000
+IN_FILTER_CHUNK = 200  # keep `in.(...)` lists well under URL length limits
+
+
+def iter_pages(build_query: Callable, page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[List[Dict]]:
+    """
+    Yield pages of rows. build_query() must return a fresh, stably ordered
+    query builder each time it is called (range() mutates the builder).
+    """
+    start = 0
+    while True:
+        rows = build_query().range(start, start + page_size - 1).execute().data or []
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        start += page_size
+
+
+def iter_rows(build_query: Callable, page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[Dict]:
+    for page in iter_pages(build_query, page_size):
+        yield from page
+
+
+def fetch_all(build_query: Callable, page_size: int = DEFAULT_PAGE_SIZE) -> List[Dict]:
+    return list(iter_rows(build_query, page_size))
+
+
+def iter_keyset_desc(build_query: Callable, sort_column: str, after: Optional[Tuple[str, str]] = None,
+                     page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[Dict]:
+    """
+    Yield rows in (sort_column, id) descending order, strictly after the
+    keyset `after` = (sort_value, id) when given. build_query() must return a
+    fresh, unordered builder. Every page is bounded by the last sort value read
+    (lte) and offset only past the rows already read at that value, so rows
+    inserted with a newer value cannot shift later pages; ties with the cursor
+    value are skipped client side.
+    """
+    bound = after[0] if after is not None else None
+    offset = 0  # rows at `bound` already read
+    while True:
+        query = build_query()
+        if bound is not None:
+            query = query.lte(sort_column, bound)
+        rows = (query.order(sort_column, desc=True).order('id', desc=True)
+                .range(offset, offset + page_size - 1).execute().data or [])
+        for row in rows:
+            if after is not None and row.get(sort_column) == after[0] and str(row.get('id')) >= after[1]:
+                continue
+            yield row
+        if len(rows) < page_size:
+            return
+        last = rows[-1].get(sort_column)
+        if last is None or last == bound:
+            offset += len(rows)
+        else:
+            bound = last
+            offset = sum(1 for row in rows if row.get(sort_column) == last)
+
+
+def chunked(values: Sequence, size: int = IN_FILTER_CHUNK) -> Iterator[Sequence]:
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
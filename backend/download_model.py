@@ -12,3 +12,11 @@ destination = "models/yolov8n.pt"
 print("Downloading YOLOv8n model...")
 urllib.request.urlretrieve(url, destination)
 print("YOLOv8n model downloaded and saved to models/yolov8n.pt")
+
+# OpenCV SFace face recognition model (face embeddings for identity verification)
+url = "https://github.com/opencv/opencv_zoo/raw/main/models/face_recognition_sface/face_recognition_sface_2021dec.onnx"
+destination = "models/face_recognition_sface_2021dec.onnx"
+
+print("Downloading SFace face recognition model...")
+urllib.request.urlretrieve(url, destination)
+print("SFace model downloaded and saved to models/face_recognition_sface_2021dec.onnx")
@@ -0,0 +1,206 @@
+"""
+Export Service - audit exports of violations and exam results
+Rows are read page by page and written out as they arrive: CSV is streamed
+directly, Parquet is written one row group per page to a temporary file.
+Columns are fixed per format version so exports can be compared over time.
+"""
+import csv
+import io
+import json
+import logging
+import tempfile
+from typing import Dict, Iterator, List, Optional
+
+from db_paging import chunked, iter_pages
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMAT_VERSION = 1
+EXPORT_PAGE_SIZE = 1000
+
+# details JSON keys written by the proctoring path, flattened to details_<key>;
+# anything else ends up in details_extra as JSON
+VIOLATION_DETAIL_KEYS = (
+    'message', 'confidence', 'session_id', 'student_name', 'student_id', 'subject_code', 'subject_name',
+    'pitch_offset', 'yaw_offset', 'duration', 'movement', 'change_count', 'audio_level', 'threshold',
+)
+VIOLATION_COLUMNS = (
+    ['id', 'exam_id', 'student_id', 'violation_type', 'severity', 'timestamp']
+    + [f'details_{key}' for key in VIOLATION_DETAIL_KEYS]
+    + ['details_extra']
+)
+SNAPSHOT_COLUMN = 'image_url'
+EXAM_COLUMNS = [
+    'id', 'student_id', 'student_name', 'student_email', 'subject_code', 'exam_template_id', 'status',
+    'started_at', 'completed_at', 'created_at', 'total_score', 'max_score', 'graded', 'graded_at', 'grade_letter',
+]
+EXAM_SOURCE_COLUMNS = ', '.join(c for c in EXAM_COLUMNS if not c.startswith('student_') or c == 'student_id')
+
+
+class ExportUnavailableError(RuntimeError):
+    """The requested export format needs an optional dependency that is not installed"""
+
+
+class ExportService:
+    """Builds paged row streams and encodes them as CSV or Parquet"""
+
+    def __init__(self, supabase):
+        self.supabase = supabase
+
+    # --- row sources ---
+    def _exam_ids_for_template(self, exam_template_id: str) -> List[str]:
+        ids = []
+        for page in iter_pages(lambda: self.supabase.table('exams').select('id')
+                               .eq('exam_template_id', exam_template_id).order('id')):
+            ids.extend(row['id'] for row in page)
+        return ids
+
+    def violation_pages(self, exam_id: Optional[str] = None, exam_template_id: Optional[str] = None,
+                        student_id: Optional[str] = None, since: Optional[str] = None,
+                        until: Optional[str] = None, include_snapshots: bool = False) -> Iterator[List[Dict]]:
+        """Yield pages of flattened violation rows"""
+        columns = 'id, exam_id, student_id, violation_type, severity, timestamp, details'
+        if include_snapshots:
+            columns += f', {SNAPSHOT_COLUMN}'
+
+        def build_for(exam_ids):
+            def build():
+                query = self.supabase.table('violations').select(columns)
+                if exam_ids is not None:
+                    query = query.in_('exam_id', list(exam_ids))
+                if student_id:
+                    query = query.eq('student_id', student_id)
+                if since:
+                    query = query.gte('timestamp', since)
+                if until:
+                    query = query.lte('timestamp', until)
+                return query.order('timestamp').order('id')
+            return build
+
+        if exam_template_id:
+            scopes = list(chunked(self._exam_ids_for_template(exam_template_id)))
+        else:
+            scopes = [[exam_id] if exam_id else None]
+        for exam_ids in scopes:
+            for page in iter_pages(build_for(exam_ids), EXPORT_PAGE_SIZE):
+                yield [self._flatten_violation(row, include_snapshots) for row in page]
+
+    @staticmethod
+    def _flatten_violation(row: Dict, include_snapshots: bool) -> Dict:
+        details = row.get('details') or {}
+        if not isinstance(details, dict):
+            details = {'message': str(details)}
+        flat = {c: row.get(c) for c in ('id', 'exam_id', 'student_id', 'violation_type', 'severity', 'timestamp')}
+        for key in VIOLATION_DETAIL_KEYS:
+            value = details.get(key)
+            # a few keys hold nested values (e.g. movement); keep the cell scalar
+            flat[f'details_{key}'] = json.dumps(value) if isinstance(value, (dict, list)) else value
+        extra = {k: v for k, v in details.items() if k not in VIOLATION_DETAIL_KEYS}
+        flat['details_extra'] = json.dumps(extra, default=str) if extra else None
+        if include_snapshots:
+            flat[SNAPSHOT_COLUMN] = row.get(SNAPSHOT_COLUMN)
+        return flat
+
+    def exam_pages(self, exam_id: Optional[str] = None, exam_template_id: Optional[str] = None,
+                   status: Optional[str] = None) -> Iterator[List[Dict]]:
+        """Yield pages of exam rows joined with the student's name and email"""
+        def build():
+            query = self.supabase.table('exams').select(EXAM_SOURCE_COLUMNS)
+            if exam_id:
+                query = query.eq('id', exam_id)
+            if exam_template_id:
+                query = query.eq('exam_template_id', exam_template_id)
+            if status:
+                query = query.eq('status', status)
+            return query.order('id')
+
+        for page in iter_pages(build, EXPORT_PAGE_SIZE):
+            student_ids = sorted({row['student_id'] for row in page if row.get('student_id')})
+            students = {}
+            for ids in chunked(student_ids):
+                rows = (self.supabase.table('students').select('id, name, email')
+                        .in_('id', list(ids)).execute().data or [])
+                students.update({s['id']: s for s in rows})
+            for row in page:
+                student = students.get(row.get('student_id'), {})
+                row['student_name'] = student.get('name')
+                row['student_email'] = student.get('email')
+            yield [{c: row.get(c) for c in EXAM_COLUMNS} for row in page]
+
+    # --- encoders ---
+    @staticmethod
+    def iter_csv(pages: Iterator[List[Dict]], columns: List[str]) -> Iterator[str]:
+        """Header first, then one chunk per page"""
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+        yield buffer.getvalue()
+        for page in pages:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(page)
+            yield buffer.getvalue()
+
+    @staticmethod
+    def write_parquet(pages: Iterator[List[Dict]], columns: List[str], kind: str):
+        """Write pages as row groups to a temporary file and return it rewound"""
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ExportUnavailableError("Parquet export requires pyarrow (pip install pyarrow)")
+
+        schema = pa.schema(
+            [pa.field(c, _parquet_type(pa, c)) for c in columns],
+            metadata={'export_format_version': str(EXPORT_FORMAT_VERSION), 'export_kind': kind}
+        )
+        out = tempfile.TemporaryFile()
+        with pq.ParquetWriter(out, schema, compression='snappy') as writer:
+            for page in pages:
+                table = pa.Table.from_pylist([_coerce_parquet_row(row, columns) for row in page], schema=schema)
+                writer.write_table(table)
+        out.seek(0)
+        return out
+
+
+# typed Parquet columns; everything else is written as string
+_FLOAT_COLUMNS = {'details_confidence', 'details_pitch_offset', 'details_yaw_offset', 'details_duration',
+                  'details_audio_level', 'details_threshold', 'total_score', 'max_score'}
+_INT_COLUMNS = {'details_change_count'}
+_BOOL_COLUMNS = {'graded'}
+
+
+def _parquet_type(pa, column: str):
+    if column in _FLOAT_COLUMNS:
+        return pa.float64()
+    if column in _INT_COLUMNS:
+        return pa.int64()
+    if column in _BOOL_COLUMNS:
+        return pa.bool_()
+    return pa.string()
+
+
+def _coerce_parquet_row(row: Dict, columns: List[str]) -> Dict:
+    coerced = {}
+    for column in columns:
+        value = row.get(column)
+        if value is None:
+            coerced[column] = None
+            continue
+        try:
+            if column in _FLOAT_COLUMNS:
+                value = float(value)
+            elif column in _INT_COLUMNS:
+                value = int(value)
+            elif column in _BOOL_COLUMNS:
+                value = bool(value)
+            else:
+                value = str(value)
+        except (TypeError, ValueError):
+            value = None
+        coerced[column] = value
+    return coerced
+
+
+def violation_columns(include_snapshots: bool) -> List[str]:
+    return VIOLATION_COLUMNS + ([SNAPSHOT_COLUMN] if include_snapshots else [])
@@ -0,0 +1,91 @@
+"""
+Frame Cache - per-session reuse of detector outputs for near-identical frames
+Frames are keyed by a difference hash of a 17x16 grayscale thumbnail (256 bits).
+A frame within max_distance bits of the session's last analysed frame, and taken
+less than max_age_sec after it, reuses that frame's detector outputs. The entry is
+never refreshed by hits, so a slowly drifting scene or a frozen stream still gets
+a full detector pass at least every max_age_sec.
+"""
+import threading
+from collections import Counter
+from typing import Any, Dict, Optional
+
+import cv2
+import numpy as np
+
+HASH_SIZE = 16
+
+
+def frame_hash(gray: np.ndarray) -> np.ndarray:
+    """256 bits: is each thumbnail pixel brighter than its right neighbour"""
+    thumb = cv2.resize(gray, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA)
+    return (thumb[:, 1:] > thumb[:, :-1]).ravel()
+
+
+def hamming(a: np.ndarray, b: np.ndarray) -> int:
+    return int(np.count_nonzero(a != b))
+
+
+class FrameCache:
+    """Last analysed frame per session (hash, time, detector outputs) with hit/miss counters"""
+
+    def __init__(self, max_distance: int = 8, max_age_sec: float = 6.0):
+        self.max_distance = max_distance
+        self.max_age_sec = max_age_sec
+        self._entries: Dict[str, Dict] = {}
+        self._session_counts: Dict[str, Counter] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = Counter()  # by reason: empty, changed, expired
+
+    def lookup(self, session_id: str, hashed: np.ndarray, now: float) -> Optional[Any]:
+        """Cached detector outputs for this frame, or None when the detectors must run"""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                reason = 'empty'
+            elif now - entry['time'] >= self.max_age_sec:
+                reason = 'expired'
+            elif hamming(entry['hash'], hashed) > self.max_distance:
+                reason = 'changed'
+            else:
+                self.hits += 1
+                self._session_counts.setdefault(session_id, Counter())['hits'] += 1
+                return entry['value']
+            self.misses[reason] += 1
+            self._session_counts.setdefault(session_id, Counter())['misses'] += 1
+            return None
+
+    def store(self, session_id: str, hashed: np.ndarray, now: float, value: Any):
+        with self._lock:
+            self._entries[session_id] = {'hash': hashed, 'time': now, 'value': value}
+
+    def drop(self, session_id: str):
+        """Forget a finished session's entry and counters"""
+        with self._lock:
+            self._entries.pop(session_id, None)
+            self._session_counts.pop(session_id, None)
+
+    def entries(self) -> Dict[str, Dict]:
+        """Snapshot of the per-session entries, for state size reports"""
+        with self._lock:
+            return dict(self._entries)
+
+    def session_stats(self, session_id: str) -> Dict:
+        with self._lock:
+            counts = self._session_counts.get(session_id, Counter())
+            return {'hits': counts['hits'], 'misses': counts['misses']}
+
+    def stats(self) -> Dict:
+        with self._lock:
+            misses = sum(self.misses.values())
+            lookups = self.hits + misses
+            return {
+                'sessions': len(self._entries),
+                'hits': self.hits,
+                'misses': misses,
+                'misses_by_reason': dict(self.misses),
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'max_distance': self.max_distance,
+                'max_age_sec': self.max_age_sec,
+            }
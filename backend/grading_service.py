@@ -1,15 +1,76 @@
 """
 Grading Service - Auto-grade exams by comparing student answers with correct answers
 """
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, List, Tuple
 import logging
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 
+# Lower bounds of each letter for vectorized grading - keep in sync with get_grade_letter
+GRADE_THRESHOLDS = np.array([40, 50, 55, 60, 65, 70, 75, 80, 85, 90], dtype=np.float64)
+GRADE_LETTERS = np.array(['F', 'D', 'C-', 'C', 'C+', 'B-', 'B', 'B+', 'A-', 'A', 'A+'])
+
+UNANSWERED = -1
+NO_KEY = -2  # key code for questions with no correct answer; never equals an answer code
+
+
+class CompiledAnswerKey:
+    """Grading-ready answer key: (question_number, correct_answer, correct_answer_upper, points) per question"""
+    
+    __slots__ = ('entries', 'max_score')
+    
+    def __init__(self, entries: List[Tuple]):
+        self.entries = entries
+        self.max_score = sum(points for _, _, _, points in entries)
+    
+    def __len__(self):
+        return len(self.entries)
+
+
+class AnswerMatrix:
+    """
+    One row per exam, one column per answer-key question. codes[i, j] indexes
+    labels (the distinct upper-cased answers) or is UNANSWERED; key_codes[j]
+    is the code of question j's correct answer, or NO_KEY.
+    """
+    
+    __slots__ = ('exam_ids', 'question_numbers', 'points', 'labels', 'codes', 'key_codes')
+    
+    def __init__(self, exam_ids, question_numbers, points, labels, codes, key_codes):
+        self.exam_ids = exam_ids
+        self.question_numbers = question_numbers
+        self.points = points
+        self.labels = labels
+        self.codes = codes
+        self.key_codes = key_codes
+    
+    @property
+    def answered(self) -> np.ndarray:
+        return self.codes != UNANSWERED
+    
+    @property
+    def correct(self) -> np.ndarray:
+        return self.codes == self.key_codes[np.newaxis, :]
+
 
 class GradingService:
     """Service to grade student exam submissions"""
     
+    def compile_answer_key(self, questions: List[Dict]) -> 'CompiledAnswerKey':
+        """Precompute what grading needs from exam_questions rows so it can be cached and reused"""
+        entries = []
+        for q in {q['question_number']: q for q in questions}.values():
+            correct_answer = q.get('correct_answer')
+            entries.append((
+                q['question_number'],
+                correct_answer,
+                correct_answer.upper() if correct_answer is not None else None,
+                q.get('points', 1),
+            ))
+        return CompiledAnswerKey(entries)
+    
     def grade_exam(self, student_answers: List[Dict], questions: List[Dict]) -> Tuple[int, int, Dict]:
         """
         Grade an exam by comparing student answers with correct answers
@@ -21,8 +82,11 @@ class GradingService:
         Returns:
             Tuple of (total_score, max_score, detailed_results)
         """
+        return self.grade_with_key(student_answers, self.compile_answer_key(questions))
+    
+    def grade_with_key(self, student_answers: List[Dict], key: 'CompiledAnswerKey') -> Tuple[int, int, Dict]:
+        """Same as grade_exam, against an answer key from compile_answer_key"""
         total_score = 0
-        max_score = 0
         results = {
             'correct_count': 0,
             'incorrect_count': 0,
@@ -30,16 +94,10 @@ class GradingService:
             'question_results': []
         }
         
-        # Create lookup dictionaries
         answer_map = {ans['question_number']: ans['answer'] for ans in student_answers}
-        question_map = {q['question_number']: q for q in questions}
         
         # Grade each question
-        for question_num, question in question_map.items():
-            correct_answer = question.get('correct_answer')
-            points = question.get('points', 1)
-            max_score += points
-            
+        for question_num, correct_answer, correct_upper, points in key.entries:
             student_answer = answer_map.get(question_num)
             
             # Determine if answer is correct
@@ -47,7 +105,8 @@ class GradingService:
             status = 'unanswered'
             
             if student_answer:
-                if student_answer.upper() == correct_answer.upper():
+                # Questions without a correct answer (short answer) can't be auto-graded as correct
+                if correct_upper is not None and student_answer.upper() == correct_upper:
                     is_correct = True
                     total_score += points
                     status = 'correct'
@@ -69,11 +128,166 @@ class GradingService:
                 'status': status
             })
         
-        logger.info(f"✅ Grading complete: {total_score}/{max_score} points "
+        logger.info(f"✅ Grading complete: {total_score}/{key.max_score} points "
                    f"({results['correct_count']} correct, {results['incorrect_count']} incorrect, "
                    f"{results['unanswered_count']} unanswered)")
         
-        return total_score, max_score, results
+        return total_score, key.max_score, results
+    
+    def build_answer_matrix(self, key: CompiledAnswerKey, exam_ids: List[str],
+                            answers: Iterable[Dict]) -> AnswerMatrix:
+        """
+        Scatter exam_answers rows ({exam_id, question_number, answer}) into an
+        AnswerMatrix. Rows for other exams or questions outside the key are ignored;
+        blank answers count as unanswered, like grade_exam.
+        """
+        exam_index = {exam_id: i for i, exam_id in enumerate(exam_ids)}
+        question_index = {entry[0]: j for j, entry in enumerate(key.entries)}
+        rows, cols, values = [], [], []
+        for a in answers:
+            i = exam_index.get(a.get('exam_id'))
+            j = question_index.get(a.get('question_number'))
+            if i is None or j is None:
+                continue
+            rows.append(i)
+            cols.append(j)
+            values.append(a.get('answer') or '')
+        
+        codes = np.full((len(exam_ids), len(key.entries)), UNANSWERED, dtype=np.int32)
+        labels = np.array([], dtype=str)
+        if values:
+            rows = np.asarray(rows, dtype=np.int64)
+            cols = np.asarray(cols, dtype=np.int64)
+            labels, inverse = np.unique(np.char.upper(np.asarray(values, dtype=str)), return_inverse=True)
+            if labels[0] == '':
+                # blanks sort first: shift them to UNANSWERED
+                labels = labels[1:]
+                inverse = inverse - 1
+            # the last row for a cell wins, as in grade_exam's answer map
+            flat = rows * codes.shape[1] + cols
+            _, last_reversed = np.unique(flat[::-1], return_index=True)
+            keep = len(flat) - 1 - last_reversed
+            codes[rows[keep], cols[keep]] = inverse[keep]
+        
+        key_codes = np.full(len(key.entries), NO_KEY, dtype=np.int32)
+        for j, (_, _, correct_upper, _) in enumerate(key.entries):
+            if correct_upper is None or not labels.size:
+                continue
+            pos = int(np.searchsorted(labels, correct_upper))
+            if pos < labels.size and labels[pos] == correct_upper:
+                key_codes[j] = pos
+        
+        return AnswerMatrix(
+            exam_ids=list(exam_ids),
+            question_numbers=[entry[0] for entry in key.entries],
+            points=np.array([entry[3] for entry in key.entries], dtype=np.float64),
+            labels=labels,
+            codes=codes,
+            key_codes=key_codes,
+        )
+    
+    def grade_matrix(self, matrix: AnswerMatrix, max_score: int) -> Dict[str, np.ndarray]:
+        """Vectorized grade_with_key over every exam in the matrix"""
+        correct = matrix.correct
+        answered = matrix.answered
+        total_scores = correct.astype(np.float64) @ matrix.points
+        if max_score:
+            percentages = np.round(total_scores / max_score * 100, 2)
+        else:
+            percentages = np.zeros(len(total_scores))
+        grade_letters = GRADE_LETTERS[np.searchsorted(GRADE_THRESHOLDS, percentages, side='right')]
+        correct_count = correct.sum(axis=1)
+        return {
+            'total_scores': total_scores,
+            'percentages': percentages,
+            'grade_letters': grade_letters,
+            'correct_count': correct_count,
+            'incorrect_count': answered.sum(axis=1) - correct_count,
+            'unanswered_count': (~answered).sum(axis=1),
+        }
+    
+    def analyze_items(self, matrix: AnswerMatrix, group_fraction: float = 0.27) -> Dict:
+        """
+        Classical item analysis over the whole answer matrix:
+        - difficulty: share of exams answering the item correctly (p-value)
+        - discrimination: p in the top group minus p in the bottom group (by total score)
+        - point_biserial: correlation of the item with the rest score (total minus the item)
+        - options: how often each answer was chosen, distractors included
+        Items without a correct answer only get option counts.
+        """
+        n_exams, n_items = matrix.codes.shape
+        correct = matrix.correct.astype(np.float64)
+        item_scores = correct * matrix.points
+        totals = item_scores.sum(axis=1)
+        keyed = matrix.key_codes != NO_KEY
+        
+        difficulty = correct.mean(axis=0) if n_exams else np.full(n_items, np.nan)
+        
+        # top/bottom groups by total score; stable sort keeps ties deterministic
+        group_size = max(1, int(round(n_exams * group_fraction))) if n_exams >= 2 else 0
+        if group_size:
+            order = np.argsort(totals, kind='stable')
+            discrimination = correct[order[-group_size:]].mean(axis=0) - correct[order[:group_size]].mean(axis=0)
+        else:
+            discrimination = np.full(n_items, np.nan)
+        
+        rest = totals[:, np.newaxis] - item_scores
+        item_dev = correct - correct.mean(axis=0) if n_exams else correct
+        rest_dev = rest - rest.mean(axis=0) if n_exams else rest
+        denominator = np.sqrt((item_dev ** 2).sum(axis=0) * (rest_dev ** 2).sum(axis=0))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            point_biserial = np.where(denominator > 0, (item_dev * rest_dev).sum(axis=0) / denominator, np.nan)
+        
+        # option frequencies: one bincount over (item, code) pairs; slot 0 is "unanswered"
+        n_slots = len(matrix.labels) + 1
+        slots = (matrix.codes + 1) + np.arange(n_items)[np.newaxis, :] * n_slots
+        option_counts = np.bincount(slots.ravel(), minlength=n_items * n_slots).reshape(n_items, n_slots)
+        
+        # internal consistency of the keyed items (Cronbach's alpha; KR-20 for 1-point items)
+        alpha = None
+        k = int(keyed.sum())
+        if k >= 2 and n_exams >= 2:
+            total_variance = item_scores[:, keyed].sum(axis=1).var()
+            if total_variance > 0:
+                alpha = float(k / (k - 1) * (1 - item_scores[:, keyed].var(axis=0).sum() / total_variance))
+        
+        def number(value):
+            return None if np.isnan(value) else round(float(value), 4)
+        
+        items = []
+        for j, question_number in enumerate(matrix.question_numbers):
+            counts = option_counts[j]
+            options = [
+                {
+                    'answer': str(matrix.labels[code]),
+                    'count': int(counts[code + 1]),
+                    'proportion': round(float(counts[code + 1] / n_exams), 4),
+                    'is_key': bool(code == matrix.key_codes[j]),
+                }
+                for code in np.flatnonzero(counts[1:])
+            ]
+            options.sort(key=lambda o: -o['count'])
+            items.append({
+                'question_number': question_number,
+                'has_key': bool(keyed[j]),
+                'points': float(matrix.points[j]),
+                'difficulty': number(difficulty[j]) if keyed[j] else None,
+                'discrimination': number(discrimination[j]) if keyed[j] else None,
+                'point_biserial': number(point_biserial[j]) if keyed[j] else None,
+                'answered': int(n_exams - counts[0]),
+                'unanswered': int(counts[0]),
+                'options': options,
+            })
+        
+        return {
+            'exam_count': int(n_exams),
+            'item_count': int(n_items),
+            'mean_score': round(float(totals.mean()), 4) if n_exams else None,
+            'std_score': round(float(totals.std()), 4) if n_exams else None,
+            'cronbach_alpha': round(alpha, 4) if alpha is not None else None,
+            'group_fraction': group_fraction,
+            'items': items,
+        }
     
     def calculate_percentage(self, total_score: int, max_score: int) -> float:
         """Calculate percentage score"""
@@ -0,0 +1,307 @@
+"""
+Identity Service - face embeddings for registration and verification
+Embeddings come from OpenCV's SFace recognizer (128 floats, L2-normalised) on a
+face aligned with five FaceMesh points (eye centers, nose tip, mouth corners),
+so no separate face detector model is needed. They are stored on the student
+row (students.face_embedding) and held in memory in a FaceIndex: one float32
+matrix, searched with a single matrix-vector product.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+from db_paging import iter_rows
+
+logger = logging.getLogger(__name__)
+
+SFACE_MODEL_PATH = os.environ.get("FACE_RECOGNITION_MODEL", "models/face_recognition_sface_2021dec.onnx")
+EMBEDDING_DIM = 128
+MATCH_THRESHOLD = 0.363  # SFace cosine similarity threshold recommended by OpenCV
+FACE_BUCKET = 'face-registrations'
+
+# FaceMesh landmarks averaged into the five SFace alignment points, in template order
+# (eye at image left, eye at image right, nose tip, mouth corner left, mouth corner right)
+ALIGNMENT_LANDMARKS = ((33, 133), (362, 263), (1,), (61,), (291,))
+
+
+class IdentityUnavailableError(RuntimeError):
+    """The face recognition model could not be loaded"""
+
+
+class IdentityNotRegisteredError(LookupError):
+    """The student does not exist or has no registered face"""
+
+
+class IdentityAlreadyRegisteredError(PermissionError):
+    """The student already has a face embedding and the caller may not replace it"""
+
+
+def alignment_row(landmarks, width: int, height: int) -> np.ndarray:
+    """FaceMesh landmarks -> the 1x15 face row (box, five points, score) that alignCrop expects"""
+    points = np.array([
+        (np.mean([landmarks[i].x for i in group]) * width, np.mean([landmarks[i].y for i in group]) * height)
+        for group in ALIGNMENT_LANDMARKS
+    ], dtype=np.float32)
+    x0, y0 = points.min(axis=0)
+    x1, y1 = points.max(axis=0)
+    return np.concatenate([[x0, y0, x1 - x0, y1 - y0], points.ravel(), [1.0]]).astype(np.float32).reshape(1, -1)
+
+
+class FaceEmbedder:
+    """SFace feature extraction; one network shared behind a lock"""
+
+    def __init__(self, model_path: str = SFACE_MODEL_PATH):
+        self._lock = threading.Lock()
+        try:
+            self.recognizer = cv2.FaceRecognizerSF.create(model_path, "")
+            logger.info(f"✅ Face recognition model loaded from {model_path}")
+        except Exception as e:
+            logger.warning(f"⚠️ Face recognition model not available ({model_path}): {e}")
+            self.recognizer = None
+
+    @property
+    def available(self) -> bool:
+        return self.recognizer is not None
+
+    def embed(self, frame: np.ndarray, landmarks) -> np.ndarray:
+        """Unit-length embedding of the face given by full-frame normalized FaceMesh landmarks"""
+        if self.recognizer is None:
+            raise IdentityUnavailableError("Face recognition model is not loaded")
+        height, width = frame.shape[:2]
+        row = alignment_row(landmarks, width, height)
+        with self._lock:
+            aligned = self.recognizer.alignCrop(frame, row)
+            feature = self.recognizer.feature(aligned)
+        vector = feature.ravel().astype(np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+
+class FaceIndex:
+    """Flat inner-product index: row i of a preallocated float32 matrix is the embedding of ids[i]"""
+
+    def __init__(self, dim: int = EMBEDDING_DIM, capacity: int = 1024):
+        self.dim = dim
+        self._matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def get(self, student_id: str) -> Optional[np.ndarray]:
+        with self._lock:
+            row = self._rows.get(student_id)
+            return None if row is None else self._matrix[row].copy()
+
+    def add(self, student_id: str, vector: np.ndarray):
+        """Insert or replace; the matrix doubles when full"""
+        with self._lock:
+            row = self._rows.get(student_id)
+            if row is None:
+                row = len(self._ids)
+                if row == self._matrix.shape[0]:
+                    grown = np.zeros((row * 2, self.dim), dtype=np.float32)
+                    grown[:row] = self._matrix
+                    self._matrix = grown
+                self._ids.append(student_id)
+                self._rows[student_id] = row
+            self._matrix[row] = vector
+
+    def search(self, vector: np.ndarray, k: int = 5) -> List[Tuple[str, float]]:
+        """Top k (student_id, cosine similarity), best first"""
+        with self._lock:
+            n = len(self._ids)
+            if not n:
+                return []
+            similarities = self._matrix[:n] @ vector
+            ids = list(self._ids)
+        k = min(k, n)
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.argsort(-similarities[top])]
+        return [(ids[i], float(similarities[i])) for i in top]
+
+    @property
+    def nbytes(self) -> int:
+        return self._matrix.nbytes
+
+
+class IdentityService:
+    """Registers students' face embeddings and verifies live frames against them"""
+
+    def __init__(self, supabase, model_path: str = SFACE_MODEL_PATH, match_threshold: float = MATCH_THRESHOLD):
+        self.supabase = supabase
+        self.match_threshold = match_threshold
+        self.embedder = FaceEmbedder(model_path)
+        self.index = FaceIndex()
+        # Still images from HTTP requests: no tracking state, two faces so extra people are noticed
+        self.mp_face_mesh = mp.solutions.face_mesh.FaceMesh(
+            static_image_mode=True,
+            max_num_faces=2,
+            min_detection_confidence=0.5
+        )
+        self._mesh_lock = threading.Lock()
+        self._loaded = False
+        self._load_lock = threading.Lock()
+
+    # --- faces ---
+    def _faces(self, frame: np.ndarray) -> List:
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        with self._mesh_lock:
+            results = self.mp_face_mesh.process(rgb)
+        return [face.landmark for face in (results.multi_face_landmarks or [])]
+
+    def _single_face_embedding(self, frame: np.ndarray) -> Tuple[Optional[np.ndarray], str]:
+        if not self.embedder.available:
+            raise IdentityUnavailableError("Face recognition model is not loaded")
+        faces = self._faces(frame)
+        if not faces:
+            return None, "No face detected"
+        if len(faces) > 1:
+            return None, "Multiple faces detected - only the student should be visible"
+        return self.embedder.embed(frame, faces[0]), ""
+
+    # --- registration ---
+    def register(self, student_id: str, frame: np.ndarray, overwrite: bool = False) -> Dict:
+        """
+        Compute, store and index the student's embedding. An existing embedding is
+        only replaced with overwrite (admin); other students with a similar face are logged.
+        """
+        self._ensure_loaded()
+        rows = (self.supabase.table('students').select('id, face_embedding')
+                .eq('id', student_id).execute().data or [])
+        if not rows:
+            raise IdentityNotRegisteredError(f"Student {student_id} not found")
+        if not overwrite and (rows[0].get('face_embedding') or self.index.get(student_id) is not None):
+            raise IdentityAlreadyRegisteredError(f"Student {student_id} already has a registered face")
+        vector, problem = self._single_face_embedding(frame)
+        if vector is None:
+            return {'success': False, 'student_id': student_id, 'message': problem}
+
+        similar = [
+            (other, round(similarity, 4))
+            for other, similarity in self.index.search(vector, k=3)
+            if other != student_id and similarity >= self.match_threshold
+        ]
+        updated = (self.supabase.table('students')
+                   .update({'face_embedding': [round(float(v), 6) for v in vector]})
+                   .eq('id', student_id).execute().data)
+        if not updated:
+            raise IdentityNotRegisteredError(f"Student {student_id} not found")
+        self.index.add(student_id, vector)
+        if similar:
+            logger.warning(f"⚠️ Face registered for {student_id} resembles {similar}")
+        logger.info(f"🪪 Face embedding {'replaced' if overwrite else 'registered'} for student {student_id}")
+        return {'success': True, 'student_id': student_id, 'message': 'Face registered'}
+
+    # --- lookup ---
+    def embedding(self, student_id: str) -> np.ndarray:
+        """The student's embedding from memory, else from the student row (backfilled from the registration photo)"""
+        vector = self.index.get(student_id)
+        if vector is not None:
+            return vector
+        rows = (self.supabase.table('students').select('id, face_embedding, face_image_url')
+                .eq('id', student_id).execute().data or [])
+        if not rows:
+            raise IdentityNotRegisteredError(f"Student {student_id} not found")
+        student = rows[0]
+        if student.get('face_embedding'):
+            vector = np.asarray(student['face_embedding'], dtype=np.float32)
+        elif student.get('face_image_url'):
+            vector = self._backfill(student)
+        if vector is None:
+            raise IdentityNotRegisteredError(f"Student {student_id} has no registered face")
+        self.index.add(student_id, vector)
+        return vector
+
+    def cached_embedding(self, student_id: str) -> Optional[np.ndarray]:
+        """In-memory embedding only (no database access), None if not loaded or the model is missing"""
+        return self.index.get(student_id) if self.embedder.available else None
+
+    def warm(self, student_id: str) -> bool:
+        """Load the student's embedding into memory ahead of in-exam identity checks"""
+        if not self.embedder.available:
+            return False
+        try:
+            self.embedding(student_id)
+            return True
+        except IdentityNotRegisteredError as e:
+            logger.info(f"🪪 No identity checks for {student_id}: {e}")
+        except Exception as e:
+            logger.warning(f"⚠️ Could not load face embedding for {student_id}: {e}")
+        return False
+
+    def _backfill(self, student: Dict) -> Optional[np.ndarray]:
+        """Embed the photo uploaded at registration (students registered before embeddings existed)"""
+        url = student['face_image_url']
+        if f"/{FACE_BUCKET}/" not in url:
+            return None
+        path = url.split(f"/{FACE_BUCKET}/", 1)[1].split('?', 1)[0]
+        try:
+            data = self.supabase.storage.from_(FACE_BUCKET).download(path)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not download registration photo for {student['id']}: {e}")
+            return None
+        frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            return None
+        vector, problem = self._single_face_embedding(frame)
+        if vector is None:
+            logger.warning(f"⚠️ Registration photo for {student['id']} not usable: {problem}")
+            return None
+        self.supabase.table('students').update(
+            {'face_embedding': [round(float(v), 6) for v in vector]}
+        ).eq('id', student['id']).execute()
+        logger.info(f"🪪 Face embedding backfilled from registration photo for {student['id']}")
+        return vector
+
+    def _ensure_loaded(self):
+        """Index every stored embedding once, so registration can search all students"""
+        if self._loaded:
+            return
+        with self._load_lock:
+            if self._loaded:
+                return
+            started = time.time()
+            count = 0
+            for row in iter_rows(lambda: (self.supabase.table('students')
+                                          .select('id, face_embedding').order('id'))):
+                if row.get('face_embedding') and self.index.get(row['id']) is None:
+                    self.index.add(row['id'], np.asarray(row['face_embedding'], dtype=np.float32))
+                    count += 1
+            self._loaded = True
+            logger.info(f"🪪 Face index loaded: {count} embeddings in {time.time() - started:.2f}s")
+
+    # --- verification ---
+    def verify(self, student_id: str, frame: np.ndarray) -> Dict:
+        started = time.perf_counter()
+        reference = self.embedding(student_id)
+        vector, problem = self._single_face_embedding(frame)
+        result = {'success': False, 'match': False, 'similarity': None, 'threshold': self.match_threshold}
+        if vector is None:
+            result['message'] = problem
+        else:
+            similarity = float(reference @ vector)
+            match = similarity >= self.match_threshold
+            result.update({
+                'success': True,
+                'match': match,
+                'similarity': round(similarity, 4),
+                'message': 'Identity verified' if match else 'Face does not match the registered student',
+            })
+        result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return result
+
+    def stats(self) -> Dict:
+        return {
+            'model_available': self.embedder.available,
+            'indexed': len(self.index),
+            'index_bytes': self.index.nbytes,
+            'match_threshold': self.match_threshold,
+        }
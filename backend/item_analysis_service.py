@@ -0,0 +1,60 @@
+"""
+Item Analysis Service - per-question psychometrics for an exam template
+Builds the answer matrix for a template's submitted exams and caches the
+statistics until the set of submissions or the answer key changes.
+"""
+import hashlib
+import logging
+from typing import Dict, List, Optional, Sequence
+
+from grading_service import grading_service
+from ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class ItemAnalysisService:
+    """Item statistics per template, recomputed only when new answers arrive"""
+
+    def __init__(self, answer_key_cache, cohort_loader, ttl_sec: float = 3600.0):
+        self.answer_key_cache = answer_key_cache
+        # BulkGradingService: load_exams(template, statuses) and iter_answers(exam_ids)
+        self.cohort_loader = cohort_loader
+        self.cache = TTLCache(ttl_sec=ttl_sec, max_entries=64)
+
+    @staticmethod
+    def _fingerprint(exams: List[Dict], key) -> str:
+        """Changes whenever an exam is submitted (or resubmitted) or the key is recompiled differently"""
+        digest = hashlib.sha1(repr(key.entries).encode())
+        for exam in exams:
+            digest.update(f"{exam['id']}|{exam.get('status')}|{exam.get('completed_at')}\n".encode())
+        return digest.hexdigest()
+
+    def analyze(self, exam_template_id: str, statuses: Optional[Sequence[str]] = ('completed',),
+                group_fraction: float = 0.27) -> Dict:
+        cache_key = (exam_template_id, tuple(statuses) if statuses else None, group_fraction)
+        key = self.answer_key_cache.answer_key(exam_template_id)
+        # the exam list is cheap to read and tells us whether anything new was submitted
+        exams = self.cohort_loader.load_exams(exam_template_id, statuses)
+        fingerprint = self._fingerprint(exams, key)
+
+        hit, cached = self.cache.get(cache_key)
+        if hit and cached['fingerprint'] == fingerprint:
+            return {**cached['result'], 'cached': True}
+
+        exam_ids = [e['id'] for e in exams]
+        matrix = grading_service.build_answer_matrix(key, exam_ids, self.cohort_loader.iter_answers(exam_ids))
+        result = {
+            'exam_template_id': exam_template_id,
+            'statuses': list(statuses) if statuses else None,
+            **grading_service.analyze_items(matrix, group_fraction),
+        }
+        self.cache.set(cache_key, {'fingerprint': fingerprint, 'result': result})
+        logger.info(f"📐 Item analysis computed for template {exam_template_id}: "
+                    f"{result['exam_count']} exams x {result['item_count']} items")
+        return {**result, 'cached': False}
+
+    def invalidate(self, exam_template_id: Optional[str] = None) -> int:
+        if exam_template_id is None:
+            return self.cache.invalidate()
+        return self.cache.invalidate(predicate=lambda k: k[0] == exam_template_id)
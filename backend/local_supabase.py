@@ -0,0 +1,367 @@
+"""
+Local Supabase stand-in - in-process replacement for the supabase client
+Covers the table and storage calls the backend makes so persistence and upload
+paths can be exercised and benchmarked offline.
+
+Enable with SUPABASE_BACKEND=local. Tunables (all optional):
+    LOCAL_SUPABASE_LATENCY_MS          base latency added to every table call
+    LOCAL_SUPABASE_JITTER_MS           uniform jitter added on top of the base latency
+    LOCAL_SUPABASE_STORAGE_LATENCY_MS  base latency for storage calls
+    LOCAL_SUPABASE_FAILURE_RATE        probability (0-1) that a call raises
+    LOCAL_SUPABASE_SEED_FILE           JSON file of {table_name: [rows]} loaded at startup
+"""
+import copy
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LocalSupabaseError(Exception):
+    """Raised for injected failures and for invalid queries (mirrors postgrest APIError)"""
+
+
+class LocalResponse:
+    """Minimal stand-in for postgrest's APIResponse"""
+
+    def __init__(self, data: Any, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+class _FaultInjector:
+    """Injected latency and failures shared by table and storage calls"""
+
+    def __init__(self, latency_ms: float, jitter_ms: float, storage_latency_ms: float,
+                 failure_rate: float, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.storage_latency_ms = storage_latency_ms
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+
+    def apply(self, operation: str, storage: bool = False):
+        with self._lock:
+            self.calls += 1
+            delay_ms = (self.storage_latency_ms if storage else self.latency_ms)
+            if self.jitter_ms > 0:
+                delay_ms += self._rng.uniform(0, self.jitter_ms)
+            fail = self.failure_rate > 0 and self._rng.random() < self.failure_rate
+            if fail:
+                self.failures += 1
+        if delay_ms > 0:
+            # The real client is synchronous, so block the caller like a network round trip would
+            time.sleep(delay_ms / 1000.0)
+        if fail:
+            raise LocalSupabaseError(f"Injected failure during {operation}")
+
+
+def _sort_key(value):
+    # Keep NULLs comparable: they sort before any value
+    return (value is not None, value)
+
+
+class LocalQuery:
+    """Chainable query builder covering the postgrest calls used by server.py"""
+
+    def __init__(self, client: 'LocalSupabaseClient', table: str):
+        self._client = client
+        self._table = table
+        self._operation = 'select'
+        self._columns: Optional[List[str]] = None
+        self._payload: Any = None
+        self._filters: List = []
+        self._order: List = []
+        self._limit: Optional[int] = None
+        self._offset = 0
+        self._single = False
+        self._maybe_single = False
+        self._count: Optional[str] = None
+        self._on_conflict = 'id'
+
+    # --- operations ---
+    def select(self, columns: str = '*', count: Optional[str] = None):
+        self._operation = 'select'
+        columns = columns.strip()
+        self._columns = None if columns in ('', '*') else [c.strip() for c in columns.split(',') if c.strip()]
+        self._count = count
+        return self
+
+    def insert(self, payload):
+        self._operation = 'insert'
+        self._payload = payload
+        return self
+
+    def upsert(self, payload, on_conflict: str = 'id'):
+        self._operation = 'upsert'
+        self._payload = payload
+        self._on_conflict = on_conflict
+        return self
+
+    def update(self, values: Dict):
+        self._operation = 'update'
+        self._payload = values
+        return self
+
+    def delete(self):
+        self._operation = 'delete'
+        return self
+
+    # --- filters ---
+    def _add(self, column: str, predicate):
+        self._filters.append((column, predicate))
+        return self
+
+    def eq(self, column: str, value):
+        return self._add(column, lambda v: v == value or (v is not None and str(v) == str(value)))
+
+    def neq(self, column: str, value):
+        return self._add(column, lambda v: not (v == value or (v is not None and str(v) == str(value))))
+
+    def gt(self, column: str, value):
+        return self._add(column, lambda v: v is not None and v > value)
+
+    def gte(self, column: str, value):
+        return self._add(column, lambda v: v is not None and v >= value)
+
+    def lt(self, column: str, value):
+        return self._add(column, lambda v: v is not None and v < value)
+
+    def lte(self, column: str, value):
+        return self._add(column, lambda v: v is not None and v <= value)
+
+    def in_(self, column: str, values):
+        wanted = {str(v) for v in values}
+        return self._add(column, lambda v: v is not None and str(v) in wanted)
+
+    def is_(self, column: str, value):
+        if value in (None, 'null'):
+            return self._add(column, lambda v: v is None)
+        return self._add(column, lambda v: v is value)
+
+    # --- modifiers ---
+    def order(self, column: str, desc: bool = False, **_kwargs):
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def range(self, start: int, end: int):
+        self._offset = start
+        self._limit = end - start + 1
+        return self
+
+    def single(self):
+        self._single = True
+        return self
+
+    def maybe_single(self):
+        self._maybe_single = True
+        return self
+
+    def execute(self) -> LocalResponse:
+        self._client.faults.apply(f"{self._operation} {self._table}")
+        return self._client._execute(self)
+
+    # --- helpers used by the client ---
+    def _matches(self, row: Dict) -> bool:
+        return all(predicate(_get_column(row, column)) for column, predicate in self._filters)
+
+    def _project(self, row: Dict) -> Dict:
+        if self._columns is None:
+            return copy.deepcopy(row)
+        projected = {}
+        for column in self._columns:
+            name, expr = _select_column(column)
+            projected[name] = copy.deepcopy(_get_column(row, expr))
+        return projected
+
+
+def _select_column(spec: str):
+    """(output name, column expression) for a select entry: `col`, `alias:col`, `details->>key`, `alias:details->key`"""
+    alias, _, expr = spec.partition(':') if ':' in spec else ('', '', spec)
+    expr = expr.strip()
+    return (alias.strip() or _column_alias(expr)), expr
+
+
+def _get_column(row: Dict, column: str):
+    """
+    Resolve plain columns and the json arrow syntax (details->>student_name):
+    `->` yields the json value, a final `->>` yields it as text like PostgREST does.
+    """
+    if '->' not in column:
+        return row.get(column)
+    as_text = '->>' in column and column.rfind('->>') == column.rfind('->')
+    parts = column.replace('->>', '->').split('->')
+    value = row.get(parts[0])
+    for part in parts[1:]:
+        if isinstance(value, list) and part.lstrip('-').isdigit():
+            index = int(part)
+            value = value[index] if -len(value) <= index < len(value) else None
+        elif isinstance(value, dict):
+            value = value.get(part)
+        else:
+            return None
+    if as_text and value is not None and not isinstance(value, str):
+        return json.dumps(value) if isinstance(value, (dict, list, bool)) else str(value)
+    return value
+
+
+def _column_alias(column: str) -> str:
+    return column.replace('->>', '->').split('->')[-1] if '->' in column else column
+
+
+class LocalBucket:
+    """Storage bucket stand-in: upload and get_public_url"""
+
+    def __init__(self, client: 'LocalSupabaseClient', bucket: str):
+        self._client = client
+        self._bucket = bucket
+
+    def upload(self, path: str, file, file_options: Optional[Dict] = None):
+        self._client.faults.apply(f"upload {self._bucket}", storage=True)
+        data = file if isinstance(file, (bytes, bytearray)) else open(file, 'rb').read()
+        options = file_options or {}
+        upsert = str(options.get('upsert', options.get('x-upsert', 'false'))).lower() == 'true'
+        with self._client._lock:
+            objects = self._client._buckets.setdefault(self._bucket, {})
+            if path in objects and not upsert:
+                raise LocalSupabaseError(f"The resource already exists: {self._bucket}/{path}")
+            objects[path] = bytes(data)
+        return LocalResponse({'Key': f"{self._bucket}/{path}", 'path': path})
+
+    def download(self, path: str) -> bytes:
+        self._client.faults.apply(f"download {self._bucket}", storage=True)
+        with self._client._lock:
+            objects = self._client._buckets.get(self._bucket, {})
+            if path not in objects:
+                raise LocalSupabaseError(f"Object not found: {self._bucket}/{path}")
+            return objects[path]
+
+    def get_public_url(self, path: str) -> str:
+        # Pure string formatting on the real client too, so no latency is injected
+        return f"{self._client.base_url}/storage/v1/object/public/{self._bucket}/{path}"
+
+
+class LocalStorage:
+    def __init__(self, client: 'LocalSupabaseClient'):
+        self._client = client
+
+    def from_(self, bucket: str) -> LocalBucket:
+        return LocalBucket(self._client, bucket)
+
+
+class LocalSupabaseClient:
+    """
+    In-memory Supabase client with the same call shape as supabase.Client
+    for the subset of operations used by the backend
+    """
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, storage_latency_ms: float = 0.0,
+                 failure_rate: float = 0.0, seed: Optional[int] = None,
+                 base_url: str = "http://local-supabase"):
+        self.base_url = base_url
+        self.faults = _FaultInjector(latency_ms, jitter_ms, storage_latency_ms, failure_rate, seed)
+        self._tables: Dict[str, List[Dict]] = {}
+        self._buckets: Dict[str, Dict[str, bytes]] = {}
+        self._lock = threading.Lock()
+        self.storage = LocalStorage(self)
+
+    def table(self, name: str) -> LocalQuery:
+        return LocalQuery(self, name)
+
+    # postgrest-py exposes both spellings
+    from_ = table
+
+    def seed(self, tables: Dict[str, List[Dict]]):
+        """Load rows directly, bypassing latency and failure injection"""
+        with self._lock:
+            for name, rows in tables.items():
+                self._tables.setdefault(name, []).extend(copy.deepcopy(rows))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'calls': self.faults.calls,
+                'injected_failures': self.faults.failures,
+                'tables': {name: len(rows) for name, rows in self._tables.items()},
+                'buckets': {name: len(objects) for name, objects in self._buckets.items()},
+            }
+
+    def _execute(self, query: LocalQuery) -> LocalResponse:
+        with self._lock:
+            rows = self._tables.setdefault(query._table, [])
+
+            if query._operation in ('insert', 'upsert'):
+                payload = query._payload if isinstance(query._payload, list) else [query._payload]
+                inserted = []
+                for record in payload:
+                    record = copy.deepcopy(record)
+                    record.setdefault('id', str(uuid.uuid4()))
+                    if query._operation == 'upsert':
+                        existing = next((r for r in rows if r.get(query._on_conflict) == record.get(query._on_conflict)), None)
+                        if existing is not None:
+                            existing.update(record)
+                            inserted.append(copy.deepcopy(existing))
+                            continue
+                    elif any(r.get('id') == record['id'] for r in rows):
+                        raise LocalSupabaseError(f"duplicate key value violates unique constraint on {query._table}.id")
+                    rows.append(record)
+                    inserted.append(copy.deepcopy(record))
+                return LocalResponse(inserted)
+
+            matched = [r for r in rows if query._matches(r)]
+
+            if query._operation == 'update':
+                for row in matched:
+                    row.update(copy.deepcopy(query._payload))
+                return LocalResponse([copy.deepcopy(r) for r in matched])
+
+            if query._operation == 'delete':
+                self._tables[query._table] = [r for r in rows if not query._matches(r)]
+                return LocalResponse([copy.deepcopy(r) for r in matched])
+
+            # select - apply orderings last-to-first so the first order() is the primary key
+            for column, desc in reversed(query._order):
+                matched.sort(key=lambda r: _sort_key(_get_column(r, column)), reverse=desc)
+            total = len(matched)
+            end = None if query._limit is None else query._offset + query._limit
+            page = [query._project(r) for r in matched[query._offset:end]]
+            count = total if query._count else None
+
+            if query._single or query._maybe_single:
+                if len(page) == 1:
+                    return LocalResponse(page[0], count)
+                if query._maybe_single and not page:
+                    return LocalResponse(None, count)
+                raise LocalSupabaseError(
+                    f"JSON object requested, multiple (or no) rows returned from {query._table} ({len(page)} rows)"
+                )
+            return LocalResponse(page, count)
+
+
+def create_local_client() -> LocalSupabaseClient:
+    """Build a LocalSupabaseClient configured from LOCAL_SUPABASE_* environment variables"""
+    client = LocalSupabaseClient(
+        latency_ms=float(os.environ.get("LOCAL_SUPABASE_LATENCY_MS", "0")),
+        jitter_ms=float(os.environ.get("LOCAL_SUPABASE_JITTER_MS", "0")),
+        storage_latency_ms=float(os.environ.get("LOCAL_SUPABASE_STORAGE_LATENCY_MS", "0")),
+        failure_rate=float(os.environ.get("LOCAL_SUPABASE_FAILURE_RATE", "0")),
+    )
+    seed_file = os.environ.get("LOCAL_SUPABASE_SEED_FILE")
+    if seed_file:
+        with open(seed_file) as f:
+            client.seed(json.load(f))
+        logger.info(f"🌱 Local Supabase seeded from {seed_file}: {client.stats()['tables']}")
+    return client
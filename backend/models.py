@@ -108,6 +108,44 @@ class CalibrationResponse(BaseModel):
     yaw: Optional[float] = None
     message: str
 
+class BurstCalibrationRequest(BaseModel):
+    frames: List[str]  # base64 frames captured back to back
+
+class BurstCalibrationResponse(BaseModel):
+    success: bool
+    pitch: Optional[float] = None
+    yaw: Optional[float] = None
+    roll: Optional[float] = None
+    pitch_dispersion: Optional[float] = None  # robust std (1.4826 x MAD) in degrees
+    yaw_dispersion: Optional[float] = None
+    frames_received: int = 0
+    frames_with_face: int = 0
+    frames_used: int = 0
+    message: str
+
+class CaptureProfile(BaseModel):
+    width: int  # target frame width in pixels; clients keep aspect ratio and never upscale
+    jpeg_quality: float  # canvas.toDataURL quality, 0-1
+    grayscale: bool = False
+
+# Identity Models
+class IdentityRequest(BaseModel):
+    student_id: str
+    frame_base64: str
+
+class IdentityRegisterResponse(BaseModel):
+    success: bool
+    student_id: str
+    message: str
+
+class IdentityVerifyResponse(BaseModel):
+    success: bool  # false when no single face could be embedded
+    match: bool = False
+    similarity: Optional[float] = None  # cosine similarity to the registered embedding
+    threshold: float
+    message: str
+    elapsed_ms: float
+
 # Environment Check Models
 class EnvironmentCheck(BaseModel):
     lighting_ok: bool
@@ -160,6 +198,16 @@ class ViolationTimePoint(BaseModel):
     timestamp: datetime
     count: int
 
+class ViolationTimeline(BaseModel):
+    scope: str  # exam, student or all
+    scope_id: Optional[str] = None
+    start: datetime
+    end: datetime
+    resolution_sec: int  # stored bucket size the points were read from
+    bucket_sec: int  # width of each returned point (a multiple of resolution_sec)
+    total: int
+    points: List[ViolationTimePoint]
+
 class StudentStatistics(BaseModel):
     student_id: str
     student_name: str
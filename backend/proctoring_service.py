@@ -3,9 +3,72 @@ import mediapipe as mp
 import numpy as np
 from ultralytics import YOLO
 import base64
+import os
+import queue
 from typing import Dict, Optional, Tuple
 import time
 from datetime import datetime
+import sys
+from collections import namedtuple
+
+from frame_cache import FrameCache, frame_hash
+from session_telemetry import TelemetryRing
+
+
+def _approx_sizeof(value, _seen=None) -> int:
+    """Recursive sys.getsizeof for the plain containers used in per-session state"""
+    if _seen is None:
+        _seen = set()
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+    if isinstance(value, np.ndarray):
+        return sys.getsizeof(value) + (0 if value.base is None else value.nbytes)
+    if isinstance(value, TelemetryRing):
+        return sys.getsizeof(value) + value.nbytes
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_approx_sizeof(k, _seen) + _approx_sizeof(v, _seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(_approx_sizeof(v, _seen) for v in value)
+    return size
+
+_Landmark = namedtuple('_Landmark', 'x y z')
+
+FACE_PIPELINES = ("detection", "mesh", "yolo")
+
+
+def _unwrap_degrees(values: np.ndarray) -> np.ndarray:
+    """Shift each column of angles to within ±180° of its circular mean so medians don't straddle the wrap"""
+    radians = np.radians(values)
+    center = np.degrees(np.arctan2(np.sin(radians).mean(axis=0), np.cos(radians).mean(axis=0)))
+    return center + (values - center + 180.0) % 360.0 - 180.0
+
+
+class CroppedLandmarks:
+    """
+    FaceMesh landmarks computed on a crop, read back in full-frame normalized coordinates
+    Mapped lazily per access: process_frame only touches a few dozen of the 478 points
+    """
+
+    __slots__ = ('_landmarks', '_x0', '_y0', '_sx', '_sy')
+
+    def __init__(self, landmarks, roi: Tuple[int, int, int, int], width: int, height: int):
+        x0, y0, x1, y1 = roi
+        self._landmarks = landmarks
+        self._x0 = x0 / width
+        self._y0 = y0 / height
+        self._sx = (x1 - x0) / width
+        self._sy = (y1 - y0) / height
+
+    def __len__(self) -> int:
+        return len(self._landmarks)
+
+    def __getitem__(self, index: int) -> _Landmark:
+        landmark = self._landmarks[index]
+        # z is relative to the crop width, like x
+        return _Landmark(self._x0 + landmark.x * self._sx, self._y0 + landmark.y * self._sy, landmark.z * self._sx)
+
 
 class ProctoringService:
     """
@@ -13,7 +76,7 @@ class ProctoringService:
     Detects: looking away, multiple people, prohibited objects (phone, book)
     """
     
-    def __init__(self):
+    def __init__(self, identity_service=None):
         # Initialize MediaPipe with optimized settings for real-time performance
         self.mp_face_mesh = mp.solutions.face_mesh.FaceMesh(
             refine_landmarks=True,
@@ -23,6 +86,62 @@ class ProctoringService:
         self.mp_face_detection = mp.solutions.face_detection.FaceDetection(
             min_detection_confidence=0.3  # Lowered for better detection
         )
+        # Separate mesh for face crops; static_image_mode because one instance serves every
+        # session's crops, so no face tracked in one student's crop is carried into another's
+        self.mp_face_mesh_roi = mp.solutions.face_mesh.FaceMesh(
+            static_image_mode=True,
+            refine_landmarks=True,
+            min_detection_confidence=0.3
+        )
+        
+        # Face pipeline: "detection" = FaceDetection for the count, then FaceMesh on the face crop;
+        # "mesh" = one FaceMesh pass (max_num_faces=2) answers both the count and the landmarks;
+        # "yolo" = person boxes from the YOLO pass count people, FaceDetection only breaks ties
+        self.FACE_PIPELINE = os.environ.get("FACE_PIPELINE", "detection").lower()
+        if self.FACE_PIPELINE not in FACE_PIPELINES:
+            print(f"⚠️ Unknown FACE_PIPELINE '{self.FACE_PIPELINE}', using 'detection'")
+            self.FACE_PIPELINE = "detection"
+        # The "mesh" face count is shared by every session: detect each frame from scratch, since
+        # tracked face ROIs from one session's frame would add phantom or stale faces to the next
+        self.mp_face_mesh_multi = mp.solutions.face_mesh.FaceMesh(
+            static_image_mode=True,
+            max_num_faces=2,
+            refine_landmarks=True,
+            min_detection_confidence=0.3
+        )
+        
+        # YOLO person counting: boxes at or above this confidence are trusted outright;
+        # weaker ones (down to OBJECT_CONFIDENCE_THRESHOLD) only count if FaceDetection agrees
+        self.PERSON_CONFIDENCE_THRESHOLD = 0.6
+        self.PERSON_HEAD_FRACTION = 0.6  # Top share of a person box searched for the face
+        
+        # Burst calibration: each burst gets its own video-mode mesh (see calibrate_burst)
+        self.CALIBRATION_MAX_FRAMES = 30
+        self.CALIBRATION_MIN_FRAMES = 3  # Frames with a usable pose needed after outlier removal
+        self.CALIBRATION_MIN_VALID_RATIO = 0.5  # ...and at least this share of the burst
+        self.CALIBRATION_MAX_DISPERSION_DEG = 5.0  # Robust std of pitch or yaw above this = unstable
+        self.CALIBRATION_OUTLIER_MADS = 3.0
+
+        # Environment checks (registration, pre-exam verification) use their own FaceDetection
+        # instances from a small pool and keep no session state, so many can run concurrently
+        self.ENVIRONMENT_CHECK_DETECTORS = 2
+        self.ENVIRONMENT_CHECK_THUMB_WIDTH = 160  # Lighting histogram is taken on a thumbnail this wide
+        self.environment_detectors = queue.Queue()
+        for _ in range(self.ENVIRONMENT_CHECK_DETECTORS):
+            self.environment_detectors.put(mp.solutions.face_detection.FaceDetection(
+                min_detection_confidence=0.3
+            ))
+
+        # Capture profile sent to clients: they downscale to this width and encode at this JPEG
+        # quality before uploading, since the detectors do not need more than ~640 px
+        self.CAPTURE_WIDTH = int(os.environ.get("CAPTURE_WIDTH", "640"))
+        self.CAPTURE_JPEG_QUALITY = float(os.environ.get("CAPTURE_JPEG_QUALITY", "0.7"))
+        self.CAPTURE_GRAYSCALE = os.environ.get("CAPTURE_GRAYSCALE", "false").lower() in ("1", "true", "yes")
+
+        # Run FaceMesh on a padded crop around the detected face instead of the whole frame
+        self.FACE_ROI_CROP = True
+        self.FACE_ROI_PADDING = 0.5  # Fraction of the detection box added on every side
+        self.FACE_ROI_MIN_SIZE = 48  # Smaller crops fall back to the full frame
         
         # Initialize YOLO model with optimized settings for real-time performance
         try:
@@ -77,7 +196,47 @@ class ProctoringService:
         self.shoulder_movement_threshold = 0.15  # Threshold for shoulder position change (15% of frame)
         self.shoulder_movement_tracking: Dict[str, Dict] = {}  # Track shoulder position per session
         self.shoulder_change_count: Dict[str, int] = {}  # Count continuous shoulder changes
-        self.shoulder_change_threshold = 5  # Alert if shoulder changes 5+ times continuously
+        self.shoulder_change_threshold = 5  # Alert after 5+ continuous changes on consecutive processed frames
+        self.SHOULDER_MIN_SAMPLE_CHANGES = 2  # ...scaled down by the sampling interval, but never below this
+        self.SHOULDER_QUIET_SAMPLES = 1  # still samples tolerated between changes before the count decays
+        
+        # Upper-body pose for shoulder tracking: lite model, run on a crop below the face every Nth frame
+        # static_image_mode keeps one shared instance from carrying tracking state between sessions
+        try:
+            self.mp_pose = mp.solutions.pose.Pose(
+                static_image_mode=True,
+                model_complexity=0,
+                min_detection_confidence=0.3
+            )
+        except Exception as e:
+            print(f"❌ MediaPipe Pose loading failed, using face position as shoulder proxy: {e}")
+            self.mp_pose = None
+        self.POSE_FRAME_INTERVAL = 3  # Run pose on every 3rd processed frame per session
+        self.POSE_ROI_WIDTH_SCALE = 1.5  # Crop extends this many face widths left and right of the face
+        self.POSE_ROI_HEIGHT_SCALE = 2.5  # ...and this many face heights below the chin
+        self.SHOULDER_VISIBILITY_THRESHOLD = 0.5
+        self.pose_frame_count: Dict[str, int] = {}
+        
+        # Near-duplicate frames (static scene, frozen stream) reuse the session's last detector outputs
+        # when the 256-bit thumbnail hash differs by at most FRAME_CACHE_MAX_DISTANCE bits
+        self.FRAME_CACHE_ENABLED = os.environ.get("FRAME_CACHE", "on").lower() not in ("0", "off", "false")
+        self.FRAME_CACHE_MAX_DISTANCE = 8
+        self.FRAME_CACHE_MAX_AGE_SEC = 6.0  # Detectors run again at least this often
+        self.frame_cache = FrameCache(self.FRAME_CACHE_MAX_DISTANCE, self.FRAME_CACHE_MAX_AGE_SEC)
+        
+        # Per-session telemetry history (pose, face count, eye offset, face center, brightness)
+        self.TELEMETRY_CAPACITY = 600  # rows per session, allocated once
+        self.telemetry_by_session: Dict[str, TelemetryRing] = {}
+        
+        # In-exam identity checks against the registered face embedding (IdentityService).
+        # One embedding (a few ms) every few minutes keeps the cost far below the per-frame detectors
+        self.identity_service = identity_service
+        self.IDENTITY_CHECK_INTERVAL_SEC = float(os.environ.get("IDENTITY_CHECK_MINUTES", "5")) * 60
+        self.IDENTITY_RETURN_MIN_GAP_SEC = 30.0  # Face back after an empty seat: check, but not more often than this
+        self.IDENTITY_RECHECK_SEC = 10.0  # After a mismatch, check again this soon to confirm it
+        self.IDENTITY_MISMATCH_CONFIRMATIONS = 2  # Consecutive mismatches before raising identity_mismatch
+        self.IDENTITY_MAX_YAW_OFFSET = 25.0  # Only embed roughly frontal faces (degrees from calibration)
+        self.identity_state_by_session: Dict[str, Dict] = {}
         
     def estimate_head_pose(self, landmarks, width: int, height: int) -> Optional[Tuple[float, float, float]]:
         """
@@ -166,12 +325,154 @@ class ProctoringService:
         
         return is_looking_away, confidence_score
 
+    def pose_roi(self, face_box: Tuple[float, float, float, float], width: int, height: int) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Crop (x0, y0, x1, y1) for pose: from the top of the face box down past the shoulders
+        The face stays in the crop because the pose detector locates the person from it
+        """
+        left, top, right, bottom = face_box
+        face_w = max(right - left, 1.0)
+        face_h = max(bottom - top, 1.0)
+        x0 = int(max(0, left - self.POSE_ROI_WIDTH_SCALE * face_w))
+        x1 = int(min(width, right + self.POSE_ROI_WIDTH_SCALE * face_w))
+        y0 = int(max(0, top))
+        y1 = int(min(height, bottom + self.POSE_ROI_HEIGHT_SCALE * face_h))
+        if x1 - x0 < 32 or y1 - y0 < 32:
+            return None
+        return x0, y0, x1, y1
+
+    def detect_shoulders(self, rgb_frame: np.ndarray, face_box: Tuple[float, float, float, float]) -> Optional[Dict]:
+        """
+        Run MediaPipe Pose on the region below the face box
+        Returns both shoulders, their midpoint, width and tilt in full-frame pixels, or None
+        """
+        if self.mp_pose is None:
+            return None
+        height, width = rgb_frame.shape[:2]
+        roi = self.pose_roi(face_box, width, height)
+        if roi is None:
+            return None
+        x0, y0, x1, y1 = roi
+        pose_results = self.mp_pose.process(np.ascontiguousarray(rgb_frame[y0:y1, x0:x1]))
+        if not pose_results.pose_landmarks:
+            return None
+        pose_landmarks = pose_results.pose_landmarks.landmark
+        left_shoulder, right_shoulder = pose_landmarks[11], pose_landmarks[12]
+        if min(left_shoulder.visibility, right_shoulder.visibility) < self.SHOULDER_VISIBILITY_THRESHOLD:
+            return None
+        roi_w, roi_h = x1 - x0, y1 - y0
+        left = (x0 + left_shoulder.x * roi_w, y0 + left_shoulder.y * roi_h)
+        right = (x0 + right_shoulder.x * roi_w, y0 + right_shoulder.y * roi_h)
+        return {
+            'left': [float(left[0]), float(left[1])],
+            'right': [float(right[0]), float(right[1])],
+            'center': ((left[0] + right[0]) / 2, (left[1] + right[1]) / 2),
+            'width': float(np.hypot(right[0] - left[0], right[1] - left[1])),
+            'tilt_deg': float(np.degrees(np.arctan2(right[1] - left[1], right[0] - left[0]))),
+            'roi': [x0, y0, x1, y1],
+        }
+
+    def face_roi(self, detection, width: int, height: int) -> Optional[Tuple[int, int, int, int]]:
+        """Padded, clamped (x0, y0, x1, y1) around a FaceDetection box, or None if too small"""
+        box = detection.location_data.relative_bounding_box
+        pad_x = box.width * self.FACE_ROI_PADDING
+        pad_y = box.height * self.FACE_ROI_PADDING
+        x0 = int(max(0.0, box.xmin - pad_x) * width)
+        y0 = int(max(0.0, box.ymin - pad_y) * height)
+        x1 = int(min(1.0, box.xmin + box.width + pad_x) * width)
+        y1 = int(min(1.0, box.ymin + box.height + pad_y) * height)
+        if x1 - x0 < self.FACE_ROI_MIN_SIZE or y1 - y0 < self.FACE_ROI_MIN_SIZE:
+            return None
+        return x0, y0, x1, y1
+
+    def person_head_roi(self, bbox, width: int, height: int) -> Optional[Tuple[int, int, int, int]]:
+        """Upper part of a YOLO person box, where the face is, or None if too small"""
+        x1, y1, x2, y2 = bbox
+        x0, x1 = max(0, int(x1)), min(width, int(x2))
+        y0 = max(0, int(y1))
+        y1 = min(height, int(y1 + (y2 - y1) * self.PERSON_HEAD_FRACTION))
+        if x1 - x0 < self.FACE_ROI_MIN_SIZE or y1 - y0 < self.FACE_ROI_MIN_SIZE:
+            return None
+        return x0, y0, x1, y1
+
+    def face_landmarks(self, rgb_frame: np.ndarray, detection=None, roi: Optional[Tuple[int, int, int, int]] = None):
+        """
+        FaceMesh landmarks for one face in full-frame normalized coordinates, or None
+        With a detection (or an explicit roi) the mesh only sees that crop; the full frame is the fallback
+        """
+        height, width = rgb_frame.shape[:2]
+        if self.FACE_ROI_CROP and (detection is not None or roi is not None):
+            if roi is None:
+                roi = self.face_roi(detection, width, height)
+            if roi is not None:
+                x0, y0, x1, y1 = roi
+                crop_results = self.mp_face_mesh_roi.process(np.ascontiguousarray(rgb_frame[y0:y1, x0:x1]))
+                if crop_results.multi_face_landmarks:
+                    return CroppedLandmarks(crop_results.multi_face_landmarks[0].landmark, roi, width, height)
+        face_mesh_results = self.mp_face_mesh.process(rgb_frame)
+        if face_mesh_results.multi_face_landmarks:
+            return face_mesh_results.multi_face_landmarks[0].landmark
+        return None
+
+    def detect_faces(self, rgb_frame: np.ndarray, pipeline: Optional[str] = None,
+                     persons: Optional[list] = None) -> Tuple[int, Optional[object]]:
+        """
+        Face count and, for exactly one face, its landmarks in full-frame normalized coordinates
+        pipeline overrides FACE_PIPELINE (used by tests/face_pipeline_compare.py); the "yolo"
+        pipeline needs the person boxes from detect_prohibited_objects and falls back to
+        "detection" without them
+        """
+        pipeline = pipeline or self.FACE_PIPELINE
+        if pipeline == "yolo" and persons is not None:
+            return self._count_people_yolo(rgb_frame, persons)
+        if pipeline == "mesh":
+            mesh_results = self.mp_face_mesh_multi.process(rgb_frame)
+            faces = mesh_results.multi_face_landmarks or []
+            return len(faces), (faces[0].landmark if len(faces) == 1 else None)
+        
+        face_detection_results = self.mp_face_detection.process(rgb_frame)
+        detections = face_detection_results.detections or []
+        if len(detections) != 1:
+            return len(detections), None
+        return 1, self.face_landmarks(rgb_frame, detections[0])
+
+    def _count_people_yolo(self, rgb_frame: np.ndarray, persons: list) -> Tuple[int, Optional[object]]:
+        """
+        People = confident YOLO person boxes, plus uncertain ones FaceDetection confirms
+        Counts people whose face is turned away; FaceDetection only runs when YOLO is unsure
+        """
+        height, width = rgb_frame.shape[:2]
+        confident = [p for p in persons if p['confidence'] >= self.PERSON_CONFIDENCE_THRESHOLD]
+        uncertain = [p for p in persons if p['confidence'] < self.PERSON_CONFIDENCE_THRESHOLD]
+        person_count = len(confident)
+        face_detection = None
+        if uncertain:
+            detections = self.mp_face_detection.process(rgb_frame).detections or []
+            person_count = max(person_count, min(len(confident) + len(uncertain), len(detections)))
+            if len(detections) == 1:
+                face_detection = detections[0]
+        if person_count != 1:
+            return person_count, None
+        if face_detection is not None:
+            return 1, self.face_landmarks(rgb_frame, face_detection)
+        person = max(confident or uncertain, key=lambda p: p['confidence'])
+        return 1, self.face_landmarks(rgb_frame, roi=self.person_head_roi(person['bbox'], width, height))
+
     def detect_multiple_faces(self, detections) -> bool:
         """
         Check if multiple faces are detected
         """
         return len(detections) > 1 if detections else False
 
+    @staticmethod
+    def draw_object(frame: np.ndarray, obj: Dict):
+        """Draw a detected phone/book bounding box with its label on the frame (in place)"""
+        x1, y1, x2, y2 = obj['bbox']
+        color, label = ((0, 0, 255), "PHONE") if obj['type'] == 'cell phone' else ((255, 0, 0), "BOOK")
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 3)
+        cv2.putText(frame, f"{label} {obj['confidence']:.2f}", (x1, y1 - 10),
+                  cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+
     def detect_prohibited_objects(self, frame: np.ndarray) -> Dict[str, any]:
         """
         Detect prohibited objects (cell phone, book) using YOLOv8
@@ -180,7 +481,8 @@ class ProctoringService:
         detections = {
             'phone_detected': False,
             'book_detected': False,
-            'objects': []
+            'objects': [],
+            'persons': None  # person boxes, for the "yolo" face pipeline
         }
         
         # Check if YOLO model is available
@@ -188,6 +490,7 @@ class ProctoringService:
             print("⚠️ YOLO model not available, skipping object detection")
             detections['annotated_frame'] = frame
             return detections
+        detections['persons'] = []
         
         try:
             # Run YOLO detection with confidence threshold
@@ -212,19 +515,18 @@ class ProctoringService:
                     
                     x1, y1, x2, y2 = map(int, box.xyxy[0])
                     
+                    if cls == "person":
+                        detections['persons'].append({'confidence': confidence, 'bbox': [x1, y1, x2, y2]})
+                    
                     # Detect cell phone (including variations)
-                    if cls in ["cell phone", "phone", "mobile"]:
+                    elif cls in ["cell phone", "phone", "mobile"]:
                         detections['objects'].append({
                             'type': 'cell phone',
                             'confidence': confidence,
                             'bbox': [x1, y1, x2, y2]
                         })
                         detections['phone_detected'] = True
-                        
-                        # Draw bounding box
-                        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 3)
-                        cv2.putText(frame, f"PHONE {confidence:.2f}", (x1, y1 - 10),
-                                  cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+                        self.draw_object(frame, detections['objects'][-1])
                     
                     # Detect book
                     elif cls == "book":
@@ -234,13 +536,11 @@ class ProctoringService:
                             'bbox': [x1, y1, x2, y2]
                         })
                         detections['book_detected'] = True
-                        
-                        # Draw bounding box
-                        cv2.rectangle(frame, (x1, y1), (x2, y2), (255, 0, 0), 3)
-                        cv2.putText(frame, f"BOOK {confidence:.2f}", (x1, y1 - 10),
-                                  cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 0, 0), 2)
+                        self.draw_object(frame, detections['objects'][-1])
         except Exception as e:
             print(f"Object detection error: {e}")
+            # a partial person list would read as an empty seat; let the face pipeline fall back
+            detections['persons'] = None
         
         detections['annotated_frame'] = frame
         return detections
@@ -272,28 +572,113 @@ class ProctoringService:
         except Exception as e:
             return {'success': False, 'message': f'Calibration error: {str(e)}'}
     
+    def capture_profile(self) -> Dict:
+        """How clients should encode frames: max width (never upscaled), JPEG quality 0-1, grayscale"""
+        return {
+            'width': self.CAPTURE_WIDTH,
+            'jpeg_quality': self.CAPTURE_JPEG_QUALITY,
+            'grayscale': self.CAPTURE_GRAYSCALE,
+        }
+
+    def calibrate_burst(self, frames: list) -> Dict:
+        """
+        Calibrate head pose from a burst of frames in one pass
+        Returns median pitch/yaw/roll over the frames that agree, their robust dispersion,
+        and success=False when too few frames have a face or the pose is unstable
+        The burst runs through a video-mode FaceMesh created for it and closed afterwards,
+        so the face is tracked across the burst but never into another student's burst;
+        safe to call from worker threads
+        """
+        frames = frames[:self.CALIBRATION_MAX_FRAMES]
+        angles = []
+        with mp.solutions.face_mesh.FaceMesh(
+            refine_landmarks=True,
+            min_detection_confidence=0.3,
+            min_tracking_confidence=0.3
+        ) as face_mesh:
+            for frame in frames:
+                if frame is None:
+                    continue
+                height, width, _ = frame.shape
+                mesh_results = face_mesh.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+                if not mesh_results.multi_face_landmarks or len(mesh_results.multi_face_landmarks) != 1:
+                    continue
+                pose = self.estimate_head_pose(mesh_results.multi_face_landmarks[0].landmark, width, height)
+                if pose:
+                    angles.append(pose)
+        
+        result = {
+            'success': False,
+            'frames_received': len(frames),
+            'frames_with_face': len(angles),
+            'frames_used': 0,
+            'pitch': None, 'yaw': None, 'roll': None,
+            'pitch_dispersion': None, 'yaw_dispersion': None,
+        }
+        min_frames = max(self.CALIBRATION_MIN_FRAMES, int(np.ceil(len(frames) * self.CALIBRATION_MIN_VALID_RATIO)))
+        if len(angles) < min_frames:
+            result['message'] = f'Face found in {len(angles)} of {len(frames)} frames (need {min_frames})'
+            return result
+        
+        values = _unwrap_degrees(np.asarray(angles, dtype=np.float64))
+        median = np.median(values, axis=0)
+        spread = 1.4826 * np.median(np.abs(values - median), axis=0)  # MAD scaled to a std
+        inliers = np.all(np.abs(values - median) <= np.maximum(self.CALIBRATION_OUTLIER_MADS * spread, 1.0), axis=1)
+        kept = values[inliers]
+        median = np.median(kept, axis=0)
+        spread = 1.4826 * np.median(np.abs(kept - median), axis=0)
+        pitch, yaw, roll = (float((a + 180.0) % 360.0 - 180.0) for a in median)
+        result.update({
+            'frames_used': int(kept.shape[0]),
+            'pitch': pitch, 'yaw': yaw, 'roll': roll,
+            'pitch_dispersion': float(spread[0]),
+            'yaw_dispersion': float(spread[1]),
+        })
+        
+        if kept.shape[0] < min_frames:
+            result['message'] = f'Only {kept.shape[0]} consistent frames (need {min_frames}) - please hold still'
+        elif max(spread[0], spread[1]) > self.CALIBRATION_MAX_DISPERSION_DEG:
+            result['message'] = (f'Head pose unstable (pitch ±{spread[0]:.1f}°, yaw ±{spread[1]:.1f}°) - '
+                                 f'please hold still and look at the screen')
+        else:
+            result['success'] = True
+            result['message'] = 'Calibration successful'
+        return result
+    
     def check_environment(self, frame: np.ndarray) -> Dict:
         """
-        Check environment lighting and face detection
+        Check environment lighting, face detection and extra faces in one face pass
+        Safe to call from worker threads: it borrows a pooled FaceDetection instance
+        and does not touch any per-session state
         """
         try:
             height, width, _ = frame.shape
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
             
-            # Check lighting (convert to grayscale and check brightness)
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            brightness = np.mean(gray)
+            # Check lighting from the histogram of a small grayscale thumbnail
+            scale = min(1.0, self.ENVIRONMENT_CHECK_THUMB_WIDTH / width)
+            thumb = frame if scale == 1.0 else cv2.resize(
+                frame, (max(1, round(width * scale)), max(1, round(height * scale))), interpolation=cv2.INTER_AREA
+            )
+            gray = cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY)
+            histogram = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+            brightness = float(np.dot(histogram, np.arange(256)) / histogram.sum())
             lighting_ok = 40 < brightness < 220  # Acceptable range
             
-            # Check face detection
-            face_detection_results = self.mp_face_detection.process(rgb_frame)
-            face_detected = face_detection_results.detections is not None and len(face_detection_results.detections) > 0
+            # One face detection pass answers presence, centering and multiple faces
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            detector = self.environment_detectors.get()
+            try:
+                detections = detector.process(rgb_frame).detections or []
+            finally:
+                self.environment_detectors.put(detector)
+            face_count = len(detections)
+            face_detected = face_count > 0
             
-            # Check if face is centered
+            # Check if face is centered (the largest face is the one being registered)
             face_centered = False
             if face_detected:
-                detection = face_detection_results.detections[0]
-                bbox = detection.location_data.relative_bounding_box
+                bbox = max((d.location_data.relative_bounding_box for d in detections),
+                           key=lambda b: b.width * b.height)
                 center_x = bbox.xmin + bbox.width / 2
                 center_y = bbox.ymin + bbox.height / 2
                 face_centered = (0.3 < center_x < 0.7) and (0.2 < center_y < 0.7)
@@ -306,6 +691,8 @@ class ProctoringService:
                     message.append("Lighting too bright")
             if not face_detected:
                 message.append("No face detected")
+            elif face_count > 1:
+                message.append(f"{face_count} faces detected")
             elif not face_centered:
                 message.append("Face not centered")
             
@@ -316,21 +703,27 @@ class ProctoringService:
                 'lighting_ok': lighting_ok,
                 'face_detected': face_detected,
                 'face_centered': face_centered,
+                'face_count': face_count,
+                'multiple_faces': face_count > 1,
                 'message': ', '.join(message),
-                'brightness': float(brightness)
+                'brightness': brightness
             }
         except Exception as e:
             return {
                 'lighting_ok': False,
                 'face_detected': False,
                 'face_centered': False,
+                'face_count': 0,
+                'multiple_faces': False,
                 'message': f'Environment check error: {str(e)}'
             }
 
-    def process_frame(self, frame: np.ndarray, session_id: str, calibrated_pitch: float, calibrated_yaw: float) -> Dict:
+    def process_frame(self, frame: np.ndarray, session_id: str, calibrated_pitch: float, calibrated_yaw: float,
+                      student_id: Optional[str] = None) -> Dict:
         """
         Process a single frame for all violations
         Returns comprehensive violation report
+        student_id enables the periodic identity check against the registered face
         """
         try:
             if frame is None:
@@ -387,21 +780,44 @@ class ProctoringService:
             # Stricter black screen detection - if brightness is very low, it's likely camera off
             is_black_screen = brightness < 15  # Very dark frame (increased threshold)
             
-            # Detect multiple faces first
-            face_detection_results = self.mp_face_detection.process(rgb_frame)
-            if face_detection_results.detections:
-                result['face_count'] = len(face_detection_results.detections)
+            # Filled in below when the face mesh yields them; NaN means not measured this frame
+            telemetry_eye = (np.nan, np.nan)
+            telemetry_face_center = (np.nan, np.nan)
+            
+            # A near-identical frame reuses the last detector outputs; the checks and
+            # violation throttling below still run on them exactly as for a fresh frame
+            hashed = frame_hash(gray) if self.FRAME_CACHE_ENABLED else None
+            cached = self.frame_cache.lookup(session_id, hashed, current_time) if hashed is not None else None
+            result['frame_cache_hit'] = cached is not None
+            
+            object_detection = None
+            if cached is not None:
+                face_count, landmarks = cached['faces']
+                object_detection = {**cached['objects'], 'annotated_frame': frame}
+                for obj in object_detection['objects']:
+                    self.draw_object(frame, obj)
+            else:
+                # The "yolo" pipeline counts people from the object detection pass, so run it first
+                if self.FACE_PIPELINE == "yolo":
+                    object_detection = self.detect_prohibited_objects(frame)
                 
-                if self.detect_multiple_faces(face_detection_results.detections):
+                # Detect multiple faces first (landmarks come from the same step when there is one face)
+                face_count, landmarks = self.detect_faces(
+                    rgb_frame, persons=object_detection['persons'] if object_detection else None
+                )
+            if face_count:
+                result['face_count'] = face_count
+                
+                if face_count > 1:
                     result['multiple_faces'] = True
                     if should_add_violation('multiple_faces'):
                         result['violations'].append({
                             'type': 'multiple_faces',
                             'severity': 'high',
-                            'message': f'{len(face_detection_results.detections)} people detected in frame',
+                            'message': f'{face_count} people detected in frame',
                             'confidence': 0.95
                         })
-                        print(f"👥 MULTIPLE FACES DETECTED: {len(face_detection_results.detections)} people")
+                        print(f"👥 MULTIPLE FACES DETECTED: {face_count} people")
                     cv2.putText(frame, "MULTIPLE PEOPLE DETECTED!", (50, 100),
                               cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
             else:
@@ -429,9 +845,7 @@ class ProctoringService:
             
             # Process face mesh for head pose (only if single person detected)
             if result['face_count'] == 1:
-                face_mesh_results = self.mp_face_mesh.process(rgb_frame)
-                if face_mesh_results.multi_face_landmarks:
-                    landmarks = face_mesh_results.multi_face_landmarks[0].landmark
+                if landmarks:
                     angles = self.estimate_head_pose(landmarks, width, height)
                     
                     if angles:
@@ -525,6 +939,8 @@ class ProctoringService:
                             
                             # Only proceed if we have valid eye tracking data
                             if eye_tracking_valid:
+                                telemetry_eye = (eye_offset_x, (left_eye_center_y + right_eye_center_y) / 2)
+                                
                                 # Initialize tracking for this session
                                 if session_id not in self.eye_movement_tracking:
                                     self.eye_movement_tracking[session_id] = {
@@ -585,11 +1001,11 @@ class ProctoringService:
                                 tracking['last_eye_pos'] = current_eye_pos
                         
                         # Shoulder movement tracking - detect continuous shoulder position changes
-                        # Use pose estimation landmarks if available (MediaPipe Pose)
-                        # For now, use face position as proxy for shoulder position
+                        # Shoulders come from MediaPipe Pose on a crop below the face, every
+                        # POSE_FRAME_INTERVAL frames; the face center is only a fallback proxy
+                        # when the pose model is unavailable
                         if landmarks and len(landmarks) >= 468:
                             try:
-                                # Use face position as proxy for upper body/shoulder position
                                 # Check if landmark indices are valid
                                 if 234 < len(landmarks) and 454 < len(landmarks) and 10 < len(landmarks) and 152 < len(landmarks):
                                     face_left = landmarks[234].x * width  # Left face edge
@@ -597,65 +1013,75 @@ class ProctoringService:
                                     face_top = landmarks[10].y * height  # Top of face
                                     face_bottom = landmarks[152].y * height  # Bottom of face
                                     
-                                    # Calculate face center as proxy for shoulder position
                                     face_center_x = (face_left + face_right) / 2
                                     face_center_y = (face_top + face_bottom) / 2
+                                    telemetry_face_center = (face_center_x / width, face_center_y / height)
                                     
-                                    # Initialize tracking for this session
-                                    if session_id not in self.shoulder_movement_tracking:
-                                        self.shoulder_movement_tracking[session_id] = {
-                                            'last_position': (face_center_x, face_center_y),
-                                            'change_count': 0,
-                                            'last_change_time': current_time
-                                        }
-                                        self.shoulder_change_count[session_id] = 0
-                                    
-                                    tracking = self.shoulder_movement_tracking[session_id]
-                                    last_pos = tracking['last_position']
-                                    
-                                    # Calculate position change
-                                    position_change = np.sqrt((face_center_x - last_pos[0])**2 + (face_center_y - last_pos[1])**2)
-                                    normalized_change = position_change / max(width, height)  # Normalize to frame size
-                                    
-                                    # Check if movement exceeds threshold
-                                    if normalized_change > self.shoulder_movement_threshold:
-                                        tracking['change_count'] += 1
-                                        tracking['last_change_time'] = current_time
-                                        
-                                        # Reset count if too much time passed (not continuous)
-                                        if (current_time - tracking['last_change_time']) > 2.0:
-                                            tracking['change_count'] = 1
-                                        
-                                        # Alert if continuous changes detected
-                                        if tracking['change_count'] >= self.shoulder_change_threshold:
-                                            if should_add_violation('shoulder_movement'):
-                                                violation_data = {
-                                                    'type': 'shoulder_movement',
-                                                    'severity': 'medium',
-                                                    'message': f'Continuous shoulder/body movement detected ({tracking["change_count"]} changes)',
-                                                    'change_count': tracking['change_count'],
-                                                    'movement_distance': normalized_change,
-                                                    'confidence': 0.80
-                                                }
-                                                result['violations'].append(violation_data)
-                                                print(f"🤸 SHOULDER MOVEMENT VIOLATION DETECTED: {violation_data['message']}")
-                                                cv2.putText(frame, f"SHOULDER MOVEMENT! ({tracking['change_count']} changes)", (50, 250),
-                                                          cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 140, 0), 2)
-                                                # Reset count after alerting
-                                                tracking['change_count'] = 0
+                                    shoulder_position = None
+                                    if self.mp_pose is not None:
+                                        pose_frame = self.pose_frame_count.get(session_id, 0)
+                                        self.pose_frame_count[session_id] = pose_frame + 1
+                                        # a cached frame has the same face, so the shoulders have not moved either
+                                        if cached is None and pose_frame % self.POSE_FRAME_INTERVAL == 0:
+                                            shoulders = self.detect_shoulders(rgb_frame, (face_left, face_top, face_right, face_bottom))
+                                            if shoulders:
+                                                shoulder_position = shoulders['center']
+                                                result['shoulders'] = shoulders
+                                        tracking_source = 'pose'
                                     else:
-                                        # Small movement - reset count gradually
-                                        if (current_time - tracking['last_change_time']) > 1.0:
-                                            tracking['change_count'] = max(0, tracking['change_count'] - 1)
+                                        shoulder_position = (face_center_x, face_center_y)
+                                        tracking_source = 'face_proxy'
                                     
-                                    tracking['last_position'] = (face_center_x, face_center_y)
+                                    if shoulder_position is not None:
+                                        # pose samples are POSE_FRAME_INTERVAL frames apart, the proxy is every frame
+                                        movement = self.track_shoulders(
+                                            session_id, shoulder_position, max(width, height), current_time,
+                                            self.POSE_FRAME_INTERVAL if tracking_source == 'pose' else 1
+                                        )
+                                        if movement['triggered'] and should_add_violation('shoulder_movement'):
+                                            violation_data = {
+                                                'type': 'shoulder_movement',
+                                                'severity': 'medium',
+                                                'message': f'Continuous shoulder/body movement detected ({movement["change_count"]} changes)',
+                                                'change_count': movement['change_count'],
+                                                'movement_distance': movement['movement_distance'],
+                                                'tracking_source': tracking_source,
+                                                'confidence': 0.80
+                                            }
+                                            result['violations'].append(violation_data)
+                                            print(f"🤸 SHOULDER MOVEMENT VIOLATION DETECTED: {violation_data['message']}")
+                                            cv2.putText(frame, f"SHOULDER MOVEMENT! ({movement['change_count']} changes)", (50, 250),
+                                                      cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 140, 0), 2)
                             except (IndexError, AttributeError) as e:
                                 print(f"Shoulder tracking error: {e}")
             
-            # Detect prohibited objects
-            object_detection = self.detect_prohibited_objects(frame)
+            # Identity check on the face already located above (skipped for cached frames: nothing changed)
+            if student_id and self.identity_service is not None and cached is None:
+                identity = self.check_identity(session_id, student_id, rgb_frame, face_count, landmarks,
+                                               result['head_pose'], calibrated_yaw, current_time, is_black_screen)
+                if identity is not None:
+                    result['identity'] = identity
+                    if identity['confirmed'] and should_add_violation('identity_mismatch'):
+                        result['violations'].append({
+                            'type': 'identity_mismatch',
+                            'severity': 'high',
+                            'message': f'Face does not match the registered student (similarity {identity["similarity"]:.2f}, '
+                                       f'{identity["mismatches"]} checks in a row)',
+                            'similarity': identity['similarity'],
+                            'confidence': round(1.0 - max(identity['similarity'], 0.0), 2)
+                        })
+                        print(f"🪪 IDENTITY MISMATCH: similarity={identity['similarity']:.3f}")
+            
+            # Detect prohibited objects (already done up front by the "yolo" pipeline)
+            if object_detection is None:
+                object_detection = self.detect_prohibited_objects(frame)
             result['phone_detected'] = object_detection['phone_detected']
             result['book_detected'] = False  # Book detection disabled
+            if hashed is not None and cached is None:
+                self.frame_cache.store(session_id, hashed, current_time, {
+                    'faces': (face_count, landmarks),
+                    'objects': {k: v for k, v in object_detection.items() if k != 'annotated_frame'},
+                })
             
             if object_detection['phone_detected'] and should_add_violation('phone_detected'):
                 phone_objects = [obj for obj in object_detection['objects'] if obj['type'] == 'cell phone']
@@ -682,7 +1108,7 @@ class ProctoringService:
             
             # If violations exist, capture snapshot (throttled per session and only for violations that need evidence)
             # Only capture snapshot if there are actual violations (not just warnings)
-            violation_types_needing_snapshot = ['looking_away', 'multiple_faces', 'phone_detected', 'eye_movement', 'shoulder_movement', 'object_detected', 'book_detected']
+            violation_types_needing_snapshot = ['looking_away', 'multiple_faces', 'phone_detected', 'eye_movement', 'shoulder_movement', 'object_detected', 'book_detected', 'identity_mismatch']
             has_violation_needing_snapshot = any(v.get('type') in violation_types_needing_snapshot for v in result['violations'])
             
             # Log all violations detected for debugging
@@ -704,11 +1130,181 @@ class ProctoringService:
                 else:
                     print(f"⏸️ Snapshot throttled for session {session_id} (last snapshot {now_ts - last_ts:.1f}s ago)")
             
+            head_pose = result['head_pose'] or {}
+            self._telemetry(session_id).append(
+                current_time,
+                head_pose.get('pitch', np.nan), head_pose.get('yaw', np.nan), head_pose.get('roll', np.nan),
+                result['face_count'],
+                telemetry_eye[0], telemetry_eye[1],
+                telemetry_face_center[0], telemetry_face_center[1],
+                brightness
+            )
+            
             return result
             
         except Exception as e:
             return {'error': f'Frame processing error: {str(e)}'}
 
+    def check_identity(self, session_id: str, student_id: str, rgb_frame: np.ndarray, face_count: int, landmarks,
+                       head_pose: Optional[Dict], calibrated_yaw: float, now: float,
+                       is_black_screen: bool = False) -> Optional[Dict]:
+        """
+        Compare the single visible face with the student's registered embedding when a check is due:
+        on the first usable frame, every IDENTITY_CHECK_INTERVAL_SEC, when a face returns to an
+        empty seat, and IDENTITY_RECHECK_SEC after a mismatch to confirm it.
+        Returns the check result, or None when no check ran on this frame.
+        """
+        state = self.identity_state_by_session.setdefault(
+            session_id, {'last_check': None, 'seat_empty': False, 'mismatches': 0}
+        )
+        if face_count == 0:
+            if not is_black_screen:
+                state['seat_empty'] = True
+            return None
+        if face_count != 1 or not landmarks or head_pose is None:
+            return None
+        
+        last_check = state['last_check']
+        if last_check is None:
+            due = True
+        elif state['mismatches']:
+            due = now - last_check >= self.IDENTITY_RECHECK_SEC
+        elif state['seat_empty']:
+            due = now - last_check >= self.IDENTITY_RETURN_MIN_GAP_SEC
+        else:
+            due = now - last_check >= self.IDENTITY_CHECK_INTERVAL_SEC
+        # A turned head embeds poorly; wait for a frontal frame instead of risking a false mismatch
+        if not due or abs(head_pose['yaw'] - calibrated_yaw) > self.IDENTITY_MAX_YAW_OFFSET:
+            return None
+        # Only the in-memory embedding: the server loads it when the session starts
+        reference = self.identity_service.cached_embedding(student_id)
+        if reference is None:
+            return None
+        
+        started = time.perf_counter()
+        bgr_frame = cv2.cvtColor(rgb_frame, cv2.COLOR_RGB2BGR)  # rgb_frame has no annotations drawn on it
+        similarity = float(reference @ self.identity_service.embedder.embed(bgr_frame, landmarks))
+        match = similarity >= self.identity_service.match_threshold
+        state['last_check'] = now
+        state['seat_empty'] = False
+        state['mismatches'] = 0 if match else state['mismatches'] + 1
+        confirmed = state['mismatches'] >= self.IDENTITY_MISMATCH_CONFIRMATIONS
+        result = {
+            'match': match,
+            'similarity': round(similarity, 4),
+            'mismatches': state['mismatches'],
+            'confirmed': confirmed,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+        }
+        if confirmed:
+            # Reported; go back to the regular schedule instead of re-flagging every recheck
+            state['mismatches'] = 0
+        return result
+
+    def _telemetry(self, session_id: str) -> TelemetryRing:
+        ring = self.telemetry_by_session.get(session_id)
+        if ring is None:
+            ring = self.telemetry_by_session[session_id] = TelemetryRing(self.TELEMETRY_CAPACITY)
+        return ring
+
+    def session_telemetry(self, session_id: str, window_sec: Optional[float] = None) -> Optional[Dict]:
+        """Latest sample and windowed statistics for a session, or None if it has no history"""
+        ring = self.telemetry_by_session.get(session_id)
+        if ring is None or not len(ring):
+            return None
+        return {
+            'session_id': session_id,
+            'capacity': ring.capacity,
+            'latest': ring.latest(),
+            'window_sec': window_sec,
+            **ring.stats(window_sec)
+        }
+
+    def required_shoulder_changes(self, frame_interval: int) -> int:
+        """Continuous changes needed when shoulder samples are frame_interval processed frames apart"""
+        return max(self.SHOULDER_MIN_SAMPLE_CHANGES, -(-self.shoulder_change_threshold // max(1, frame_interval)))
+
+    def track_shoulders(self, session_id: str, position: Tuple[float, float], frame_size: int,
+                        now: float, frame_interval: int = 1) -> Dict:
+        """
+        Count consecutive shoulder samples that moved more than shoulder_movement_threshold
+        (as a share of frame_size). Continuity is counted in samples, not seconds, so the
+        rule holds whatever the sampling interval; the run needed to fire is
+        required_shoulder_changes(frame_interval). The count restarts after firing.
+        """
+        tracking = self.shoulder_movement_tracking.setdefault(session_id, {
+            'last_position': position,
+            'change_count': 0,
+            'quiet_samples': 0,
+            'last_change_time': now
+        })
+        last_pos = tracking['last_position']
+        normalized_change = float(np.hypot(position[0] - last_pos[0], position[1] - last_pos[1])) / frame_size
+        required = self.required_shoulder_changes(frame_interval)
+        triggered = False
+
+        if normalized_change > self.shoulder_movement_threshold:
+            # too many still samples since the last change: this is a new run
+            if tracking['quiet_samples'] > self.SHOULDER_QUIET_SAMPLES:
+                tracking['change_count'] = 0
+            tracking['change_count'] += 1
+            tracking['quiet_samples'] = 0
+            tracking['last_change_time'] = now
+        else:
+            tracking['quiet_samples'] += 1
+            if tracking['quiet_samples'] > self.SHOULDER_QUIET_SAMPLES:
+                tracking['change_count'] = max(0, tracking['change_count'] - 1)
+
+        change_count = tracking['change_count']
+        if change_count >= required:
+            triggered = True
+            tracking['change_count'] = 0
+        tracking['last_position'] = position
+        self.shoulder_change_count[session_id] = tracking['change_count']
+        return {
+            'triggered': triggered,
+            'change_count': change_count,
+            'required': required,
+            'movement_distance': normalized_change
+        }
+
+    def _session_stores(self) -> Dict[str, Dict]:
+        """Every dict keyed by session id (the frame cache keeps its own entries)"""
+        return {
+            'last_snapshot_time': self.last_snapshot_time_by_session,
+            'last_violation_time': self.last_violation_time_by_session,
+            'last_violation_types': self.last_violation_types_by_session,
+            'eye_movement_tracking': self.eye_movement_tracking,
+            'shoulder_movement_tracking': self.shoulder_movement_tracking,
+            'shoulder_change_count': self.shoulder_change_count,
+            'pose_frame_count': self.pose_frame_count,
+            'identity_state': self.identity_state_by_session,
+            'telemetry': self.telemetry_by_session,
+        }
+
+    def end_session(self, session_id: str):
+        """Release everything held for a session once its socket closes"""
+        for store in self._session_stores().values():
+            store.pop(session_id, None)
+        self.frame_cache.drop(session_id)
+
+    def session_state_sizes(self) -> Dict[str, Dict]:
+        """
+        Report how much per-session state is held, keyed by session id
+        Sizes are approximate (recursive sys.getsizeof over containers)
+        """
+        per_session_stores = {**self._session_stores(), 'frame_cache': self.frame_cache.entries()}
+        sessions: Dict[str, Dict] = {}
+        for store_name, store in per_session_stores.items():
+            for session_id, value in list(store.items()):
+                entry = sessions.setdefault(session_id, {'stores': {}, 'total_bytes': 0})
+                size = _approx_sizeof(value)
+                entry['stores'][store_name] = size
+                entry['total_bytes'] += size
+        for session_id, entry in sessions.items():
+            entry['frame_cache'] = self.frame_cache.session_stats(session_id)
+        return sessions
+
     def calibrate_from_frame(self, frame_base64: str) -> Optional[Tuple[float, float]]:
         """
         Extract calibration values (pitch, yaw) from a frame
@@ -0,0 +1,171 @@
+"""
+Profiling Service - on-demand CPU and memory profiling of a live server
+The sampling profiler records every thread (the event loop as well as the
+asyncio.to_thread workers running calibration, environment checks and batch
+writes); cProfile can only trace the event loop thread it is started on, and
+its text report says so. Guardrails keep overhead bounded: one profile at a time,
+capped durations, a minimum sampling interval and an auto-stop for tracemalloc.
+"""
+import asyncio
+import cProfile
+import io
+import logging
+import marshal
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilerBusyError(Exception):
+    """Raised when a profile is requested while another one is running"""
+
+
+class ProfilingService:
+    """Captures cProfile/sampling profiles and tracemalloc snapshots"""
+
+    MAX_PROFILE_SECONDS = 60.0
+    MIN_SAMPLE_INTERVAL_MS = 5.0
+    MAX_TRACEMALLOC_FRAMES = 25
+    MAX_TRACEMALLOC_SECONDS = 600.0
+    MAX_TOP_ENTRIES = 200
+    CPROFILE_OUTPUTS = ('text', 'pstats')
+    # every key pstats.Stats.sort_stats accepts (cumulative, tottime, ncalls, ...)
+    SORT_KEYS = frozenset(pstats.Stats.sort_arg_dict_default)
+    CPROFILE_SCOPE_NOTE = ("cProfile covers the event loop thread only; work run in asyncio.to_thread "
+                           "workers is not included - use mode=sampling to profile every thread")
+
+    def __init__(self):
+        self._profile_lock = asyncio.Lock()
+        self._tracemalloc_stop_handle: Optional[asyncio.TimerHandle] = None
+        self._tracemalloc_started_at: Optional[float] = None
+
+    # --- CPU profiling ---
+    async def profile_cpu(self, seconds: float, mode: str = 'cprofile', output: str = 'text',
+                          sort: str = 'cumulative', limit: int = 50,
+                          interval_ms: float = 10.0) -> Tuple[bytes, str, str]:
+        """
+        Profile for `seconds`: every thread when sampling, the event loop thread with cProfile.
+        Returns (artifact bytes, media type, file extension).
+        """
+        if self._profile_lock.locked():
+            raise ProfilerBusyError("A profile is already being captured")
+        seconds = max(0.1, min(float(seconds), self.MAX_PROFILE_SECONDS))
+        limit = max(1, min(int(limit), self.MAX_TOP_ENTRIES))
+
+        async with self._profile_lock:
+            if mode == 'sampling':
+                stacks = await self._sample_stacks(seconds, max(interval_ms, self.MIN_SAMPLE_INTERVAL_MS))
+                # Collapsed stack format, readable by flamegraph.pl / speedscope
+                lines = [f"{stack} {count}" for stack, count in stacks.most_common()]
+                return ("\n".join(lines) + "\n").encode('utf-8'), 'text/plain', 'folded'
+
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profiler.disable()
+            logger.info(f"🔬 cProfile capture finished ({seconds:.1f}s)")
+
+            if output == 'pstats':
+                profiler.create_stats()
+                return marshal.dumps(profiler.stats), 'application/octet-stream', 'pstats'
+            buffer = io.StringIO()
+            buffer.write(f"# {self.CPROFILE_SCOPE_NOTE}\n")
+            stats = pstats.Stats(profiler, stream=buffer)
+            stats.strip_dirs().sort_stats(sort).print_stats(limit)
+            return buffer.getvalue().encode('utf-8'), 'text/plain', 'txt'
+
+    async def _sample_stacks(self, seconds: float, interval_ms: float) -> Counter:
+        """Sample the stacks of every thread from a helper thread; each stack is rooted at its thread name"""
+        stacks: Counter = Counter()
+        stop = threading.Event()
+
+        def sampler():
+            interval = interval_ms / 1000.0
+            own_id = threading.get_ident()
+            while not stop.is_set():
+                names_by_id = {t.ident: t.name for t in threading.enumerate()}
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_id:
+                        continue
+                    names = []
+                    while frame is not None:
+                        code = frame.f_code
+                        names.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                        frame = frame.f_back
+                    if names:
+                        names.append(f"thread {names_by_id.get(thread_id, thread_id)}")
+                        stacks[';'.join(reversed(names))] += 1
+                stop.wait(interval)
+
+        thread = threading.Thread(target=sampler, name="stack-sampler", daemon=True)
+        thread.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            stop.set()
+            thread.join(timeout=1.0)
+        logger.info(f"🔬 Sampling profile finished ({seconds:.1f}s, {sum(stacks.values())} samples)")
+        return stacks
+
+    # --- Memory profiling ---
+    def start_tracemalloc(self, frames: int = 10, max_seconds: float = 120.0) -> Dict:
+        if tracemalloc.is_tracing():
+            return {'tracing': True, 'message': 'tracemalloc already running', **self._tracemalloc_status()}
+        frames = max(1, min(int(frames), self.MAX_TRACEMALLOC_FRAMES))
+        max_seconds = max(1.0, min(float(max_seconds), self.MAX_TRACEMALLOC_SECONDS))
+        tracemalloc.start(frames)
+        self._tracemalloc_started_at = time.time()
+        # Auto-stop so a forgotten trace doesn't keep taxing every allocation
+        self._tracemalloc_stop_handle = asyncio.get_event_loop().call_later(max_seconds, self.stop_tracemalloc)
+        logger.info(f"🧠 tracemalloc started (frames={frames}, auto-stop in {max_seconds:.0f}s)")
+        return {'tracing': True, 'frames': frames, 'auto_stop_sec': max_seconds}
+
+    def stop_tracemalloc(self) -> Dict:
+        if self._tracemalloc_stop_handle is not None:
+            self._tracemalloc_stop_handle.cancel()
+            self._tracemalloc_stop_handle = None
+        if not tracemalloc.is_tracing():
+            return {'tracing': False, 'message': 'tracemalloc not running'}
+        status = self._tracemalloc_status()
+        tracemalloc.stop()
+        self._tracemalloc_started_at = None
+        logger.info("🧠 tracemalloc stopped")
+        return {'tracing': False, **status}
+
+    def top_allocations(self, limit: int = 25, key_type: str = 'lineno') -> Dict:
+        if not tracemalloc.is_tracing():
+            return {'tracing': False, 'message': 'tracemalloc not running', 'top': []}
+        limit = max(1, min(int(limit), self.MAX_TOP_ENTRIES))
+        key_type = key_type if key_type in ('lineno', 'filename', 'traceback') else 'lineno'
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        top = []
+        for stat in snapshot.statistics(key_type)[:limit]:
+            top.append({
+                'size_bytes': stat.size,
+                'count': stat.count,
+                'traceback': [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+            })
+        return {'tracing': True, **self._tracemalloc_status(), 'key_type': key_type, 'top': top}
+
+    def _tracemalloc_status(self) -> Dict:
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            'traced_current_bytes': current,
+            'traced_peak_bytes': peak,
+            'running_sec': round(time.time() - self._tracemalloc_started_at, 1) if self._tracemalloc_started_at else None,
+        }
+
+
+# Global instance
+profiling_service = ProfilingService()
@@ -2,14 +2,16 @@
 FastAPI Server for AI Proctoring with WebSocket Support
 Integrates YOLOv8n and MediaPipe for real-time exam monitoring
 """
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Dict, List
+from fastapi.responses import Response, StreamingResponse
+from typing import Dict, List, Optional, Tuple
 import base64
 import cv2
 import numpy as np
 from datetime import datetime
 import asyncio
+import itertools
 import logging
 import json
 from supabase import create_client, Client
@@ -25,14 +27,37 @@ load_dotenv(ROOT_DIR / '.env')
 
 from proctoring_service import ProctoringService
 from grading_service import grading_service
+from profiling_service import profiling_service, ProfilerBusyError
+from analytics_service import AnalyticsService
+from answer_key_cache import AnswerKeyCache
+from bulk_grading_service import BulkGradingService, EmptyAnswerKeyError
+from item_analysis_service import ItemAnalysisService
+from student_report_service import StudentNotFoundError, StudentReportService
+from export_service import (
+    EXAM_COLUMNS, EXPORT_FORMAT_VERSION, ExportService, ExportUnavailableError, violation_columns
+)
+from violation_counters import ViolationCounters
+from admin_broadcast_service import AdminBroadcaster
+from timeline_service import TimelineService
+from identity_service import (IdentityAlreadyRegisteredError, IdentityNotRegisteredError, IdentityService,
+                              IdentityUnavailableError)
+from audio_window_service import AudioWindowService, noise_severity
+from db_paging import iter_keyset_desc, iter_rows
 from models import (
     FrameProcessRequest,
     FrameProcessResponse,
     CalibrationRequest,
     CalibrationResponse,
+    BurstCalibrationRequest,
+    BurstCalibrationResponse,
+    CaptureProfile,
     EnvironmentCheckRequest,
     EnvironmentCheck,
-    ViolationDetail
+    IdentityRequest,
+    IdentityRegisterResponse,
+    IdentityVerifyResponse,
+    ViolationDetail,
+    ViolationTimeline
 )
 
 # Configure logging
@@ -52,12 +77,61 @@ app.add_middleware(
 )
 
 # Initialize Supabase client
-supabase_url = os.environ.get("SUPABASE_URL", "https://ukwnvvuqmiqrjlghgxnf.supabase.co")
-supabase_key = os.environ.get("SUPABASE_KEY", "")
-supabase: Client = create_client(supabase_url, supabase_key)
+# SUPABASE_BACKEND=local swaps in the in-process stand-in for offline benchmarking
+SUPABASE_BACKEND = os.environ.get("SUPABASE_BACKEND", "remote").lower()
+if SUPABASE_BACKEND == "local":
+    from local_supabase import create_local_client
+    supabase = create_local_client()
+    logger.info("🧪 Using local in-process Supabase stand-in (SUPABASE_BACKEND=local)")
+else:
+    supabase_url = os.environ.get("SUPABASE_URL", "https://ukwnvvuqmiqrjlghgxnf.supabase.co")
+    supabase_key = os.environ.get("SUPABASE_KEY", "")
+    supabase: Client = create_client(supabase_url, supabase_key)
+
+# Face embeddings (SFace) for registration, verification and in-exam identity checks
+identity_service = IdentityService(supabase)
 
 # Initialize Proctoring Service
-proctoring_service = ProctoringService()
+proctoring_service = ProctoringService(identity_service=identity_service)
+
+# Server-side analytics aggregation (cached per filter set)
+analytics_service = AnalyticsService(supabase)
+
+# Compiled answer keys and exam -> template ids for grading
+answer_key_cache = AnswerKeyCache(
+    supabase,
+    key_ttl_sec=float(os.environ.get("ANSWER_KEY_CACHE_TTL_SEC", "600"))
+)
+
+bulk_grading_service = BulkGradingService(supabase, answer_key_cache)
+item_analysis_service = ItemAnalysisService(answer_key_cache, bulk_grading_service)
+student_report_service = StudentReportService(supabase, answer_key_cache)
+
+export_service = ExportService(supabase)
+
+# Rolling violation counters, updated on every violation insert and checkpointed to disk
+violation_counters = ViolationCounters(
+    os.environ.get("VIOLATION_COUNTERS_CHECKPOINT", str(ROOT_DIR / 'violation_counters.json'))
+)
+COUNTER_CHECKPOINT_INTERVAL_SEC = float(os.environ.get("VIOLATION_COUNTERS_CHECKPOINT_SEC", "30"))
+
+# Violation timelines (10 s / 1 min / 10 min buckets), loaded per scope on first query
+timeline_service = TimelineService(supabase)
+TIMELINE_MAX_POINTS = 2000
+
+# Admin push channel: per-exam deltas flushed to subscribed admin sockets once per tick
+admin_broadcaster = AdminBroadcaster(tick_sec=float(os.environ.get("ADMIN_BROADCAST_TICK_SEC", "1.0")))
+
+# Audio levels -> rolling window stats and one excessive_noise incident per noise episode, written in batches
+audio_window_service = AudioWindowService(
+    threshold=float(os.environ.get("AUDIO_THRESHOLD", "40")),
+    hangover_sec=float(os.environ.get("AUDIO_EPISODE_HANGOVER_SEC", "5")),
+    max_episode_sec=float(os.environ.get("AUDIO_EPISODE_MAX_SEC", "60"))
+)
+AUDIO_FLUSH_INTERVAL_SEC = float(os.environ.get("AUDIO_FLUSH_INTERVAL_SEC", "2"))
+AUDIO_WRITE_BATCH = 500
+# flushes the head of the noise queue may fail on its own (database down) before it is dropped
+AUDIO_WRITE_MAX_ATTEMPTS = int(os.environ.get("AUDIO_WRITE_MAX_ATTEMPTS", "30"))
 
 # Helper function to validate and convert UUID
 def validate_uuid(value):
@@ -73,6 +147,24 @@ def validate_uuid(value):
         logger.warning(f"Invalid UUID format: {value}, using None instead")
         return None
 
+# Admin-only endpoints require X-Admin-Token to match ADMIN_API_TOKEN (disabled when unset)
+ADMIN_API_TOKEN = os.environ.get("ADMIN_API_TOKEN", "")
+
+def require_admin(x_admin_token: str = Header(default="")):
+    """FastAPI dependency guarding admin-only endpoints"""
+    if not ADMIN_API_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_API_TOKEN not set)")
+    if x_admin_token != ADMIN_API_TOKEN:
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+def _attachment(content: bytes, media_type: str, filename: str) -> Response:
+    """Return content as a downloadable file"""
+    return Response(
+        content=content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 # Active WebSocket connections
 active_connections: Dict[str, WebSocket] = {}
 
@@ -105,6 +197,185 @@ def _upload_snapshot_and_get_url(
         logger.error(f"Snapshot upload failed: {e}")
         return None
 
+def _insert_violation(violation_record: Dict):
+    """
+    Single write path for violation rows: insert into Supabase, update the rolling
+    counters and timelines, drop cached reports it affects and queue it for admin subscribers.
+    Raises if the insert fails (nothing is counted or broadcast).
+    """
+    _insert_violations([violation_record])
+
+def _insert_violations(violation_records: List[Dict]):
+    """_insert_violation for several rows with one insert request"""
+    if not violation_records:
+        return
+    supabase.table('violations').insert(violation_records).execute()
+    _record_inserted_violations(violation_records)
+
+def _record_inserted_violations(violation_records: List[Dict]):
+    """Counters, timelines, report cache and admin feed for rows already in the violations table"""
+    for violation_record in violation_records:
+        violation_counters.record(
+            violation_record.get('exam_id'),
+            violation_record.get('student_id'),
+            violation_record.get('violation_type'),
+            violation_record.get('severity'),
+            at=violation_record.get('timestamp'),
+            violation_id=violation_record.get('id')
+        )
+        timeline_service.record(violation_record)
+        student_report_service.invalidate_for(violation_record.get('exam_id'), violation_record.get('student_id'))
+        admin_broadcaster.publish_violation(violation_record)
+
+def _noise_violation_record(incident: Dict) -> Dict:
+    """excessive_noise row for one closed noise episode from audio_window_service"""
+    severity, severity_msg = noise_severity(incident['peak'])
+    start = datetime.utcfromtimestamp(incident['start']).isoformat()
+    end = datetime.utcfromtimestamp(incident['end']).isoformat()
+    return {
+        "id": str(uuid.uuid4()),
+        "exam_id": validate_uuid(incident.get('exam_id')),
+        "student_id": validate_uuid(incident.get('student_id')),
+        "violation_type": "excessive_noise",
+        "severity": severity,
+        "details": {
+            "message": (f"{severity_msg} detected for {incident['duration_sec']:.0f}s - "
+                        f"peak {incident['peak']:.0f}%, mean {incident['mean']:.0f}% "
+                        f"(Threshold: {audio_window_service.threshold:.0f}%)"),
+            "audio_level": incident['peak'],
+            "mean_audio_level": incident['mean'],
+            "threshold": audio_window_service.threshold,
+            "episode_start": start,
+            "episode_end": end,
+            "duration_sec": incident['duration_sec'],
+            "loud_sec": incident['loud_sec'],
+            "samples": incident['samples'],
+            "session_id": incident['session_id'],
+            "student_name": incident.get('student_name') or "Unknown Student",
+            "student_id": incident.get('student_id') or "Unknown ID",
+            "subject_code": incident.get('subject_code') or "Unknown Code",
+            "subject_name": incident.get('subject_name') or "Unknown Subject",
+        },
+        "image_url": None,  # No snapshot for audio violations
+        "timestamp": start
+    }
+
+def _queue_noise_incidents(incidents: List[Dict]):
+    if incidents:
+        audio_window_service.enqueue([_noise_violation_record(incident) for incident in incidents])
+        for incident in incidents:
+            logger.info(f"🔊 Noise episode closed ({incident['closed_by']}): session={incident['session_id']}, "
+                        f"{incident['duration_sec']}s, peak={incident['peak']}%")
+
+def _insert_noise_rows(records: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+    """Insert rows by bisecting a failed insert down to single rows: (written, rejected)"""
+    try:
+        supabase.table('violations').insert(records).execute()
+        return records, []
+    except Exception as e:
+        if len(records) == 1:
+            logger.error(f"❌ Dropping noise violation {records[0]['id']} for session "
+                         f"{records[0]['details'].get('session_id')}: {e}")
+            return [], records
+    middle = len(records) // 2
+    written, rejected = _insert_noise_rows(records[:middle])
+    more_written, more_rejected = _insert_noise_rows(records[middle:])
+    return written + more_written, rejected + more_rejected
+
+def _write_noise_incidents():
+    """
+    Write queued noise incidents in batches. When a batch insert fails one row is tried
+    on its own: if that fails too the database is treated as down and the batch goes back
+    on the queue (its first row is dropped after AUDIO_WRITE_MAX_ATTEMPTS flushes);
+    otherwise the rest is bisected and only the rows the database rejects are dropped.
+    """
+    while True:
+        batch = audio_window_service.drain(AUDIO_WRITE_BATCH)
+        if not batch:
+            return
+        written, rejected = batch, []
+        try:
+            supabase.table('violations').insert(batch).execute()
+        except Exception as e:
+            logger.warning(f"⚠️ Audio violation batch insert of {len(batch)} rows failed: {e}")
+            try:
+                supabase.table('violations').insert(batch[:1]).execute()
+            except Exception:
+                audio_window_service.requeue(batch[1:])
+                for record in audio_window_service.requeue(batch[:1], AUDIO_WRITE_MAX_ATTEMPTS):
+                    logger.error(f"❌ Dropping noise violation {record['id']} for session "
+                                 f"{record['details'].get('session_id')} after {AUDIO_WRITE_MAX_ATTEMPTS} attempts")
+                raise
+            written, rejected = _insert_noise_rows(batch[1:])
+            written = batch[:1] + written
+        audio_window_service.mark_written(written)
+        audio_window_service.reject(rejected)
+        # rows are in the table now; a failure below must not write them again
+        try:
+            _record_inserted_violations(written)
+        except Exception as e:
+            logger.error(f"❌ Recording {len(written)} written noise violations failed: {e}")
+
+def _iter_violations_before(before_iso: str):
+    """Stream the columns the counters need for every violation older than before_iso"""
+    return iter_rows(lambda: supabase.table('violations')
+                     .select('id, exam_id, student_id, violation_type, severity, timestamp')
+                     .lt('timestamp', before_iso)
+                     .order('id'))
+
+def _iter_violations_since(since_iso: str):
+    """Stream the columns the counters need for every violation at or after since_iso"""
+    return iter_rows(lambda: supabase.table('violations')
+                     .select('id, exam_id, student_id, violation_type, severity, timestamp')
+                     .gte('timestamp', since_iso)
+                     .order('id'))
+
+async def _checkpoint_counters_periodically():
+    while True:
+        await asyncio.sleep(COUNTER_CHECKPOINT_INTERVAL_SEC)
+        await asyncio.to_thread(violation_counters.checkpoint)
+
+async def _flush_audio_incidents_periodically():
+    while True:
+        await asyncio.sleep(AUDIO_FLUSH_INTERVAL_SEC)
+        _queue_noise_incidents(audio_window_service.close_idle())
+        try:
+            await asyncio.to_thread(_write_noise_incidents)
+        except Exception as e:
+            logger.error(f"❌ Audio violation batch insert failed: {e}")
+
+@app.on_event("startup")
+async def start_violation_counters():
+    # Restore the last checkpoint (plus rows written after it), or recount from the table on first start
+    if violation_counters.load():
+        try:
+            await asyncio.to_thread(violation_counters.reconcile, _iter_violations_since)
+        except Exception as e:
+            logger.error(f"❌ Violation counter reconcile failed: {e}")
+    else:
+        try:
+            await asyncio.to_thread(violation_counters.rebuild, _iter_violations_before)
+        except Exception as e:
+            logger.error(f"❌ Violation counter rebuild failed: {e}")
+    app.state.counter_checkpoint_task = asyncio.create_task(_checkpoint_counters_periodically())
+    app.state.audio_flush_task = asyncio.create_task(_flush_audio_incidents_periodically())
+    admin_broadcaster.start()
+
+@app.on_event("shutdown")
+async def stop_violation_counters():
+    for task_name in ('counter_checkpoint_task', 'audio_flush_task'):
+        task = getattr(app.state, task_name, None)
+        if task:
+            task.cancel()
+    # Noise episodes still open are written as they stand
+    _queue_noise_incidents(audio_window_service.close_all())
+    try:
+        _write_noise_incidents()
+    except Exception as e:
+        logger.error(f"❌ Audio violation batch insert failed: {e}")
+    violation_counters.checkpoint()
+    await admin_broadcaster.stop()
+
 @app.get("/")
 async def root():
     return {
@@ -142,15 +413,12 @@ async def grade_exam(request: dict):
         
         logger.info(f"📝 Grading exam: exam_id={exam_id}, student_id={student_id}, answers={len(student_answers)}")
         
-        # Get questions with correct answers from Supabase
-        exam_response = supabase.table('exams').select('exam_template_id').eq('id', exam_id).single().execute()
-        exam_template_id = exam_response.data['exam_template_id']
-        
-        questions_response = supabase.table('exam_questions').select('question_number, correct_answer, points').eq('exam_template_id', exam_template_id).execute()
-        questions = questions_response.data
+        # Answer key for the exam's template (cached; fetched from Supabase on a miss)
+        exam_template_id = answer_key_cache.template_for_exam(exam_id)
+        answer_key = answer_key_cache.answer_key(exam_template_id)
         
         # Grade the exam
-        total_score, max_score, results = grading_service.grade_exam(student_answers, questions)
+        total_score, max_score, results = grading_service.grade_with_key(student_answers, answer_key)
         percentage = grading_service.calculate_percentage(total_score, max_score)
         grade_letter = grading_service.get_grade_letter(percentage)
         
@@ -163,6 +431,10 @@ async def grade_exam(request: dict):
             'grade_letter': grade_letter
         }).eq('id', exam_id).execute()
         
+        # A new submission changes the template's item statistics and the student's report
+        item_analysis_service.invalidate(exam_template_id)
+        student_report_service.invalidate_for(exam_id, student_id)
+        
         logger.info(f"✅ Grading complete: {total_score}/{max_score} ({percentage}%) - Grade: {grade_letter}")
         
         return {
@@ -178,6 +450,49 @@ async def grade_exam(request: dict):
         logger.error(f"❌ Grading error: {e}")
         return {'success': False, 'error': str(e)}
 
+@app.post("/api/grade-exam/bulk", dependencies=[Depends(require_admin)])
+async def grade_exam_bulk(request: dict):
+    """
+    Regrade every exam of a template in one vectorized pass and write the scores back
+    Request: {
+        exam_template_id: str,
+        statuses: [str] | null   (default ["completed"]; null grades every exam),
+        dry_run: bool            (default false: compute without writing),
+        include_results: bool    (default false: add one row per exam)
+    }
+    """
+    exam_template_id = request.get('exam_template_id')
+    if not exam_template_id:
+        raise HTTPException(status_code=400, detail="exam_template_id is required")
+    try:
+        dry_run = bool(request.get('dry_run', False))
+        summary = await asyncio.to_thread(
+            bulk_grading_service.regrade,
+            exam_template_id,
+            request.get('statuses', ['completed']),
+            dry_run,
+            bool(request.get('include_results', False))
+        )
+        if not dry_run:
+            student_report_service.invalidate()
+        return {'success': True, **summary}
+    except EmptyAnswerKeyError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error(f"❌ Bulk grading error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/answer-keys/invalidate", dependencies=[Depends(require_admin)])
+async def invalidate_answer_keys(request: dict):
+    """
+    Drop cached answer keys after a template is uploaded or edited
+    Request: {exam_template_id?: str} - omit to clear every cached key
+    """
+    exam_template_id = request.get('exam_template_id')
+    dropped = answer_key_cache.invalidate(exam_template_id)
+    logger.info(f"🔑 Answer key cache invalidated: template={exam_template_id or 'all'}, dropped={dropped}")
+    return {'success': True, 'invalidated': dropped, 'cache': answer_key_cache.stats()}
+
 @app.post("/api/calibrate", response_model=CalibrationResponse)
 async def calibrate(request: CalibrationRequest):
     """Calibrate head pose for a student"""
@@ -209,6 +524,38 @@ async def calibrate(request: CalibrationRequest):
         logger.error(f"Calibration error: {e}")
         return CalibrationResponse(success=False, message=str(e))
 
+@app.get("/api/capture-profile", response_model=CaptureProfile)
+async def get_capture_profile():
+    """Frame encoding settings for HTTP clients; WebSocket clients receive them on connect"""
+    return CaptureProfile(**proctoring_service.capture_profile())
+
+@app.post("/api/calibrate/burst", response_model=BurstCalibrationResponse)
+async def calibrate_burst(request: BurstCalibrationRequest):
+    """
+    Calibrate head pose from a burst of frames in one request
+    Returns the median pose with its dispersion; success is false when the pose is unstable
+    """
+    if not request.frames:
+        raise HTTPException(status_code=400, detail="frames must not be empty")
+    if len(request.frames) > proctoring_service.CALIBRATION_MAX_FRAMES:
+        raise HTTPException(status_code=400, detail=f"At most {proctoring_service.CALIBRATION_MAX_FRAMES} frames per burst")
+    def decode_and_calibrate():
+        frames = []
+        for frame_base64 in request.frames:
+            frame_data = base64.b64decode(frame_base64.split(',')[1] if ',' in frame_base64 else frame_base64)
+            frames.append(cv2.imdecode(np.frombuffer(frame_data, np.uint8), cv2.IMREAD_COLOR))
+        return proctoring_service.calibrate_burst(frames)
+
+    try:
+        # Up to 30 decodes and FaceMesh passes: keep them off the event loop
+        result = await asyncio.to_thread(decode_and_calibrate)
+        logger.info(f"🎯 Burst calibration: {result['frames_used']}/{result['frames_received']} frames used, "
+                    f"success={result['success']}")
+        return BurstCalibrationResponse(**result)
+    except Exception as e:
+        logger.error(f"Burst calibration error: {e}")
+        return BurstCalibrationResponse(success=False, frames_received=len(request.frames), message=str(e))
+
 @app.post("/api/environment-check", response_model=EnvironmentCheck)
 async def check_environment(request: EnvironmentCheckRequest):
     """Check lighting and face detection for environment verification"""
@@ -227,28 +574,14 @@ async def check_environment(request: EnvironmentCheckRequest):
                 message="Invalid frame data"
             )
         
-        # Check environment
-        result = proctoring_service.check_environment(frame)
-        
-        # Also check for multiple faces using process_frame
-        try:
-            detection_result = proctoring_service.process_frame(
-                frame=frame,
-                calibrated_pitch=0.0,
-                calibrated_yaw=0.0,
-                session_id="face_registration"  # Dummy session for face registration
-            )
-            multiple_faces = detection_result.get('multiple_faces', False)
-        except Exception as e:
-            logger.warning(f"Multiple face check failed: {e}")
-            # Default to False if check fails (lenient)
-            multiple_faces = False
+        # Lighting, face and multiple-face checks in one pass, off the event loop
+        result = await asyncio.to_thread(proctoring_service.check_environment, frame)
         
         return EnvironmentCheck(
             lighting_ok=result['lighting_ok'],
             face_detected=result['face_detected'],
             face_centered=result['face_centered'],
-            multiple_faces_detected=multiple_faces,
+            multiple_faces_detected=result['multiple_faces'],
             message=result['message']
         )
     except Exception as e:
@@ -261,6 +594,47 @@ async def check_environment(request: EnvironmentCheckRequest):
             message=str(e)
         )
 
+def _decode_identity_frame(request: IdentityRequest) -> np.ndarray:
+    frame_data = base64.b64decode(request.frame_base64.split(',')[1] if ',' in request.frame_base64 else request.frame_base64)
+    frame = cv2.imdecode(np.frombuffer(frame_data, np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        raise HTTPException(status_code=400, detail="Invalid frame data")
+    return frame
+
+@app.post("/api/identity/register", response_model=IdentityRegisterResponse)
+async def register_identity(request: IdentityRequest, x_admin_token: str = Header(default="")):
+    """
+    Store the student's face embedding from a registration frame with exactly one face.
+    Without an admin token only a student with no registered face can be enrolled.
+    """
+    overwrite = bool(x_admin_token)
+    if overwrite:
+        require_admin(x_admin_token)
+    frame = _decode_identity_frame(request)
+    try:
+        result = await asyncio.to_thread(identity_service.register, request.student_id, frame, overwrite)
+    except IdentityUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except IdentityNotRegisteredError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except IdentityAlreadyRegisteredError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return IdentityRegisterResponse(**result)
+
+@app.post("/api/identity/verify", response_model=IdentityVerifyResponse)
+async def verify_identity(request: IdentityRequest):
+    """Compare a live frame with the student's registered face"""
+    frame = _decode_identity_frame(request)
+    try:
+        result = await asyncio.to_thread(identity_service.verify, request.student_id, frame)
+    except IdentityUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except IdentityNotRegisteredError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    logger.info(f"🪪 Identity check for {request.student_id}: match={result['match']} "
+                f"similarity={result['similarity']} ({result['elapsed_ms']} ms)")
+    return IdentityVerifyResponse(**result)
+
 @app.post("/api/process-frame", response_model=FrameProcessResponse)
 async def process_frame(request: FrameProcessRequest):
     """Process a single frame for violations"""
@@ -318,7 +692,11 @@ async def websocket_proctoring(websocket: WebSocket, session_id: str):
     print(f"✅ WebSocket connected and accepted: {session_id}")
     logger.info(f"✅ WebSocket connected: {session_id}")
     
+    session_exam_raw = None
+    session_exam_id = None
     try:
+        # Tell the client how to encode frames before it starts sending them
+        await websocket.send_json({'type': 'capture_profile', 'data': proctoring_service.capture_profile()})
         # Throttle: only process a frame every 2 seconds per connection
         last_processed_time = 0.0
         FRAME_INTERVAL_SEC = 2.0
@@ -328,6 +706,22 @@ async def websocket_proctoring(websocket: WebSocket, session_id: str):
             message = json.loads(data)
             logger.info(f"📥 Received message type: {message.get('type')}")
             
+            # The exam is only known once the client sends it; announce the session to admins then
+            if message.get('exam_id') and message.get('exam_id') != session_exam_raw:
+                if session_exam_raw is not None:
+                    admin_broadcaster.publish_session(session_id, session_exam_id, 'disconnected')
+                session_exam_raw = message.get('exam_id')
+                session_exam_id = validate_uuid(session_exam_raw)
+                admin_broadcaster.publish_session(
+                    session_id, session_exam_id, 'connected',
+                    student_id=validate_uuid(message.get('student_id')),
+                    student_name=message.get('student_name')
+                )
+                # Load the registered face embedding for the periodic identity checks (in the background)
+                session_student_id = validate_uuid(message.get('student_id'))
+                if session_student_id:
+                    asyncio.get_running_loop().run_in_executor(None, identity_service.warm, session_student_id)
+            
             if message['type'] == 'frame':
                 student_name = message.get('student_name', 'Unknown')
                 student_id = message.get('student_id', 'Unknown')
@@ -353,10 +747,17 @@ async def websocket_proctoring(websocket: WebSocket, session_id: str):
                             frame,
                             session_id,
                             message.get('calibrated_pitch', 0.0),
-                            message.get('calibrated_yaw', 0.0)
+                            message.get('calibrated_yaw', 0.0),
+                            student_id=validate_uuid(message.get('student_id'))
                         )
                         logger.info(f"🎯 Detection result: {len(result.get('violations', []))} violations found")
                         logger.info(f"📊 Detection details: faces={result.get('face_count', 0)}, no_person={result.get('no_person', False)}, multiple={result.get('multiple_faces', False)}, looking_away={result.get('looking_away', False)}, phone={result.get('phone_detected', False)}, book={result.get('book_detected', False)}")
+                        admin_broadcaster.publish_session(
+                            session_id, session_exam_id, 'active',
+                            face_count=result.get('face_count', 0),
+                            looking_away=result.get('looking_away', False),
+                            violation_types=[v.get('type') for v in result.get('violations', [])]
+                        )
                         # Persist violations with snapshot evidence
                         try:
                             exam_id = message.get('exam_id')
@@ -412,12 +813,13 @@ async def websocket_proctoring(websocket: WebSocket, session_id: str):
                                             "movement": v.get("movement"),
                                             "change_count": v.get("change_count"),
                                             "audio_level": v.get("audio_level"),
+                                            "similarity": v.get("similarity"),
                                         },
                                         "image_url": image_url,
                                         "timestamp": datetime.utcnow().isoformat()
                                     }
                                     try:
-                                        supabase.table('violations').insert(violation_record).execute()
+                                        _insert_violation(violation_record)
                                         logger.info(f"✅ Violation saved: {v.get('type')} - exam_id={validated_exam_id}, student_id={validated_student_id}")
                                     except Exception as db_err:
                                         logger.error(f"❌ Insert violation failed: {db_err}")
@@ -464,73 +866,40 @@ async def websocket_proctoring(websocket: WebSocket, session_id: str):
                     })
                     
             elif message['type'] == 'audio':
-                # Process audio level
-                audio_level = message.get('audio_level', 0)
-                # Always echo current audio level so UI can update in real-time
-                await websocket.send_json({
-                    'type': 'audio_level',
-                    'data': {
-                        'level': float(audio_level),
-                        'timestamp': datetime.utcnow().isoformat()
-                    }
+                # Aggregate audio levels per session: one noise incident per episode, written in batches
+                audio_level = float(message.get('audio_level') or 0)
+                observed = audio_window_service.observe(session_id, audio_level, context={
+                    'exam_id': message.get('exam_id'),
+                    'student_id': message.get('student_id'),
+                    'student_name': message.get('student_name'),
+                    'subject_code': message.get('subject_code', ''),
+                    'subject_name': message.get('subject_name', ''),
                 })
-                # Record a violation if audio exceeds threshold (adjusted to be more sensitive)
-                try:
-                    AUDIO_THRESHOLD = 40  # 40% threshold for excessive noise
-                    if audio_level >= AUDIO_THRESHOLD:
-                        exam_id = message.get('exam_id')
-                        student_id = message.get('student_id')
-                        student_name = message.get('student_name')
-                        subject_code = message.get('subject_code', '')
-                        subject_name = message.get('subject_name', '')
-                        
-                        # Determine severity based on audio level
-                        if audio_level >= 70:
-                            severity = "high"
-                            severity_msg = "Very loud background noise"
-                        elif audio_level >= 55:
-                            severity = "medium"
-                            severity_msg = "Loud background noise"
-                        else:
-                            severity = "low"
-                            severity_msg = "Moderate background noise"
-                        
-                        logger.info(f"🔊 Audio violation detected: level={audio_level}%, threshold={AUDIO_THRESHOLD}%, severity={severity}")
-                        
-                        violation_record = {
-                            "id": str(uuid.uuid4()),
-                            "exam_id": validate_uuid(exam_id),
-                            "student_id": validate_uuid(student_id),
-                            "violation_type": "excessive_noise",
-                            "severity": severity,
-                            "details": {
-                                "message": f"{severity_msg} detected - Audio level: {audio_level:.0f}% (Threshold: {AUDIO_THRESHOLD}%)",
-                                "audio_level": audio_level,
-                                "threshold": AUDIO_THRESHOLD,
-                                "session_id": session_id,
-                                "student_name": student_name or "Unknown Student",
-                                "student_id": student_id or "Unknown ID",
-                                "subject_code": subject_code or "Unknown Code",
-                                "subject_name": subject_name or "Unknown Subject",
-                            },
-                            "image_url": None,  # No snapshot for audio violations
-                            "timestamp": datetime.utcnow().isoformat()
+                _queue_noise_incidents(observed['incidents'])
+                # Coalesced echo: at most once a second unless the level jumps or crosses the threshold
+                if observed['echo']:
+                    await websocket.send_json({
+                        'type': 'audio_level',
+                        'data': {
+                            'level': audio_level,
+                            'window': observed['window'],
+                            'timestamp': datetime.utcnow().isoformat()
                         }
-                        supabase.table('violations').insert(violation_record).execute()
-                        logger.info(f"✅ Audio violation saved: {severity_msg} - {audio_level}%")
-                        
-                        await websocket.send_json({
-                            'type': 'violation',
-                            'data': {
-                                'type': 'excessive_noise',
-                                'severity': severity,
-                                'message': f'{severity_msg} - {audio_level:.0f}%',
-                                'audio_level': audio_level,
-                                'timestamp': datetime.utcnow().isoformat()
-                            }
-                        })
-                except Exception as e:
-                    logger.error(f"❌ Audio violation insert failed: {e}")
+                    })
+                # Warn the student once when a noise episode starts
+                if observed['opened']:
+                    severity, severity_msg = noise_severity(audio_level)
+                    logger.info(f"🔊 Noise episode started: level={audio_level}%, threshold={audio_window_service.threshold}%, severity={severity}")
+                    await websocket.send_json({
+                        'type': 'violation',
+                        'data': {
+                            'type': 'excessive_noise',
+                            'severity': severity,
+                            'message': f'{severity_msg} - {audio_level:.0f}%',
+                            'audio_level': audio_level,
+                            'timestamp': datetime.utcnow().isoformat()
+                        }
+                    })
                     
             elif message['type'] == 'browser_activity':
                 # Handle browser activity violations (tab switch, copy/paste)
@@ -570,7 +939,7 @@ async def websocket_proctoring(websocket: WebSocket, session_id: str):
                         "image_url": None,  # No snapshot for browser activity
                         "timestamp": datetime.utcnow().isoformat()
                     }
-                    supabase.table('violations').insert(violation_record).execute()
+                    _insert_violation(violation_record)
                     logger.info(f"✅ Browser activity violation saved: {violation_type} - exam_id={validated_exam_id}, student_id={validated_student_id}")
                     
                     # Send violation alert back to client for real-time UI update
@@ -598,6 +967,45 @@ async def websocket_proctoring(websocket: WebSocket, session_id: str):
         logger.error(f"WebSocket error for {session_id}: {e}")
         if session_id in active_connections:
             del active_connections[session_id]
+    finally:
+        # A noise episode still open when the student leaves ends here
+        _queue_noise_incidents(audio_window_service.end_session(session_id))
+        proctoring_service.end_session(session_id)
+        if session_exam_raw is not None:
+            admin_broadcaster.publish_session(session_id, session_exam_id, 'disconnected')
+
+@app.websocket("/api/ws/admin")
+async def websocket_admin(websocket: WebSocket, exam_ids: str = "", token: str = ""):
+    """
+    Admin push channel. Sends a 'snapshot' of live sessions on connect, then one
+    'delta' per tick with the new violations and session status of each followed exam.
+    Query: exam_ids=a,b limits the feed (default: every exam); token must match
+    ADMIN_API_TOKEN, and the feed is closed when ADMIN_API_TOKEN is not set. Client messages:
+      {"type": "subscribe", "exam_ids": [...] | null}   replace the exam filter
+      {"type": "ping"}
+    """
+    # Same rule as require_admin: no token configured means the feed is disabled
+    if not ADMIN_API_TOKEN or token != ADMIN_API_TOKEN:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    subscriber = await admin_broadcaster.connect(websocket, [e for e in exam_ids.split(',') if e])
+    logger.info(f"👀 Admin subscriber connected ({admin_broadcaster.stats()['subscribers']} total)")
+    try:
+        while True:
+            message = json.loads(await websocket.receive_text())
+            if message.get('type') == 'subscribe':
+                admin_broadcaster.subscribe(subscriber, message.get('exam_ids'))
+                await admin_broadcaster.send_snapshot(subscriber)
+            elif message.get('type') == 'ping':
+                await websocket.send_json({'type': 'pong'})
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Admin WebSocket error: {e}")
+    finally:
+        admin_broadcaster.disconnect(subscriber)
+        logger.info("👀 Admin subscriber disconnected")
 
 @app.post("/api/upload-violation-snapshot")
 async def upload_violation_snapshot(
@@ -651,7 +1059,7 @@ async def create_violation(violation_data: dict):
             "timestamp": datetime.utcnow().isoformat()
         }
         
-        result = supabase.table('violations').insert(violation_record).execute()
+        _insert_violation(violation_record)
         
         return {
             "success": True,
@@ -662,26 +1070,409 @@ async def create_violation(violation_data: dict):
         logger.error(f"Error creating violation: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/violations")
-async def get_violations(exam_id: str = None, student_id: str = None):
-    """Get violations from Supabase"""
+@app.get("/api/violations/counters")
+async def get_violation_counters(
+    exam_id: Optional[str] = None,
+    student_id: Optional[str] = None,
+    include_students: bool = False
+):
+    """
+    Rolling violation counts maintained on the write path
+    No filter: overall totals plus one row per exam (include_students adds one row per student).
+    exam_id adds per-student counts for that exam.
+    """
+    if exam_id:
+        return {"success": True, "exam": violation_counters.exam(exam_id)}
+    if student_id:
+        return {"success": True, "student": violation_counters.student(student_id)}
+    summary = violation_counters.summary()
+    if include_students:
+        summary['students'] = violation_counters.students()
+    return {"success": True, **summary}
+
+@app.get("/api/violations/timeline", response_model=ViolationTimeline)
+async def get_violation_timeline(
+    exam_id: Optional[str] = None,
+    student_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    max_points: int = 200
+):
+    """
+    Violation counts over time for one exam, one student, or everything (no filter)
+    start defaults to the first violation in scope, end to now. The resolution
+    (10 s, 1 min or 10 min) is picked so at most max_points are returned.
+    """
+    if exam_id and student_id:
+        raise HTTPException(status_code=400, detail="Pass exam_id or student_id, not both")
+    if not 1 <= max_points <= TIMELINE_MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"max_points must be between 1 and {TIMELINE_MAX_POINTS}")
+    kind, scope_id = ('exam', exam_id) if exam_id else ('student', student_id) if student_id else ('all', '')
     try:
-        query = supabase.table('violations').select('*')
-        
+        # the first query for a scope loads it from the table
+        return await asyncio.to_thread(timeline_service.timeline, kind, scope_id, start, end, max_points)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error building violation timeline: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/violations/counters/rebuild", dependencies=[Depends(require_admin)])
+async def rebuild_violation_counters():
+    """Recount from the violations table (e.g. after rows were edited outside the backend)"""
+    await asyncio.to_thread(violation_counters.rebuild, _iter_violations_before)
+    violation_counters.checkpoint(force=True)
+    return {"success": True, **violation_counters.summary()}
+
+VIOLATION_COLUMNS = ('id', 'exam_id', 'student_id', 'violation_type', 'severity', 'timestamp', 'details', 'image_url')
+# compact mode drops the details JSON (it can carry base64 snapshots) and keeps only its short text fields
+COMPACT_VIOLATION_SELECT = ('id, exam_id, student_id, violation_type, severity, timestamp, image_url, '
+                            'message:details->>message, student_name:details->>student_name')
+VIOLATIONS_DEFAULT_LIMIT = 100
+VIOLATIONS_MAX_LIMIT = 1000
+
+def _encode_violation_cursor(row: Dict) -> str:
+    raw = json.dumps([row.get('timestamp'), str(row.get('id'))]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def _decode_violation_cursor(cursor: str):
+    try:
+        timestamp, violation_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(timestamp, str) or not isinstance(violation_id, str):
+            raise ValueError("cursor values must be strings")
+        return timestamp, violation_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _violation_select(fields: Optional[str], compact: bool) -> str:
+    if not fields:
+        return COMPACT_VIOLATION_SELECT if compact else '*'
+    requested = [f.strip() for f in fields.split(',') if f.strip()]
+    unknown = [f for f in requested if f not in VIOLATION_COLUMNS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    if compact and 'details' in requested:
+        raise HTTPException(status_code=400, detail="compact mode cannot include details")
+    # the cursor is built from timestamp and id, so they are always selected
+    columns = ['id', 'timestamp'] + [f for f in requested if f not in ('id', 'timestamp')]
+    return ', '.join(columns)
+
+@app.get("/api/violations")
+async def get_violations(
+    exam_id: str = None,
+    student_id: str = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    fields: Optional[str] = None,
+    compact: bool = False,
+    limit: int = VIOLATIONS_DEFAULT_LIMIT,
+    cursor: Optional[str] = None
+):
+    """
+    Get violations from Supabase, newest first, one page at a time
+    Pass the returned next_cursor back as `cursor` for the next page (null on the last page).
+    `fields` is a comma-separated column list; `compact` leaves out the details JSON.
+    The page is streamed as it is read instead of being built as one list.
+    """
+    limit = max(1, min(limit, VIOLATIONS_MAX_LIMIT))
+    after = _decode_violation_cursor(cursor) if cursor else None
+    columns = _violation_select(fields, compact)
+
+    def build_query():
+        query = supabase.table('violations').select(columns)
         if exam_id:
             query = query.eq('exam_id', exam_id)
         if student_id:
             query = query.eq('student_id', student_id)
-            
-        result = query.order('timestamp', desc=True).execute()
-        
+        if since:
+            query = query.gte('timestamp', since)
+        if until:
+            query = query.lte('timestamp', until)
+        return query
+
+    # read the first row eagerly so query errors still surface as a 500 before streaming starts
+    try:
+        rows = iter_keyset_desc(build_query, 'timestamp', after, page_size=min(limit + 1, 250))
+        first = next(rows, None)
+    except Exception as e:
+        logger.error(f"Error fetching violations: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    def stream():
+        yield '{"success": true, "violations": ['
+        sent = 0
+        last_row = None
+        tail = {}
+        try:
+            # one extra row tells us whether another page exists
+            for row in itertools.chain([first] if first else [], rows):
+                if sent == limit:
+                    break
+                yield (',' if sent else '') + json.dumps(row, default=str)
+                sent += 1
+                last_row = row
+            else:
+                last_row = None
+        except Exception as e:
+            logger.error(f"Error streaming violations: {e}")
+            last_row = None
+            tail["error"] = str(e)
+        tail["count"] = sent
+        tail["next_cursor"] = _encode_violation_cursor(last_row) if last_row else None
+        yield '], ' + json.dumps(tail)[1:]
+
+    return StreamingResponse(stream(), media_type="application/json")
+
+@app.get("/api/analytics/summary")
+async def analytics_summary(
+    exam_template_id: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    top: int = 5
+):
+    """Totals, top violation types, score distribution and top violators for the analytics dashboard"""
+    try:
+        data = await asyncio.to_thread(analytics_service.aggregate, exam_template_id, start, end)
         return {
             "success": True,
-            "violations": result.data
+            "filters": data['filters'],
+            "total_students": data['total_students'],
+            "total_exams": data['total_exams'],
+            "completed_exams": data['completed_exams'],
+            "total_violations": data['total_violations'],
+            "avg_score": data['scores']['avg_score'],
+            "violations_by_type": data['violations_by_type'][:top],
+            "score_distribution": data['scores']['distribution'],
+            "top_violators": data['top_violators'][:top]
         }
     except Exception as e:
-        logger.error(f"Error fetching violations: {e}")
+        logger.error(f"Analytics summary error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/analytics/violations")
+async def analytics_violations(
+    exam_template_id: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None
+):
+    """Violation counts by type and by severity"""
+    try:
+        data = await asyncio.to_thread(analytics_service.aggregate, exam_template_id, start, end)
+        return {
+            "success": True,
+            "filters": data['filters'],
+            "total_violations": data['total_violations'],
+            "by_type": data['violations_by_type'],
+            "by_severity": data['violations_by_severity']
+        }
+    except Exception as e:
+        logger.error(f"Analytics violations error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/analytics/top-violators")
+async def analytics_top_violators(
+    exam_template_id: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    limit: int = 5
+):
+    """Students with the most violations"""
+    try:
+        data = await asyncio.to_thread(analytics_service.aggregate, exam_template_id, start, end)
+        return {"success": True, "filters": data['filters'], "top_violators": data['top_violators'][:limit]}
+    except Exception as e:
+        logger.error(f"Analytics top violators error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/analytics/scores")
+async def analytics_scores(
+    exam_template_id: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None
+):
+    """MCQ score statistics and distribution"""
+    try:
+        data = await asyncio.to_thread(analytics_service.aggregate, exam_template_id, start, end)
+        return {"success": True, "filters": data['filters'], **data['scores']}
+    except Exception as e:
+        logger.error(f"Analytics scores error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/analytics/items")
+async def analytics_items(exam_template_id: str, include_incomplete: bool = False, group_fraction: float = 0.27):
+    """
+    Item analysis for one exam template: difficulty (p-value), discrimination index,
+    point-biserial correlation and option/distractor frequencies per question.
+    Uses completed exams unless include_incomplete is set; cached until new submissions arrive.
+    """
+    if not 0 < group_fraction <= 0.5:
+        raise HTTPException(status_code=400, detail="group_fraction must be in (0, 0.5]")
+    try:
+        statuses = None if include_incomplete else ('completed',)
+        data = await asyncio.to_thread(item_analysis_service.analyze, exam_template_id, statuses, group_fraction)
+        return {"success": True, **data}
+    except Exception as e:
+        logger.error(f"Error computing item analysis: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/students/{student_id}/report")
+async def student_report(student_id: str, exam_id: Optional[str] = None):
+    """
+    Student, exams, graded answers, deduplicated violations and summary stats in one call
+    exam_id narrows the report to one exam. Violations are matched by exam and student id only.
+    Reports whose exams are all completed are cached until regraded or a new violation arrives.
+    """
+    try:
+        data = await asyncio.to_thread(student_report_service.report, student_id, exam_id)
+        return {"success": True, **data}
+    except StudentNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error building student report: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _export_response(kind: str, export_format: str, pages, columns: List[str]):
+    """Stream pages as CSV, or as a Parquet file written one row group per page"""
+    if export_format not in ('csv', 'parquet'):
+        raise HTTPException(status_code=400, detail="format must be csv or parquet")
+    timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+    headers = {
+        "Content-Disposition": f'attachment; filename="{kind}_export_v{EXPORT_FORMAT_VERSION}_{timestamp}.{export_format}"',
+        "X-Export-Format-Version": str(EXPORT_FORMAT_VERSION),
+    }
+
+    if export_format == 'parquet':
+        # written to a temp file before responding so a missing pyarrow is a clean 501
+        try:
+            out = await asyncio.to_thread(export_service.write_parquet, pages, columns, kind)
+        except ExportUnavailableError as e:
+            raise HTTPException(status_code=501, detail=str(e))
+        except Exception as e:
+            logger.error(f"❌ {kind} export failed: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+        def stream_file():
+            with out:
+                while chunk := out.read(1024 * 1024):
+                    yield chunk
+        return StreamingResponse(stream_file(), media_type="application/vnd.apache.parquet", headers=headers)
+
+    # read the first page up front so query errors still become a 500
+    try:
+        pages = iter(pages)
+        first = await asyncio.to_thread(next, pages, None)
+    except Exception as e:
+        logger.error(f"❌ {kind} export failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    pages = itertools.chain([first] if first else [], pages)
+    return StreamingResponse(export_service.iter_csv(pages, columns), media_type="text/csv", headers=headers)
+
+@app.get("/api/export/violations", dependencies=[Depends(require_admin)])
+async def export_violations(
+    format: str = "csv",
+    exam_id: Optional[str] = None,
+    exam_template_id: Optional[str] = None,
+    student_id: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    include_snapshots: bool = False
+):
+    """
+    Export violations as CSV (streamed) or Parquet, oldest first
+    details are flattened to details_<key> columns; include_snapshots adds the evidence image_url.
+    """
+    pages = export_service.violation_pages(exam_id, exam_template_id, student_id, since, until, include_snapshots)
+    return await _export_response("violations", format, pages, violation_columns(include_snapshots))
+
+@app.get("/api/export/exams", dependencies=[Depends(require_admin)])
+async def export_exams(
+    format: str = "csv",
+    exam_id: Optional[str] = None,
+    exam_template_id: Optional[str] = None,
+    status: Optional[str] = None
+):
+    """Export exam sessions with scores and grades (plus student name/email) as CSV or Parquet"""
+    pages = export_service.exam_pages(exam_id, exam_template_id, status)
+    return await _export_response("exams", format, pages, EXAM_COLUMNS)
+
+@app.post("/api/admin/profile", dependencies=[Depends(require_admin)])
+async def capture_profile(
+    seconds: float = 10.0,
+    mode: str = "cprofile",
+    output: str = "text",
+    sort: str = "cumulative",
+    limit: int = 50,
+    interval_ms: float = 10.0
+):
+    """
+    Profile the server for N seconds and return the result as a file
+    mode: cprofile (deterministic, event loop thread only, output=text|pstats) or
+          sampling (collapsed stacks of every thread, lower overhead)
+    """
+    if mode not in ("cprofile", "sampling"):
+        raise HTTPException(status_code=400, detail="mode must be 'cprofile' or 'sampling'")
+    if output not in profiling_service.CPROFILE_OUTPUTS:
+        raise HTTPException(status_code=400, detail=f"output must be one of {', '.join(profiling_service.CPROFILE_OUTPUTS)}")
+    if sort not in profiling_service.SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(sorted(profiling_service.SORT_KEYS))}")
+    try:
+        content, media_type, extension = await profiling_service.profile_cpu(
+            seconds, mode=mode, output=output, sort=sort, limit=limit, interval_ms=interval_ms
+        )
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+    response = _attachment(content, media_type, f"profile_{mode}_{timestamp}.{extension}")
+    response.headers["X-Profile-Threads"] = "all" if mode == "sampling" else "event-loop"
+    return response
+
+@app.post("/api/admin/tracemalloc/start", dependencies=[Depends(require_admin)])
+async def start_tracemalloc(frames: int = 10, max_seconds: float = 120.0):
+    """Start tracemalloc; it stops on its own after max_seconds"""
+    return profiling_service.start_tracemalloc(frames=frames, max_seconds=max_seconds)
+
+@app.post("/api/admin/tracemalloc/stop", dependencies=[Depends(require_admin)])
+async def stop_tracemalloc():
+    return profiling_service.stop_tracemalloc()
+
+@app.get("/api/admin/tracemalloc/top", dependencies=[Depends(require_admin)])
+async def tracemalloc_top(limit: int = 25, key_type: str = "lineno"):
+    """Top allocation sites from the running tracemalloc trace, as a JSON file"""
+    report = profiling_service.top_allocations(limit=limit, key_type=key_type)
+    timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+    return _attachment(json.dumps(report, indent=2).encode('utf-8'), "application/json", f"tracemalloc_{timestamp}.json")
+
+@app.get("/api/admin/sessions/state", dependencies=[Depends(require_admin)])
+async def session_state_dump():
+    """Per-session state sizes held by ProctoringService, as a JSON file"""
+    sessions = proctoring_service.session_state_sizes()
+    report = {
+        'timestamp': datetime.utcnow().isoformat(),
+        'session_count': len(sessions),
+        'active_connections': len(active_connections),
+        'admin_broadcast': admin_broadcaster.stats(),
+        'frame_cache': proctoring_service.frame_cache.stats(),
+        'audio_windows': audio_window_service.stats(),
+        'total_bytes': sum(s['total_bytes'] for s in sessions.values()),
+        'sessions': sessions
+    }
+    timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+    return _attachment(json.dumps(report, indent=2).encode('utf-8'), "application/json", f"session_state_{timestamp}.json")
+
+@app.get("/api/admin/frame-cache", dependencies=[Depends(require_admin)])
+async def frame_cache_stats():
+    """Hits and misses (by reason) of the near-duplicate frame cache"""
+    return {"success": True, "enabled": proctoring_service.FRAME_CACHE_ENABLED, **proctoring_service.frame_cache.stats()}
+
+@app.get("/api/admin/sessions/{session_id}/telemetry", dependencies=[Depends(require_admin)])
+async def session_telemetry(session_id: str, window_sec: Optional[float] = 60.0):
+    """Recent per-frame telemetry for one session: latest sample plus per-field stats over window_sec"""
+    if window_sec is not None and window_sec <= 0:
+        raise HTTPException(status_code=400, detail="window_sec must be positive")
+    telemetry = proctoring_service.session_telemetry(session_id, window_sec)
+    if telemetry is None:
+        raise HTTPException(status_code=404, detail=f"No telemetry for session {session_id}")
+    return {"success": True, **telemetry}
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,109 @@
+"""
+Session Telemetry - fixed-size per-session history of per-frame measurements
+One preallocated float64 array per session used as a ring buffer: appends
+write a row in place, and windowed statistics read the last N seconds.
+Missing measurements (no face, no landmarks) are stored as NaN.
+"""
+import warnings
+from typing import Dict, Optional
+
+import numpy as np
+
+TELEMETRY_FIELDS = (
+    'timestamp', 'pitch', 'yaw', 'roll', 'face_count',
+    'eye_offset_x', 'eye_offset_y', 'face_center_x', 'face_center_y', 'brightness',
+)
+FIELD_INDEX = {name: i for i, name in enumerate(TELEMETRY_FIELDS)}
+_TS = FIELD_INDEX['timestamp']
+
+
+class TelemetryRing:
+    """Ring buffer of TELEMETRY_FIELDS rows, oldest rows overwritten once full"""
+
+    __slots__ = ('capacity', '_data', '_head', '_size')
+
+    def __init__(self, capacity: int = 600):
+        self.capacity = capacity
+        self._data = np.full((capacity, len(TELEMETRY_FIELDS)), np.nan, dtype=np.float64)
+        self._head = 0  # next row to write
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, timestamp: float, pitch: float = np.nan, yaw: float = np.nan, roll: float = np.nan,
+               face_count: float = np.nan, eye_offset_x: float = np.nan, eye_offset_y: float = np.nan,
+               face_center_x: float = np.nan, face_center_y: float = np.nan, brightness: float = np.nan):
+        """O(1): overwrite one preallocated row (fields in TELEMETRY_FIELDS order)"""
+        row = self._data[self._head]
+        row[0] = timestamp
+        row[1] = pitch
+        row[2] = yaw
+        row[3] = roll
+        row[4] = face_count
+        row[5] = eye_offset_x
+        row[6] = eye_offset_y
+        row[7] = face_center_x
+        row[8] = face_center_y
+        row[9] = brightness
+        self._head = (self._head + 1) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+
+    def latest(self) -> Optional[Dict[str, float]]:
+        if not self._size:
+            return None
+        row = self._data[(self._head - 1) % self.capacity]
+        return {name: _scalar(row[i]) for i, name in enumerate(TELEMETRY_FIELDS)}
+
+    def window(self, seconds: Optional[float] = None, now: Optional[float] = None) -> np.ndarray:
+        """Rows (oldest first) from the last `seconds` before now, or all rows; returns a copy"""
+        if self._size < self.capacity:
+            segments = (self._data[:self._size],)
+        else:
+            segments = (self._data[self._head:], self._data[:self._head])
+        if seconds is not None:
+            if now is None:
+                now = self._data[(self._head - 1) % self.capacity, _TS] if self._size else 0.0
+            cutoff = now - seconds
+            # each segment is in time order, so the window start is a binary search
+            segments = tuple(s[np.searchsorted(s[:, _TS], cutoff, side='left'):] for s in segments)
+        return np.concatenate(segments) if len(segments) > 1 else segments[0].copy()
+
+    def stats(self, seconds: Optional[float] = None, now: Optional[float] = None) -> Dict:
+        """Per-field count/mean/std/min/max over the window, ignoring missing values"""
+        rows = self.window(seconds, now)
+        summary = {'samples': int(rows.shape[0]), 'fields': {}}
+        if not rows.shape[0]:
+            return summary
+        summary['start'] = float(rows[0, _TS])
+        summary['end'] = float(rows[-1, _TS])
+        values = rows[:, 1:]
+        present = ~np.isnan(values)
+        counts = present.sum(axis=0)
+        with warnings.catch_warnings():
+            # all-NaN columns (e.g. no face in the window) are expected
+            warnings.simplefilter('ignore', RuntimeWarning)
+            means = np.nanmean(values, axis=0)
+            stds = np.nanstd(values, axis=0)
+            mins = np.nanmin(values, axis=0)
+            maxs = np.nanmax(values, axis=0)
+        for j, name in enumerate(TELEMETRY_FIELDS[1:]):
+            summary['fields'][name] = {
+                'count': int(counts[j]),
+                'mean': _scalar(means[j]),
+                'std': _scalar(stds[j]),
+                'min': _scalar(mins[j]),
+                'max': _scalar(maxs[j]),
+            }
+        return summary
+
+    @property
+    def nbytes(self) -> int:
+        return self._data.nbytes
+
+
+def _scalar(value) -> Optional[float]:
+    value = float(value)
+    return None if np.isnan(value) else value
+
@@ -0,0 +1,215 @@
+"""
+Student Report Service - one aggregated report per student (and optionally one exam)
+Reads the student, their exams, graded answers and violations with indexed
+lookups (ids only, no name matching) and caches the report once every exam
+in it is completed, since nothing but grading or a late violation changes it then.
+"""
+import logging
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from db_paging import chunked, iter_rows
+from grading_service import grading_service
+from ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+STUDENT_COLUMNS = 'id, name, email, student_id, subject_code, face_image_url, created_at'
+EXAM_COLUMNS = ('id, student_id, exam_template_id, subject_code, status, started_at, completed_at, created_at, '
+                'total_score, max_score, graded, graded_at, grade_letter')
+VIOLATION_COLUMNS = 'id, exam_id, student_id, violation_type, severity, timestamp, image_url, details'
+
+
+class StudentNotFoundError(LookupError):
+    """No student (or no such exam for the student) with the given id"""
+
+
+class StudentReportService:
+    """Builds student reports server-side and keeps completed ones in memory"""
+
+    def __init__(self, supabase, answer_key_cache, ttl_sec: float = 3600.0):
+        self.supabase = supabase
+        self.answer_key_cache = answer_key_cache
+        self.cache = TTLCache(ttl_sec=ttl_sec, max_entries=1000)
+        # exam / student id -> cache keys of reports that include it, for targeted invalidation
+        self._keys_by_ref: Dict[Tuple[str, str], Set[Tuple]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def report(self, student_id: str, exam_id: Optional[str] = None) -> Dict:
+        cache_key = (student_id, exam_id)
+        hit, cached = self.cache.get(cache_key)
+        if hit:
+            return {**cached, 'cached': True}
+
+        report = self._build(student_id, exam_id)
+        exams = report['exams']
+        if exams and all(e.get('status') == 'completed' for e in exams):
+            self.cache.set(cache_key, report)
+            with self._lock:
+                self._keys_by_ref[('student', student_id)].add(cache_key)
+                for exam in exams:
+                    self._keys_by_ref[('exam', exam['id'])].add(cache_key)
+        return {**report, 'cached': False}
+
+    def invalidate_for(self, exam_id: Optional[str] = None, student_id: Optional[str] = None) -> int:
+        """Drop cached reports that include the exam or student (after a regrade or a late violation)"""
+        keys = set()
+        with self._lock:
+            for ref in (('exam', exam_id), ('student', student_id)):
+                if ref[1]:
+                    keys |= self._keys_by_ref.pop(ref, set())
+        return sum(self.cache.invalidate(key) for key in keys)
+
+    def invalidate(self) -> int:
+        with self._lock:
+            self._keys_by_ref.clear()
+        return self.cache.invalidate()
+
+    # --- building ---
+    def _build(self, student_id: str, exam_id: Optional[str]) -> Dict:
+        students = (self.supabase.table('students').select(STUDENT_COLUMNS)
+                    .eq('id', student_id).execute().data or [])
+        if not students:
+            raise StudentNotFoundError(f"Student {student_id} not found")
+        student = students[0]
+
+        exam_query = self.supabase.table('exams').select(EXAM_COLUMNS).eq('student_id', student_id)
+        if exam_id:
+            exam_query = exam_query.eq('id', exam_id)
+        exams = exam_query.order('created_at', desc=True).execute().data or []
+        if exam_id and not exams:
+            raise StudentNotFoundError(f"Exam {exam_id} not found for student {student_id}")
+        exam_ids = [e['id'] for e in exams]
+
+        templates = self._templates({e['exam_template_id'] for e in exams if e.get('exam_template_id')})
+        answers_by_exam = self._answers(exam_ids)
+        questions_by_template = {}
+        graded_answers = []
+        for exam in exams:
+            template_id = exam.get('exam_template_id')
+            template = templates.get(template_id, {})
+            exam['subject_name'] = template.get('subject_name')
+            exam['subject_code'] = exam.get('subject_code') or template.get('subject_code')
+            exam['duration_minutes'] = template.get('duration_minutes')
+            exam['percentage'] = grading_service.calculate_percentage(exam.get('total_score') or 0,
+                                                                      exam.get('max_score') or 0)
+            exam['answer_summary'] = None
+            if not template_id:
+                continue
+            if template_id not in questions_by_template:
+                questions_by_template[template_id] = self._questions(template_id)
+            rows, summary = self._grade_answers(exam, answers_by_exam.get(exam['id'], []),
+                                                questions_by_template[template_id])
+            graded_answers.extend(rows)
+            exam['answer_summary'] = summary
+
+        violations = self._violations(student_id, exam_ids, exam_id)
+        return {
+            'student': student,
+            'exams': exams,
+            'answers': graded_answers,
+            'violations': violations,
+            'summary': self._summary(exams, violations),
+            'generated_at': datetime.utcnow().isoformat(),
+        }
+
+    def _templates(self, template_ids: Set[str]) -> Dict[str, Dict]:
+        templates = {}
+        for ids in chunked(sorted(template_ids)):
+            rows = (self.supabase.table('exam_templates').select('id, subject_name, subject_code, duration_minutes')
+                    .in_('id', list(ids)).execute().data or [])
+            templates.update({t['id']: t for t in rows})
+        return templates
+
+    def _questions(self, exam_template_id: str) -> Dict[int, Dict]:
+        rows = (self.supabase.table('exam_questions')
+                .select('question_number, question_text, question_type, options, correct_answer, points')
+                .eq('exam_template_id', exam_template_id)
+                .execute().data or [])
+        return {q['question_number']: q for q in rows}
+
+    def _answers(self, exam_ids: List[str]) -> Dict[str, List[Dict]]:
+        answers = defaultdict(list)
+        for ids in chunked(exam_ids):
+            for row in iter_rows(lambda ids=ids: (self.supabase.table('exam_answers')
+                                                  .select('id, exam_id, question_number, answer')
+                                                  .in_('exam_id', list(ids))
+                                                  .order('id'))):
+                answers[row['exam_id']].append(row)
+        return answers
+
+    def _grade_answers(self, exam: Dict, answers: List[Dict], questions: Dict[int, Dict]) -> Tuple[List[Dict], Dict]:
+        """Per-question results against the cached answer key, with the question text attached"""
+        key = self.answer_key_cache.answer_key(exam['exam_template_id'])
+        _, max_score, results = grading_service.grade_with_key(answers, key)
+        rows = []
+        for result in results['question_results']:
+            question = questions.get(result['question_number'], {})
+            rows.append({
+                'exam_id': exam['id'],
+                'question_number': result['question_number'],
+                'question_text': question.get('question_text'),
+                'question_type': question.get('question_type'),
+                'options': question.get('options'),
+                'answer': result['student_answer'],
+                'correct_answer': result['correct_answer'],
+                'points': result['points'],
+                'earned_points': result['earned_points'],
+                'is_correct': result['is_correct'],
+                'status': result['status'],
+            })
+        summary = {k: results[k] for k in ('correct_count', 'incorrect_count', 'unanswered_count')}
+        summary['max_score'] = max_score
+        return rows, summary
+
+    def _violations(self, student_id: str, exam_ids: List[str], exam_id: Optional[str]) -> List[Dict]:
+        """Rows for the student's exams plus rows tagged with the student, deduplicated by id"""
+        by_id = {}
+        for ids in chunked(exam_ids):
+            for row in iter_rows(lambda ids=ids: (self.supabase.table('violations').select(VIOLATION_COLUMNS)
+                                                  .in_('exam_id', list(ids)).order('id'))):
+                by_id[row['id']] = row
+        for row in iter_rows(lambda: (self.supabase.table('violations').select(VIOLATION_COLUMNS)
+                                      .eq('student_id', student_id).order('id'))):
+            # for a single-exam report keep the student's untagged rows but not other exams'
+            if exam_id and row.get('exam_id') not in (None, exam_id):
+                continue
+            by_id[row['id']] = row
+        return sorted(by_id.values(), key=lambda v: (v.get('timestamp') or '', str(v['id'])))
+
+    @staticmethod
+    def _summary(exams: List[Dict], violations: List[Dict]) -> Dict:
+        graded = [e for e in exams if e.get('graded')]
+        total_score = sum(e.get('total_score') or 0 for e in graded)
+        max_score = sum(e.get('max_score') or 0 for e in graded)
+        durations = []
+        for exam in exams:
+            if exam.get('status') == 'completed' and exam.get('started_at') and exam.get('completed_at'):
+                started = datetime.fromisoformat(exam['started_at'].replace('Z', '+00:00'))
+                completed = datetime.fromisoformat(exam['completed_at'].replace('Z', '+00:00'))
+                durations.append((completed - started).total_seconds() / 60)
+        answer_totals = Counter()
+        for exam in exams:
+            answer_totals.update(exam.get('answer_summary') or {})
+        return {
+            'total_exams': len(exams),
+            'completed_exams': sum(1 for e in exams if e.get('status') == 'completed'),
+            'graded_exams': len(graded),
+            'total_score': total_score,
+            'max_score': max_score,
+            'percentage': grading_service.calculate_percentage(total_score, max_score),
+            'correct_count': answer_totals['correct_count'],
+            'incorrect_count': answer_totals['incorrect_count'],
+            'unanswered_count': answer_totals['unanswered_count'],
+            'avg_exam_duration_minutes': round(sum(durations) / len(durations), 1) if durations else None,
+            'total_violations': len(violations),
+            'violations_by_type': dict(Counter(v.get('violation_type') for v in violations)),
+            'violations_by_severity': dict(Counter(v.get('severity') for v in violations)),
+            'first_violation_at': violations[0].get('timestamp') if violations else None,
+            'last_violation_at': violations[-1].get('timestamp') if violations else None,
+        }
+
+    def stats(self) -> Dict:
+        return self.cache.stats()
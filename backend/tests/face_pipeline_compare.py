@@ -0,0 +1,153 @@
+"""
+Accuracy and cost of the face pipelines on a replay set.
+
+Replays the same frames through every pipeline in ProctoringService.detect_faces
+("detection" = FaceDetection + FaceMesh on the face crop, "mesh" = one FaceMesh
+pass with max_num_faces=2, "yolo" = people counted from YOLO person boxes with
+FaceDetection as tie-breaker) and compares them against the first (reference)
+pipeline:
+  - face count agreement, bucketed 0 / 1 / 2+ (the no_person / single / multiple_faces decisions)
+  - confusion matrix of those buckets
+  - head pose difference (pitch/yaw/roll, degrees) on frames where both found one face
+  - time per frame for each pipeline (for "yolo", excluding the YOLO pass itself,
+    which process_frame runs for phone/book detection anyway)
+
+Frames are replayed in order, so each pipeline's FaceMesh tracking behaves as in a
+live session. The replay set is a video file or a directory of JPEG/PNG frames
+(sorted by name), e.g. frames saved from real exam sessions.
+
+Examples:
+    python tests/face_pipeline_compare.py --video replay.mp4
+    python tests/face_pipeline_compare.py --frames-dir replay_frames/ --pipelines detection,mesh --report faces.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from proctoring_service import FACE_PIPELINES, proctoring_service  # noqa: E402
+from ws_load_test import summarize_latencies  # noqa: E402
+
+BUCKETS = ('0', '1', '2+')
+
+
+def bucket(face_count: int) -> str:
+    return BUCKETS[min(face_count, 2)]
+
+
+def iter_frames(args):
+    if args.video:
+        capture = cv2.VideoCapture(args.video)
+        count = 0
+        while args.max_frames is None or count < args.max_frames:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            count += 1
+            yield frame
+        capture.release()
+        return
+    names = sorted(n for n in os.listdir(args.frames_dir) if n.lower().endswith(('.jpg', '.jpeg', '.png')))
+    for name in names[:args.max_frames]:
+        frame = cv2.imread(os.path.join(args.frames_dir, name))
+        if frame is not None:
+            yield frame
+
+
+def run(args) -> Dict:
+    pipelines: List[str] = args.pipelines
+    reference = pipelines[0]
+    timings = {p: [] for p in pipelines}
+    counts = {p: [] for p in pipelines}
+    poses = {p: [] for p in pipelines}
+
+    frames = 0
+    for frame in iter_frames(args):
+        frames += 1
+        height, width = frame.shape[:2]
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        persons = proctoring_service.detect_prohibited_objects(frame.copy())['persons'] if 'yolo' in pipelines else None
+        for pipeline in pipelines:
+            started = time.perf_counter()
+            face_count, landmarks = proctoring_service.detect_faces(rgb, pipeline, persons)
+            timings[pipeline].append((time.perf_counter() - started) * 1000)
+            counts[pipeline].append(face_count)
+            angles = proctoring_service.estimate_head_pose(landmarks, width, height) if landmarks else None
+            poses[pipeline].append(np.asarray(angles, dtype=np.float64) if angles is not None else None)
+    if not frames:
+        raise SystemExit("No frames in the replay set")
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'frames': frames,
+        'reference': reference,
+        'pipelines': {},
+    }
+    ref_buckets = [bucket(c) for c in counts[reference]]
+    for pipeline in pipelines:
+        buckets = [bucket(c) for c in counts[pipeline]]
+        confusion = {r: {b: 0 for b in BUCKETS} for r in BUCKETS}
+        for r, b in zip(ref_buckets, buckets):
+            confusion[r][b] += 1
+        pose_diffs = np.array([
+            np.abs(p - q) for p, q in zip(poses[reference], poses[pipeline]) if p is not None and q is not None
+        ]).reshape(-1, 3)
+        report['pipelines'][pipeline] = {
+            'time_per_frame': summarize_latencies(timings[pipeline]),
+            'face_count_distribution': {b: buckets.count(b) for b in BUCKETS},
+            'bucket_agreement': float(np.mean([r == b for r, b in zip(ref_buckets, buckets)])),
+            # rows: reference bucket, columns: this pipeline's bucket
+            'confusion': confusion,
+            'pose_frames_compared': int(pose_diffs.shape[0]),
+            'pose_abs_diff_deg': {
+                axis: {
+                    'mean': float(pose_diffs[:, i].mean()) if pose_diffs.size else None,
+                    'p95': float(np.percentile(pose_diffs[:, i], 95)) if pose_diffs.size else None,
+                }
+                for i, axis in enumerate(('pitch', 'yaw', 'roll'))
+            },
+        }
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare face pipelines on a replay set")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--video', help="Replay frames from this video file")
+    source.add_argument('--frames-dir', help="Replay JPEG/PNG frames from this directory, sorted by name")
+    parser.add_argument('--max-frames', type=int, default=None)
+    parser.add_argument('--pipelines', default=",".join(FACE_PIPELINES),
+                        help="Comma separated pipelines; the first one is the reference")
+    parser.add_argument('--report', default="face_pipeline_compare.json", help="Where to write the JSON report")
+    args = parser.parse_args(argv)
+    args.pipelines = [p.strip() for p in args.pipelines.split(',') if p.strip()]
+    unknown = [p for p in args.pipelines if p not in FACE_PIPELINES]
+    if unknown:
+        parser.error(f"unknown pipelines {unknown}; choose from {list(FACE_PIPELINES)}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run(args)
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+    for pipeline, stats in report['pipelines'].items():
+        line = (f"{pipeline:>10}: {stats['time_per_frame']['mean_ms']:.2f} ms/frame, "
+                f"count agreement {stats['bucket_agreement']:.1%} vs {report['reference']}")
+        yaw = stats['pose_abs_diff_deg']['yaw']['mean']
+        if yaw is not None:
+            line += f", mean |Δyaw| {yaw:.2f}°"
+        print(line)
+    print(f"\n📄 Report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Per-frame cost of shoulder tracking: face-center proxy vs MediaPipe Pose.
+
+Runs FaceMesh once per frame to get the face box (shared by every variant),
+then times:
+  proxy     - face center from the FaceMesh landmarks (the old shoulder proxy)
+  pose_full - MediaPipe Pose (lite) on the whole frame
+  pose_roi  - MediaPipe Pose on the crop below the face (ProctoringService.detect_shoulders)
+and reports the amortized pose_roi cost per processed frame for each --interval,
+i.e. what process_frame pays when pose runs every Nth frame.
+
+It also replays synthetic shoulder tracks through ProctoringService.track_shoulders
+at each --interval (no model needed) to check that the shoulder_movement rule
+still fires for a restless student and stays quiet for a still one.
+
+Use a real webcam recording or still for meaningful detection rates; the
+synthetic frame only measures cost (the detector runs and finds nothing).
+
+Examples:
+    python tests/shoulder_tracking_benchmark.py --video webcam.mp4 --frames 300
+    python tests/shoulder_tracking_benchmark.py --frame-file student.jpg --iterations 200 --interval 1,3,5,10
+    python tests/shoulder_tracking_benchmark.py --rule-only --interval 1,3,5
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from proctoring_service import proctoring_service  # noqa: E402
+from ws_load_test import summarize_latencies  # noqa: E402
+
+
+def load_frames(args) -> List[np.ndarray]:
+    if args.video:
+        capture = cv2.VideoCapture(args.video)
+        frames = []
+        while len(frames) < args.frames:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            frames.append(frame)
+        capture.release()
+        if not frames:
+            raise SystemExit(f"No frames read from {args.video}")
+        return frames
+    if args.frame_file:
+        frame = cv2.imread(args.frame_file)
+        if frame is None:
+            raise SystemExit(f"Could not read {args.frame_file}")
+        return [frame] * args.iterations
+    # synthetic head-and-shoulders silhouette, like the load test's face blob
+    rng = np.random.default_rng(0)
+    img = rng.integers(90, 170, size=(args.height, args.width, 3), dtype=np.uint8)
+    center = (args.width // 2, int(args.height * 0.35))
+    axes = (int(args.width * 0.09), int(args.height * 0.16))
+    cv2.ellipse(img, center, axes, 0, 0, 360, (150, 180, 210), -1)
+    cv2.ellipse(img, (center[0], args.height), (int(args.width * 0.25), int(args.height * 0.4)),
+                0, 180, 360, (60, 60, 120), -1)
+    return [img] * args.iterations
+
+
+def face_box(rgb_frame: np.ndarray) -> Optional[tuple]:
+    """(left, top, right, bottom) in pixels from the same landmarks process_frame uses"""
+    height, width = rgb_frame.shape[:2]
+    results = proctoring_service.mp_face_mesh.process(rgb_frame)
+    if not results.multi_face_landmarks:
+        return None
+    landmarks = results.multi_face_landmarks[0].landmark
+    return (landmarks[234].x * width, landmarks[10].y * height, landmarks[454].x * width, landmarks[152].y * height)
+
+
+def time_ms(fn) -> float:
+    started = time.perf_counter()
+    fn()
+    return (time.perf_counter() - started) * 1000
+
+
+def replay_rule(args) -> Dict:
+    """
+    Trigger rate and time to first shoulder_movement for synthetic tracks, per pose interval.
+    Frames arrive every --socket-interval seconds and shoulders are sampled every Nth frame.
+      restless: the body lands 10-15% of the frame left or right of center at random each frame
+      still:    2% jitter around the center
+    """
+    size = 1000.0
+    frames = int(args.rule_seconds / args.socket_interval)
+    tracks = {
+        'restless': lambda rng: (size / 2 + rng.choice((-1, 1)) * rng.uniform(0.10, 0.15) * size, size / 2),
+        'still': lambda rng: (size / 2 + rng.uniform(-0.02, 0.02) * size, size / 2 + rng.uniform(-0.02, 0.02) * size),
+    }
+    replay = {}
+    for n in args.interval:
+        replay[str(n)] = {'required_changes': proctoring_service.required_shoulder_changes(n)}
+        for name, position in tracks.items():
+            rng = random.Random(0)
+            first_trigger = []
+            for trial in range(args.trials):
+                session_id = f"shoulder-replay-{n}-{name}-{trial}"
+                for frame in range(0, frames, n):
+                    t = frame * args.socket_interval
+                    if proctoring_service.track_shoulders(session_id, position(rng), size, t, n)['triggered']:
+                        first_trigger.append(t)
+                        break
+                proctoring_service.end_session(session_id)
+            replay[str(n)][name] = {
+                'trigger_rate': len(first_trigger) / args.trials,
+                'median_sec_to_trigger': float(np.median(first_trigger)) if first_trigger else None,
+            }
+    return replay
+
+
+def run(args) -> Dict:
+    frames = load_frames(args)
+    timings = {'proxy': [], 'pose_full': [], 'pose_roi': []}
+    detections = {'pose_full': 0, 'pose_roi': 0}
+    frames_with_face = 0
+    fallback_box = None
+
+    for frame in frames:
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        height, width = rgb.shape[:2]
+        box = face_box(rgb)
+        if box is None:
+            # keep timing the pose variants on synthetic/faceless frames with a centered box
+            fallback_box = fallback_box or (width * 0.4, height * 0.2, width * 0.6, height * 0.5)
+            box = fallback_box
+        else:
+            frames_with_face += 1
+
+        timings['proxy'].append(time_ms(lambda: ((box[0] + box[2]) / 2, (box[1] + box[3]) / 2)))
+
+        full_result = {}
+        timings['pose_full'].append(time_ms(
+            lambda: full_result.setdefault('r', proctoring_service.mp_pose.process(rgb))))
+        detections['pose_full'] += bool(full_result['r'].pose_landmarks)
+
+        roi_result = {}
+        timings['pose_roi'].append(time_ms(
+            lambda: roi_result.setdefault('r', proctoring_service.detect_shoulders(rgb, box))))
+        detections['pose_roi'] += roi_result['r'] is not None
+
+    roi_mean = float(np.mean(timings['pose_roi']))
+    proxy_mean = float(np.mean(timings['proxy']))
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'frames': len(frames),
+        'frame_size': [int(frames[0].shape[1]), int(frames[0].shape[0])],
+        'frames_with_face': frames_with_face,
+        'variants': {name: summarize_latencies(values) for name, values in timings.items()},
+        'detection_rate': {name: count / len(frames) for name, count in detections.items()},
+        'amortized_per_frame_ms': {
+            str(n): {
+                'pose_roi': roi_mean / n,
+                'added_vs_proxy': roi_mean / n - proxy_mean,
+            }
+            for n in args.interval
+        },
+    }
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark shoulder tracking cost per frame")
+    parser.add_argument('--video', help="Read frames from this video file")
+    parser.add_argument('--frames', type=int, default=300, help="Maximum frames to read from --video")
+    parser.add_argument('--frame-file', help="Repeat this still image")
+    parser.add_argument('--iterations', type=int, default=100, help="Repetitions of a still or synthetic frame")
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--interval', default="1,3,5",
+                        help="Comma separated pose intervals (every Nth frame) to amortize over")
+    parser.add_argument('--socket-interval', type=float, default=2.0,
+                        help="Seconds between processed frames (the proctoring socket throttle) for the rule replay")
+    parser.add_argument('--rule-seconds', type=float, default=60.0, help="Length of each replayed track")
+    parser.add_argument('--trials', type=int, default=200, help="Replayed tracks per scenario and interval")
+    parser.add_argument('--rule-only', action='store_true', help="Only replay the rule, skip the pose timings")
+    parser.add_argument('--report', default="shoulder_tracking_benchmark.json", help="Where to write the JSON report")
+    args = parser.parse_args(argv)
+    args.interval = [int(n) for n in str(args.interval).split(',') if n.strip()]
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = {}
+    if not args.rule_only:
+        if proctoring_service.mp_pose is None:
+            raise SystemExit("MediaPipe Pose is not available in this environment (use --rule-only)")
+        report = run(args)
+    report['rule_replay'] = replay_rule(args)
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+    for name, stats in report.get('variants', {}).items():
+        detected = report['detection_rate'].get(name)
+        print(f"{name:>10}: mean {stats['mean_ms']:.3f} ms, p95 {stats['p95_ms']:.3f} ms"
+              + (f", shoulders found in {detected:.0%} of frames" if detected is not None else ""))
+    for n, cost in report.get('amortized_per_frame_ms', {}).items():
+        print(f"  pose every {n} frame(s): +{cost['added_vs_proxy']:.3f} ms per frame over the proxy")
+    for n, replay in report['rule_replay'].items():
+        restless, still = replay['restless'], replay['still']
+        print(f"  rule, pose every {n} frame(s) ({replay['required_changes']} changes): "
+              f"restless fires in {restless['trigger_rate']:.0%} of tracks"
+              + (f" (median {restless['median_sec_to_trigger']:.0f}s)" if restless['median_sec_to_trigger'] is not None else "")
+              + f", still in {still['trigger_rate']:.0%}")
+    print(f"\n📄 Report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
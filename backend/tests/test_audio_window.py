@@ -0,0 +1,109 @@
+"""
+Noise episodes and the incident write queue of AudioWindowService.
+    cd backend && python -m pytest tests/test_audio_window.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_window_service import AudioWindowService, noise_severity
+
+
+def make_service(**kwargs):
+    return AudioWindowService(threshold=40.0, hangover_sec=5.0, max_episode_sec=60.0, **kwargs)
+
+
+def rows(*ids):
+    return [{'id': i} for i in ids]
+
+
+def test_loud_sample_opens_one_episode():
+    service = make_service()
+    first = service.observe('s1', 50, now=0.0)
+    second = service.observe('s1', 60, now=1.0)
+    assert first['opened'] and not second['opened']
+    assert first['incidents'] == [] and second['incidents'] == []
+    assert service.stats()['open_episodes'] == 1
+
+
+def test_episode_closes_after_quiet_hangover():
+    service = make_service()
+    service.observe('s1', 50, now=0.0, context={'student_id': 'student-1'})
+    service.observe('s1', 70, now=1.0)
+    assert service.observe('s1', 10, now=3.0)['incidents'] == []
+    incidents = service.observe('s1', 10, now=6.0)['incidents']
+    assert len(incidents) == 1
+    incident = incidents[0]
+    assert incident['closed_by'] == 'quiet'
+    assert (incident['start'], incident['end'], incident['peak']) == (0.0, 1.0, 70)
+    assert incident['mean'] == 60.0
+    assert incident['student_id'] == 'student-1'
+    assert service.stats()['open_episodes'] == 0
+
+
+def test_long_episode_is_split_at_max_duration():
+    service = make_service()
+    closed = []
+    for second in range(0, 65):
+        closed += service.observe('s1', 50, now=float(second))['incidents']
+    assert [i['closed_by'] for i in closed] == ['max_duration']
+    assert service.stats()['open_episodes'] == 1
+
+
+def test_close_idle_and_end_session():
+    service = make_service()
+    service.observe('s1', 50, now=0.0)
+    service.observe('s2', 50, now=4.0)
+    assert [i['session_id'] for i in service.close_idle(now=6.0)] == ['s1']
+    assert [i['closed_by'] for i in service.end_session('s2')] == ['disconnected']
+    assert service.end_session('s2') == []
+
+
+def test_echo_is_debounced():
+    service = make_service()
+    assert service.observe('s1', 20, now=0.0)['echo']
+    assert not service.observe('s1', 22, now=0.5)['echo']
+    assert service.observe('s1', 35, now=0.6)['echo']  # moved by echo_min_delta
+    assert service.observe('s1', 41, now=0.7)['echo']  # crossed the threshold
+
+
+def test_requeue_puts_rows_back_in_order():
+    service = make_service()
+    service.enqueue(rows('a', 'b', 'c'))
+    batch = service.drain(2)
+    service.requeue(batch)
+    assert service.drain(10) == rows('a', 'b', 'c')
+
+
+def test_requeue_gives_up_after_max_attempts():
+    service = make_service()
+    service.enqueue(rows('a', 'b'))
+    for _ in range(2):
+        assert service.requeue(service.drain(1), max_attempts=3) == []
+    assert service.requeue(service.drain(1), max_attempts=3) == rows('a')
+    assert service.drain(10) == rows('b')
+    assert service.stats()['rejected'] == 1
+
+
+def test_written_rows_reset_attempts():
+    service = make_service()
+    service.enqueue(rows('a'))
+    service.requeue(service.drain(1), max_attempts=2)
+    service.mark_written(service.drain(1))
+    service.enqueue(rows('a'))
+    assert service.requeue(service.drain(1), max_attempts=2) == []
+    assert service.stats()['written'] == 1
+
+
+def test_queue_drops_oldest_past_max_pending():
+    service = make_service(max_pending=2)
+    service.enqueue(rows('a', 'b', 'c'))
+    assert service.drain(10) == rows('b', 'c')
+    assert service.stats()['dropped'] == 1
+
+
+def test_noise_severity_levels():
+    assert noise_severity(75)[0] == 'high'
+    assert noise_severity(60)[0] == 'medium'
+    assert noise_severity(45)[0] == 'low'
@@ -0,0 +1,61 @@
+"""
+Bulk regrade guard: a template without an answer key must not touch any exam.
+Runs against the in-process local Supabase, no network needed:
+    cd backend && python -m pytest tests/test_bulk_grading.py
+"""
+import copy
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from answer_key_cache import AnswerKeyCache
+from bulk_grading_service import BulkGradingService, EmptyAnswerKeyError
+from local_supabase import LocalSupabaseClient
+
+TEMPLATE_ID = 'template-1'
+
+
+def make_service(questions):
+    supabase = LocalSupabaseClient()
+    supabase.seed({
+        'exams': [
+            {'id': 'exam-1', 'student_id': 'student-1', 'exam_template_id': TEMPLATE_ID,
+             'status': 'completed', 'graded': False, 'total_score': None, 'grade_letter': None},
+            {'id': 'exam-2', 'student_id': 'student-2', 'exam_template_id': TEMPLATE_ID,
+             'status': 'completed', 'graded': True, 'total_score': 7, 'grade_letter': 'B'},
+        ],
+        'exam_answers': [
+            {'id': 'answer-1', 'exam_id': 'exam-1', 'question_number': 1, 'answer': 'A'},
+        ],
+        'exam_questions': questions,
+    })
+    return supabase, BulkGradingService(supabase, AnswerKeyCache(supabase))
+
+
+def exams(supabase):
+    return sorted(supabase.table('exams').select('*').execute().data, key=lambda e: e['id'])
+
+
+@pytest.mark.parametrize('questions', [
+    [],  # unknown template / questions not uploaded
+    [{'exam_template_id': TEMPLATE_ID, 'question_number': 1, 'correct_answer': 'A', 'points': 0}],
+])
+def test_empty_answer_key_leaves_exams_unchanged(questions):
+    supabase, service = make_service(questions)
+    before = copy.deepcopy(exams(supabase))
+    with pytest.raises(EmptyAnswerKeyError):
+        service.regrade(TEMPLATE_ID)
+    assert exams(supabase) == before
+
+
+def test_regrade_writes_scores():
+    supabase, service = make_service([
+        {'exam_template_id': TEMPLATE_ID, 'question_number': 1, 'correct_answer': 'A', 'points': 1},
+    ])
+    summary = service.regrade(TEMPLATE_ID)
+    assert summary['graded_exams'] == 2
+    scores = {e['id']: e['total_score'] for e in exams(supabase)}
+    assert scores == {'exam-1': 1, 'exam-2': 0}
@@ -0,0 +1,58 @@
+"""
+Keyset paging of iter_keyset_desc against the in-process local Supabase.
+    cd backend && python -m pytest tests/test_db_paging.py
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_paging import iter_keyset_desc
+from local_supabase import LocalSupabaseClient
+
+
+def make_rows(count):
+    # three rows share every timestamp, so pages and cursors land inside ties
+    return [{'id': f'{i:03d}', 'timestamp': f'2026-01-01T00:00:{i // 3:02d}'} for i in range(count)]
+
+
+def expected_order(rows):
+    return [r['id'] for r in sorted(rows, key=lambda r: (r['timestamp'], r['id']), reverse=True)]
+
+
+@pytest.fixture
+def supabase():
+    client = LocalSupabaseClient()
+    client.seed({'violations': make_rows(30)})
+    return client
+
+
+def build(supabase):
+    return lambda: supabase.table('violations').select('id, timestamp')
+
+
+@pytest.mark.parametrize('page_size', [1, 2, 7, 100])
+def test_yields_every_row_in_keyset_order(supabase, page_size):
+    ids = [r['id'] for r in iter_keyset_desc(build(supabase), 'timestamp', page_size=page_size)]
+    assert ids == expected_order(make_rows(30))
+
+
+@pytest.mark.parametrize('position', [0, 4, 5, 28])
+def test_cursor_skips_rows_up_to_and_including_it(supabase, position):
+    ordered = expected_order(make_rows(30))
+    cursor_row = next(r for r in make_rows(30) if r['id'] == ordered[position])
+    after = (cursor_row['timestamp'], cursor_row['id'])
+    ids = [r['id'] for r in iter_keyset_desc(build(supabase), 'timestamp', after, page_size=2)]
+    assert ids == ordered[position + 1:]
+
+
+def test_rows_inserted_mid_listing_do_not_shift_pages(supabase):
+    rows = iter_keyset_desc(build(supabase), 'timestamp', page_size=4)
+    ids = [next(rows)['id'] for _ in range(6)]
+    supabase.table('violations').insert(
+        [{'id': f'new-{i}', 'timestamp': '2026-01-01T00:01:00'} for i in range(5)]
+    ).execute()
+    ids += [r['id'] for r in rows]
+    assert ids == expected_order(make_rows(30))
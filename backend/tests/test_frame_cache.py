@@ -0,0 +1,65 @@
+"""
+FrameCache: reuse of detector outputs for near-identical frames.
+    cd backend && python -m pytest tests/test_frame_cache.py
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frame_cache import FrameCache, frame_hash, hamming
+
+
+def gradient(width=320, height=240, offset=0):
+    row = (np.arange(width) * 255 // width + offset).clip(0, 255).astype(np.uint8)
+    return np.tile(row, (height, 1))
+
+
+def test_similar_frames_hash_close_and_different_frames_far():
+    frame = gradient()
+    noisy = (frame.astype(np.int16) + np.random.default_rng(0).integers(-2, 3, frame.shape)).clip(0, 255)
+    assert hamming(frame_hash(frame), frame_hash(noisy.astype(np.uint8))) <= 8
+    assert hamming(frame_hash(frame), frame_hash(frame[:, ::-1].copy())) > 8
+
+
+def test_hit_within_distance_and_age():
+    cache = FrameCache(max_distance=8, max_age_sec=6.0)
+    hashed = frame_hash(gradient())
+    assert cache.lookup('s1', hashed, now=0.0) is None
+    cache.store('s1', hashed, now=0.0, value={'faces': 1})
+    assert cache.lookup('s1', hashed, now=1.0) == {'faces': 1}
+    assert cache.session_stats('s1') == {'hits': 1, 'misses': 1}
+
+
+def test_miss_reasons():
+    cache = FrameCache(max_distance=8, max_age_sec=6.0)
+    hashed = frame_hash(gradient())
+    cache.lookup('s1', hashed, now=0.0)
+    cache.store('s1', hashed, now=0.0, value='outputs')
+    cache.lookup('s1', frame_hash(gradient()[:, ::-1].copy()), now=1.0)
+    cache.lookup('s1', hashed, now=6.0)
+    assert cache.stats()['misses_by_reason'] == {'empty': 1, 'changed': 1, 'expired': 1}
+
+
+def test_hits_do_not_refresh_the_entry():
+    cache = FrameCache(max_age_sec=6.0)
+    hashed = frame_hash(gradient())
+    cache.store('s1', hashed, now=0.0, value='outputs')
+    for now in (2.0, 4.0):
+        assert cache.lookup('s1', hashed, now=now) == 'outputs'
+    assert cache.lookup('s1', hashed, now=6.5) is None
+
+
+def test_sessions_are_separate_and_drop_forgets_one():
+    cache = FrameCache()
+    hashed = frame_hash(gradient())
+    cache.store('s1', hashed, now=0.0, value='one')
+    cache.store('s2', hashed, now=0.0, value='two')
+    cache.lookup('s1', hashed, now=1.0)
+    cache.drop('s1')
+    assert cache.lookup('s1', hashed, now=1.0) is None
+    assert cache.lookup('s2', hashed, now=1.0) == 'two'
+    assert set(cache.entries()) == {'s2'}
+    assert cache.session_stats('s1') == {'hits': 0, 'misses': 1}
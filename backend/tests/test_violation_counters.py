@@ -0,0 +1,110 @@
+"""
+ViolationCounters: live recording, checkpoint reload, reconcile and rebuild.
+    cd backend && python -m pytest tests/test_violation_counters.py
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from violation_counters import ViolationCounters
+
+
+def violation(violation_id, exam_id='exam-1', student_id='student-1', violation_type='no_face',
+              severity='high', timestamp=None):
+    return {'id': violation_id, 'exam_id': exam_id, 'student_id': student_id, 'violation_type': violation_type,
+            'severity': severity, 'timestamp': timestamp or datetime.utcnow().isoformat()}
+
+
+def record(counters, row):
+    counters.record(row['exam_id'], row['student_id'], row['violation_type'], row['severity'],
+                    at=row['timestamp'], violation_id=row['id'])
+
+
+def since_filter(rows):
+    return lambda since: [r for r in rows if r['timestamp'] >= since]
+
+
+def test_record_updates_every_breakdown():
+    counters = ViolationCounters()
+    record(counters, violation('v1'))
+    record(counters, violation('v2', student_id='student-2', violation_type='phone', severity='medium'))
+    summary = counters.summary()
+    assert summary['overall']['total'] == 2
+    assert summary['overall']['by_severity'] == {'high': 1, 'medium': 1}
+    assert counters.exam('exam-1')['by_student'] == {'student-1': 1, 'student-2': 1}
+    assert counters.student('student-2')['by_type'] == {'phone': 1}
+    assert set(counters.students()) == {'student-1', 'student-2'}
+
+
+def test_missing_keys_count_as_unknown():
+    counters = ViolationCounters()
+    counters.record(None, None, 'no_face', None)
+    assert counters.exam('unknown')['total'] == 1
+    assert counters.summary()['overall']['by_severity'] == {'unknown': 1}
+
+
+def test_reconcile_counts_only_rows_after_the_checkpoint(tmp_path):
+    path = str(tmp_path / 'counters.json')
+    before = ViolationCounters(path)
+    counted = [violation('v1'), violation('v2')]
+    for row in counted:
+        record(before, row)
+    assert before.checkpoint()
+
+    restored = ViolationCounters(path)
+    assert restored.load()
+    assert restored.summary()['overall']['total'] == 2
+    missed = [violation('v3'), violation('v4', exam_id='exam-2')]
+    assert restored.reconcile(since_filter(counted + missed)) == 2
+    assert restored.summary()['overall']['total'] == 4
+    assert restored.exam('exam-2')['total'] == 1
+    # the loaded checkpoint is consumed, a second reconcile adds nothing
+    assert restored.reconcile(since_filter(counted + missed)) == 0
+
+
+def test_reconcile_skips_rows_recorded_live_since_startup(tmp_path):
+    path = str(tmp_path / 'counters.json')
+    before = ViolationCounters(path)
+    record(before, violation('v1'))
+    before.checkpoint()
+
+    restored = ViolationCounters(path)
+    restored.load()
+    live = violation('v2')
+    record(restored, live)
+    assert restored.reconcile(since_filter([live])) == 0
+    assert restored.summary()['overall']['total'] == 2
+
+
+def test_reconcile_without_checkpoint_is_a_no_op():
+    counters = ViolationCounters()
+    assert not counters.load()
+    assert counters.reconcile(lambda since: [violation('v1')]) == 0
+
+
+def test_rebuild_keeps_violations_recorded_during_the_scan():
+    counters = ViolationCounters()
+    record(counters, violation('stale'))  # replaced by the recount
+    old = (datetime.utcnow() - timedelta(days=1)).isoformat()
+    stored = [violation('v1', timestamp=old), violation('v2', timestamp=old, severity='low')]
+
+    def iter_violations(before):
+        for row in stored:
+            assert row['timestamp'] < before
+            yield row
+        record(counters, violation('live'))  # arrives while the scan runs
+
+    counters.rebuild(iter_violations)
+    overall = counters.summary()['overall']
+    assert overall['total'] == 3
+    assert overall['by_severity'] == {'high': 2, 'low': 1}
+
+
+def test_checkpoint_skipped_when_unchanged(tmp_path):
+    counters = ViolationCounters(str(tmp_path / 'counters.json'))
+    record(counters, violation('v1'))
+    assert counters.checkpoint()
+    assert not counters.checkpoint()
+    assert counters.checkpoint(force=True)
@@ -0,0 +1,330 @@
+"""
+WebSocket load generator for the proctoring backend.
+
+Opens N concurrent /api/ws/proctoring/{session_id} connections against a local
+server and replays a realistic mix of frame, audio, browser_activity and ping
+messages. Measures round-trip latency per message type, the server's frame
+skip (throttle) rate and socket errors, and writes a JSON report.
+
+Examples:
+    python tests/ws_load_test.py --students 50 --duration 60
+    python tests/ws_load_test.py --students 10,25,50,100 --slo-p99-ms 500 --report load.json
+
+With a comma separated --students list the cohort sizes run one after another
+and the report names the largest cohort whose frame p99 stayed within the SLO.
+
+Every student sends the same frame, so start the server with FRAME_CACHE=off
+to measure the full detector cost instead of near-duplicate frame cache hits.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+import websockets
+
+
+# Reply types that close out a pending request of each outgoing message type.
+# browser_activity has no guaranteed reply (the server stays silent when the
+# insert fails) and the audio_level echo is coalesced per session, so both are
+# counted but not timed.
+REPLY_TYPES = {
+    'frame': ('detection_result', 'detection_skipped', 'error'),
+    'ping': ('pong',),
+}
+UNTIMED_TYPES = ('audio', 'browser_activity')
+# Messages the server pushes without a matching request
+UNSOLICITED_TYPES = ('violation', 'audio_level', 'capture_profile')
+
+
+def make_test_frame(width: int = 1280, height: int = 720, quality: int = 80) -> str:
+    """
+    Build a noisy webcam-sized JPEG with a face-like blob and return it as a
+    data URL, matching what StudentExam.tsx sends via canvas.toDataURL.
+    """
+    rng = np.random.default_rng(0)
+    img = rng.integers(90, 170, size=(height, width, 3), dtype=np.uint8)
+    center = (width // 2, int(height * 0.45))
+    axes = (int(width * 0.12), int(height * 0.22))
+    cv2.ellipse(img, center, axes, 0, 0, 360, (150, 180, 210), -1)
+    cv2.circle(img, (center[0] - axes[0] // 2, center[1] - axes[1] // 4), axes[0] // 8, (30, 30, 30), -1)
+    cv2.circle(img, (center[0] + axes[0] // 2, center[1] - axes[1] // 4), axes[0] // 8, (30, 30, 30), -1)
+    _, buffer = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return "data:image/jpeg;base64," + base64.b64encode(buffer).decode('utf-8')
+
+
+def load_frame_file(path: str) -> str:
+    """Read an existing JPEG from disk and return it as a data URL"""
+    with open(path, 'rb') as f:
+        return "data:image/jpeg;base64," + base64.b64encode(f.read()).decode('utf-8')
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    return float(np.percentile(np.asarray(values, dtype=np.float64), pct))
+
+
+def summarize_latencies(values: List[float]) -> Dict:
+    return {
+        'count': len(values),
+        'mean_ms': float(np.mean(values)) if values else None,
+        'p50_ms': percentile(values, 50),
+        'p95_ms': percentile(values, 95),
+        'p99_ms': percentile(values, 99),
+        'max_ms': float(np.max(values)) if values else None,
+    }
+
+
+class CohortStats:
+    """Counters and latency samples shared by every simulated student in a run"""
+
+    def __init__(self):
+        self.latencies_ms: Dict[str, List[float]] = {t: [] for t in REPLY_TYPES}
+        self.detection_latencies_ms: List[float] = []
+        self.sent: Dict[str, int] = {t: 0 for t in list(REPLY_TYPES) + list(UNTIMED_TYPES)}
+        self.received: Dict[str, int] = {}
+        self.frames_processed = 0
+        self.frames_skipped = 0
+        self.frame_errors = 0
+        self.violations_received = 0
+        self.connect_failures = 0
+        self.socket_errors = 0
+        self.unmatched_replies = 0
+        self.connected = 0
+
+    def to_dict(self) -> Dict:
+        answered = self.frames_processed + self.frames_skipped
+        return {
+            'connected': self.connected,
+            'connect_failures': self.connect_failures,
+            'socket_errors': self.socket_errors,
+            'sent': self.sent,
+            'received': self.received,
+            'frames_processed': self.frames_processed,
+            'frames_skipped': self.frames_skipped,
+            'frame_errors': self.frame_errors,
+            'skip_rate': (self.frames_skipped / answered) if answered else None,
+            'violations_received': self.violations_received,
+            'unmatched_replies': self.unmatched_replies,
+            'latency': {t: summarize_latencies(v) for t, v in self.latencies_ms.items()},
+            # Round trip of frames that actually went through detection
+            'detection_latency': summarize_latencies(self.detection_latencies_ms),
+        }
+
+
+async def simulate_student(index: int, args, frame_b64: str, stats: CohortStats, stop_at: float) -> None:
+    """Drive one student connection until stop_at (event loop time)"""
+    loop = asyncio.get_running_loop()
+    session_id = f"load-{args.run_id}-{index}"
+    url = f"{args.ws_url}/api/ws/proctoring/{session_id}"
+    identity = {
+        'exam_id': str(uuid.uuid4()),
+        'student_id': str(uuid.uuid4()),
+        'student_name': f"Load Student {index}",
+        'subject_code': 'LOAD000',
+        'subject_name': 'Load Test',
+    }
+    # Requests awaiting a reply, FIFO per message type (the server answers in order)
+    pending: Dict[str, deque] = {t: deque() for t in REPLY_TYPES}
+    reply_owner = {reply: msg_type for msg_type, replies in REPLY_TYPES.items() for reply in replies}
+    rng = random.Random(index)
+
+    try:
+        ws = await websockets.connect(url, ping_interval=None, max_size=None, open_timeout=args.connect_timeout)
+    except Exception:
+        stats.connect_failures += 1
+        return
+    stats.connected += 1
+
+    async def receiver():
+        async for raw in ws:
+            now = loop.time()
+            try:
+                message = json.loads(raw)
+            except ValueError:
+                stats.unmatched_replies += 1
+                continue
+            msg_type = message.get('type')
+            stats.received[msg_type] = stats.received.get(msg_type, 0) + 1
+            if msg_type in UNSOLICITED_TYPES:
+                if msg_type == 'violation':
+                    stats.violations_received += 1
+                continue
+            owner = reply_owner.get(msg_type)
+            if owner is None or not pending[owner]:
+                stats.unmatched_replies += 1
+                continue
+            latency_ms = (now - pending[owner].popleft()) * 1000.0
+            stats.latencies_ms[owner].append(latency_ms)
+            if msg_type == 'detection_result':
+                stats.frames_processed += 1
+                stats.detection_latencies_ms.append(latency_ms)
+            elif msg_type == 'detection_skipped':
+                stats.frames_skipped += 1
+            elif msg_type == 'error':
+                stats.frame_errors += 1
+
+    async def send(msg_type: str, payload: Dict):
+        payload['type'] = msg_type
+        if msg_type in pending:
+            pending[msg_type].append(loop.time())
+        stats.sent[msg_type] += 1
+        await ws.send(json.dumps(payload))
+
+    async def periodic(msg_type: str, rate_hz: float, build):
+        if rate_hz <= 0:
+            return
+        interval = 1.0 / rate_hz
+        # Spread students over the first interval so they don't fire in lockstep
+        await asyncio.sleep(rng.uniform(0, interval))
+        while loop.time() < stop_at:
+            await send(msg_type, build())
+            await asyncio.sleep(interval * rng.uniform(0.9, 1.1))
+
+    def frame_payload():
+        return {
+            'frame': frame_b64,
+            'calibrated_pitch': 0.0,
+            'calibrated_yaw': 0.0,
+            'audio_level': 0,
+            **identity,
+        }
+
+    def audio_payload():
+        # Mostly quiet room with occasional loud spikes
+        level = rng.uniform(60, 90) if rng.random() < args.noise_ratio else rng.uniform(0, 30)
+        return {'audio_level': level, **identity}
+
+    def browser_payload():
+        violation_type = rng.choice(['tab_switch', 'copy_paste'])
+        return {'violation_type': violation_type, 'message': f'Load test {violation_type}', **identity}
+
+    receive_task = asyncio.create_task(receiver())
+    senders = [
+        periodic('frame', args.frame_rate, frame_payload),
+        periodic('audio', args.audio_rate, audio_payload),
+        periodic('browser_activity', args.browser_rate, browser_payload),
+        periodic('ping', args.ping_rate, lambda: {}),
+    ]
+    try:
+        await asyncio.gather(*senders)
+        # Give in-flight requests a chance to come back before closing
+        await asyncio.sleep(args.drain)
+    except Exception:
+        stats.socket_errors += 1
+    finally:
+        receive_task.cancel()
+        try:
+            await receive_task
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            stats.socket_errors += 1
+        await ws.close()
+
+
+async def run_cohort(students: int, args, frame_b64: str) -> Dict:
+    stats = CohortStats()
+    loop = asyncio.get_running_loop()
+    started = time.time()
+    stop_at = loop.time() + args.ramp_up + args.duration
+
+    async def delayed(i):
+        if args.ramp_up > 0:
+            await asyncio.sleep(args.ramp_up * i / students)
+        await simulate_student(i, args, frame_b64, stats, stop_at)
+
+    await asyncio.gather(*(delayed(i) for i in range(students)))
+    report = stats.to_dict()
+    report['students'] = students
+    report['wall_time_sec'] = round(time.time() - started, 3)
+    p99 = report['latency']['frame']['p99_ms']
+    report['slo_p99_ms'] = args.slo_p99_ms
+    report['slo_met'] = (
+        p99 is not None
+        and p99 <= args.slo_p99_ms
+        and stats.connect_failures == 0
+        and stats.socket_errors == 0
+    )
+    return report
+
+
+async def main_async(args) -> Dict:
+    frame_b64 = load_frame_file(args.frame_file) if args.frame_file else make_test_frame(args.width, args.height)
+    runs = []
+    for students in args.students:
+        print(f"[LOAD] {students} students for {args.duration}s against {args.ws_url} ...")
+        run = await run_cohort(students, args, frame_b64)
+        frame_lat = run['latency']['frame']
+        print(f"  frame p50={frame_lat['p50_ms']} p99={frame_lat['p99_ms']} "
+              f"skip_rate={run['skip_rate']} errors={run['socket_errors'] + run['connect_failures']} "
+              f"slo_met={run['slo_met']}")
+        runs.append(run)
+        if args.stop_on_breach and not run['slo_met']:
+            break
+
+    passing = [r['students'] for r in runs if r['slo_met']]
+    return {
+        'generated_at': datetime.utcnow().isoformat(),
+        'ws_url': args.ws_url,
+        'config': {
+            'duration_sec': args.duration,
+            'ramp_up_sec': args.ramp_up,
+            'frame_rate_hz': args.frame_rate,
+            'audio_rate_hz': args.audio_rate,
+            'browser_rate_hz': args.browser_rate,
+            'ping_rate_hz': args.ping_rate,
+            'frame_bytes': len(frame_b64),
+            'slo_p99_ms': args.slo_p99_ms,
+        },
+        'max_students_within_slo': max(passing) if passing else None,
+        'runs': runs,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent WebSocket load generator for the proctoring backend")
+    parser.add_argument('--ws-url', default=os.environ.get("PROCTORING_WS_URL", "ws://localhost:8001"))
+    parser.add_argument('--students', default="10",
+                        help="Concurrent students, or a comma separated list of cohort sizes to step through")
+    parser.add_argument('--duration', type=float, default=30.0, help="Seconds of steady load per cohort")
+    parser.add_argument('--ramp-up', type=float, default=5.0, help="Seconds over which connections are opened")
+    parser.add_argument('--drain', type=float, default=3.0, help="Seconds to wait for replies after sending stops")
+    parser.add_argument('--frame-rate', type=float, default=1.0, help="Frames per second per student")
+    parser.add_argument('--audio-rate', type=float, default=2.0, help="Audio level messages per second per student")
+    parser.add_argument('--browser-rate', type=float, default=0.02, help="Browser activity events per second per student")
+    parser.add_argument('--ping-rate', type=float, default=1 / 30, help="Heartbeats per second per student")
+    parser.add_argument('--noise-ratio', type=float, default=0.05, help="Share of audio messages above the noise threshold")
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--frame-file', help="Replay this JPEG instead of a synthetic frame")
+    parser.add_argument('--connect-timeout', type=float, default=10.0)
+    parser.add_argument('--slo-p99-ms', type=float, default=1000.0, help="Frame round-trip p99 SLO in milliseconds")
+    parser.add_argument('--stop-on-breach', action='store_true', help="Stop stepping cohorts once the SLO is missed")
+    parser.add_argument('--report', default="ws_load_report.json", help="Where to write the JSON report")
+    args = parser.parse_args(argv)
+    args.students = [int(s) for s in str(args.students).split(',') if s.strip()]
+    args.run_id = uuid.uuid4().hex[:8]
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = asyncio.run(main_async(args))
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📄 Report written to {args.report} (max students within SLO: {report['max_students_within_slo']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Timeline Service - time-bucketed violation counts at several resolutions
+Keeps 10 s, 1 min and 10 min buckets per exam, per student and overall.
+A scope is loaded from Supabase the first time it is queried and then kept
+current from the violation write path. Queries pick the finest resolution
+that fits the requested range in max_points, merging buckets if needed.
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from db_paging import iter_rows
+
+logger = logging.getLogger(__name__)
+
+RESOLUTIONS_SEC = (10, 60, 600)
+# buckets kept per resolution: 6 h of 10 s, 48 h of 1 min, 30 days of 10 min
+MAX_BUCKETS = (2160, 2880, 4320)
+GLOBAL_SCOPE = ('all', '')
+
+
+def to_epoch(value) -> Optional[float]:
+    """Violation timestamps are ISO strings, naive ones are UTC"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class _ScopeTimeline:
+    """Bucket counts for one scope at every resolution"""
+
+    __slots__ = ('buckets', 'horizons')
+
+    def __init__(self):
+        self.buckets: List[Dict[int, int]] = [{} for _ in RESOLUTIONS_SEC]
+        # earliest bucket still held once old buckets have been pruned
+        self.horizons: List[Optional[int]] = [None for _ in RESOLUTIONS_SEC]
+
+    def add(self, epoch: float, count: int = 1):
+        for i, resolution in enumerate(RESOLUTIONS_SEC):
+            start = int(epoch // resolution) * resolution
+            if self.horizons[i] is not None and start < self.horizons[i]:
+                continue
+            buckets = self.buckets[i]
+            buckets[start] = buckets.get(start, 0) + count
+            if len(buckets) > MAX_BUCKETS[i] * 1.25:
+                self._prune(i)
+
+    def _prune(self, i: int):
+        keys = sorted(self.buckets[i])
+        for key in keys[:-MAX_BUCKETS[i]]:
+            del self.buckets[i][key]
+        self.horizons[i] = keys[-MAX_BUCKETS[i]]
+
+    def earliest(self) -> Optional[int]:
+        coarse = self.buckets[-1]
+        return min(coarse) if coarse else None
+
+
+class TimelineService:
+    """Per-scope violation timelines, hydrated lazily and updated on every insert"""
+
+    HYDRATE_DAYS_GLOBAL = 30  # the overall timeline only loads what the coarsest resolution keeps
+
+    def __init__(self, supabase, max_scopes: int = 5000):
+        self.supabase = supabase
+        self.max_scopes = max_scopes
+        self._scopes: "OrderedDict[Tuple[str, str], _ScopeTimeline]" = OrderedDict()
+        self._hydrating: Dict[Tuple[str, str], Tuple[threading.Event, list]] = {}
+        self._lock = threading.Lock()
+
+    # --- write path ---
+    def record(self, violation_record: Dict):
+        epoch = to_epoch(violation_record.get('timestamp'))
+        if epoch is None:
+            return
+        scopes = [GLOBAL_SCOPE]
+        if violation_record.get('exam_id'):
+            scopes.append(('exam', violation_record['exam_id']))
+        if violation_record.get('student_id'):
+            scopes.append(('student', violation_record['student_id']))
+        with self._lock:
+            for scope in scopes:
+                timeline = self._scopes.get(scope)
+                if timeline is not None:
+                    timeline.add(epoch)
+                elif scope in self._hydrating:
+                    # merged after the load unless the load already saw this row
+                    self._hydrating[scope][1].append((violation_record.get('id'), epoch))
+                # scopes never queried are built from the table on first use
+
+    # --- hydration ---
+    def _scope(self, scope: Tuple[str, str]) -> _ScopeTimeline:
+        with self._lock:
+            timeline = self._scopes.get(scope)
+            if timeline is not None:
+                self._scopes.move_to_end(scope)
+                return timeline
+            waiting = self._hydrating.get(scope)
+            if waiting is None:
+                self._hydrating[scope] = (threading.Event(), [])
+        if waiting is not None:
+            waiting[0].wait()
+            return self._scope(scope)
+        try:
+            return self._hydrate(scope)
+        finally:
+            with self._lock:
+                event, _ = self._hydrating.pop(scope, (None, None))
+            if event:
+                event.set()
+
+    def _hydrate(self, scope: Tuple[str, str]) -> _ScopeTimeline:
+        kind, scope_id = scope
+        started = time.time()
+
+        def build():
+            query = self.supabase.table('violations').select('id, timestamp')
+            if kind == 'exam':
+                query = query.eq('exam_id', scope_id)
+            elif kind == 'student':
+                query = query.eq('student_id', scope_id)
+            else:
+                since = datetime.utcfromtimestamp(started - self.HYDRATE_DAYS_GLOBAL * 86400).isoformat()
+                query = query.gte('timestamp', since)
+            return query.order('id')
+
+        timeline = _ScopeTimeline()
+        recent_ids = set()  # only rows near the load window can also be pending
+        rows = 0
+        for row in iter_rows(build):
+            epoch = to_epoch(row.get('timestamp'))
+            if epoch is None:
+                continue
+            timeline.add(epoch)
+            rows += 1
+            if epoch >= started - 60:
+                recent_ids.add(row.get('id'))
+
+        with self._lock:
+            for violation_id, epoch in self._hydrating[scope][1]:
+                if violation_id not in recent_ids:
+                    timeline.add(epoch)
+            self._scopes[scope] = timeline
+            if scope != GLOBAL_SCOPE:
+                while len(self._scopes) > self.max_scopes:
+                    oldest = next(k for k in self._scopes if k != GLOBAL_SCOPE)
+                    del self._scopes[oldest]
+        label = f"{kind} {scope_id}" if scope_id else "all violations"
+        logger.info(f"📈 Timeline loaded for {label}: {rows} violations")
+        return timeline
+
+    # --- reads ---
+    def timeline(self, kind: str, scope_id: str = '', start=None, end=None, max_points: int = 200) -> Dict:
+        """
+        Counts between start and end (ISO strings or datetimes; default: the scope's
+        first violation or the last hour, until now) in at most max_points buckets
+        """
+        scope = GLOBAL_SCOPE if kind == 'all' else (kind, scope_id)
+        timeline = self._scope(scope)
+        end_epoch = to_epoch(end) if end is not None else time.time()
+        if start is not None:
+            start_epoch = to_epoch(start)
+        else:
+            with self._lock:
+                earliest = timeline.earliest()
+            start_epoch = earliest if earliest is not None else end_epoch - 3600
+        if end_epoch <= start_epoch:
+            raise ValueError("end must be after start")
+
+        resolution_index, merge = self._pick_resolution(timeline, start_epoch, end_epoch, max_points)
+        resolution = RESOLUTIONS_SEC[resolution_index]
+        bucket_sec = resolution * merge
+        first = int(start_epoch // resolution) * resolution
+        n_points = max(1, math.ceil((end_epoch - first) / bucket_sec))
+        counts = [0] * n_points
+        with self._lock:
+            items = list(timeline.buckets[resolution_index].items())
+        for bucket_start, count in items:
+            if first <= bucket_start < end_epoch:
+                counts[min(int((bucket_start - first) // bucket_sec), n_points - 1)] += count
+
+        return {
+            'scope': kind,
+            'scope_id': scope_id or None,
+            'start': datetime.fromtimestamp(first, tz=timezone.utc),
+            'end': datetime.fromtimestamp(end_epoch, tz=timezone.utc),
+            'resolution_sec': resolution,
+            'bucket_sec': bucket_sec,
+            'total': sum(counts),
+            'points': [
+                {'timestamp': datetime.fromtimestamp(first + i * bucket_sec, tz=timezone.utc), 'count': c}
+                for i, c in enumerate(counts)
+            ],
+        }
+
+    @staticmethod
+    def _pick_resolution(timeline: _ScopeTimeline, start_epoch: float, end_epoch: float,
+                         max_points: int) -> Tuple[int, int]:
+        """Finest resolution whose buckets fit in max_points and still cover start; else merge the coarsest"""
+        def n_buckets(resolution):
+            first = int(start_epoch // resolution) * resolution
+            return math.ceil((end_epoch - first) / resolution)
+
+        covering = [i for i, horizon in enumerate(timeline.horizons) if horizon is None or start_epoch >= horizon]
+        if not covering:
+            covering = [len(RESOLUTIONS_SEC) - 1]
+        for i in covering:
+            if n_buckets(RESOLUTIONS_SEC[i]) <= max_points:
+                return i, 1
+        coarsest = covering[-1]
+        return coarsest, math.ceil(n_buckets(RESOLUTIONS_SEC[coarsest]) / max_points)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'scopes': len(self._scopes),
+                'buckets': sum(sum(len(b) for b in t.buckets) for t in self._scopes.values()),
+            }
@@ -0,0 +1,68 @@
+"""
+TTL Cache - small thread-safe in-memory cache with per-entry expiry
+Used for short-lived server-side caching of aggregate query results
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """LRU-bounded dict whose entries expire after a time-to-live"""
+
+    def __init__(self, ttl_sec: float, max_entries: int = 256):
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """Return (hit, value)"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl_sec: Optional[float] = None):
+        expires_at = time.monotonic() + (self.ttl_sec if ttl_sec is None else ttl_sec)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any], ttl_sec: Optional[float] = None) -> Any:
+        hit, value = self.get(key)
+        if hit:
+            return value
+        value = compute()
+        self.set(key, value, ttl_sec)
+        return value
+
+    def invalidate(self, key: Optional[Hashable] = None, predicate: Optional[Callable[[Hashable], bool]] = None) -> int:
+        """Drop one key, every key matching predicate, or everything when neither is given"""
+        with self._lock:
+            if key is not None:
+                return 1 if self._entries.pop(key, None) is not None else 0
+            if predicate is None:
+                count = len(self._entries)
+                self._entries.clear()
+                return count
+            doomed = [k for k in self._entries if predicate(k)]
+            for k in doomed:
+                del self._entries[k]
+            return len(doomed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,280 @@
+"""
+Violation Counters - rolling violation counts maintained on the write path
+Counts are kept per exam, per student, per violation type and per severity so
+dashboards can read totals in O(number of exams) instead of recounting rows.
+State is checkpointed to a JSON file and reloaded on startup; rows written after
+the checkpoint (lost on a crash) are counted again by reconcile().
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN_KEY = "unknown"
+# ids of violations recorded this long before a checkpoint are saved with it, so
+# reconcile() can tell rows already counted from rows written after the checkpoint
+RECENT_ID_WINDOW_SEC = 300
+
+
+class _Tally:
+    """Total plus breakdown by type and severity"""
+
+    __slots__ = ('total', 'by_type', 'by_severity', 'last_at')
+
+    def __init__(self):
+        self.total = 0
+        self.by_type: Counter = Counter()
+        self.by_severity: Counter = Counter()
+        self.last_at: Optional[str] = None
+
+    def add(self, violation_type: str, severity: str, count: int, at: Optional[str]):
+        self.total += count
+        self.by_type[violation_type] += count
+        self.by_severity[severity] += count
+        if at and (self.last_at is None or at > self.last_at):
+            self.last_at = at
+
+    def merge(self, other: '_Tally'):
+        self.total += other.total
+        self.by_type.update(other.by_type)
+        self.by_severity.update(other.by_severity)
+        if other.last_at and (self.last_at is None or other.last_at > self.last_at):
+            self.last_at = other.last_at
+
+    def to_dict(self) -> Dict:
+        return {
+            'total': self.total,
+            'by_type': dict(self.by_type),
+            'by_severity': dict(self.by_severity),
+            'last_violation_at': self.last_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> '_Tally':
+        tally = cls()
+        tally.total = int(data.get('total', 0))
+        tally.by_type = Counter(data.get('by_type', {}))
+        tally.by_severity = Counter(data.get('by_severity', {}))
+        tally.last_at = data.get('last_violation_at')
+        return tally
+
+
+class _CounterState:
+    def __init__(self):
+        self.overall = _Tally()
+        self.exams: Dict[str, _Tally] = {}
+        self.students: Dict[str, _Tally] = {}
+        self.exam_students: Dict[str, Counter] = {}
+
+    def add(self, exam_id: str, student_id: str, violation_type: str, severity: str, count: int, at: Optional[str]):
+        self.overall.add(violation_type, severity, count, at)
+        self.exams.setdefault(exam_id, _Tally()).add(violation_type, severity, count, at)
+        self.students.setdefault(student_id, _Tally()).add(violation_type, severity, count, at)
+        self.exam_students.setdefault(exam_id, Counter())[student_id] += count
+
+    def merge(self, other: '_CounterState'):
+        self.overall.merge(other.overall)
+        for key, tally in other.exams.items():
+            self.exams.setdefault(key, _Tally()).merge(tally)
+        for key, tally in other.students.items():
+            self.students.setdefault(key, _Tally()).merge(tally)
+        for key, counts in other.exam_students.items():
+            self.exam_students.setdefault(key, Counter()).update(counts)
+
+    def to_dict(self) -> Dict:
+        return {
+            'overall': self.overall.to_dict(),
+            'exams': {k: v.to_dict() for k, v in self.exams.items()},
+            'students': {k: v.to_dict() for k, v in self.students.items()},
+            'exam_students': {k: dict(v) for k, v in self.exam_students.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> '_CounterState':
+        state = cls()
+        state.overall = _Tally.from_dict(data.get('overall', {}))
+        state.exams = {k: _Tally.from_dict(v) for k, v in data.get('exams', {}).items()}
+        state.students = {k: _Tally.from_dict(v) for k, v in data.get('students', {}).items()}
+        state.exam_students = {k: Counter(v) for k, v in data.get('exam_students', {}).items()}
+        return state
+
+
+class ViolationCounters:
+    """Thread-safe incremental violation counters with JSON checkpoints"""
+
+    CHECKPOINT_VERSION = 1
+
+    def __init__(self, checkpoint_path: Optional[str] = None):
+        self.checkpoint_path = checkpoint_path
+        self._state = _CounterState()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._rebuild_delta: Optional[_CounterState] = None
+        self._recent_ids: deque = deque()  # (recorded at, violation id)
+        self._loaded_checkpoint: Optional[Dict] = None
+        self.last_checkpoint_at: Optional[float] = None
+
+    def record(self, exam_id: Optional[str], student_id: Optional[str], violation_type: Optional[str],
+               severity: Optional[str], at: Optional[str] = None, count: int = 1,
+               violation_id: Optional[str] = None):
+        """Count a persisted violation; call after the insert succeeds"""
+        args = (exam_id or UNKNOWN_KEY, student_id or UNKNOWN_KEY, violation_type or UNKNOWN_KEY,
+                severity or UNKNOWN_KEY, count, at)
+        with self._lock:
+            self._state.add(*args)
+            if self._rebuild_delta is not None:
+                self._rebuild_delta.add(*args)
+            if violation_id:
+                now = time.time()
+                self._recent_ids.append((now, violation_id))
+                while self._recent_ids and now - self._recent_ids[0][0] > RECENT_ID_WINDOW_SEC:
+                    self._recent_ids.popleft()
+            self._dirty = True
+
+    # --- reads ---
+    def summary(self) -> Dict:
+        """Overall totals plus one row per exam - O(number of exams)"""
+        with self._lock:
+            return {
+                'overall': self._state.overall.to_dict(),
+                'exam_count': len(self._state.exams),
+                'student_count': len(self._state.students),
+                'exams': {k: v.to_dict() for k, v in self._state.exams.items()},
+            }
+
+    def exam(self, exam_id: str) -> Dict:
+        with self._lock:
+            tally = self._state.exams.get(exam_id)
+            students = self._state.exam_students.get(exam_id, Counter())
+            return {
+                'exam_id': exam_id,
+                **(tally.to_dict() if tally else _Tally().to_dict()),
+                'by_student': dict(students),
+            }
+
+    def student(self, student_id: str) -> Dict:
+        with self._lock:
+            tally = self._state.students.get(student_id)
+            return {'student_id': student_id, **(tally.to_dict() if tally else _Tally().to_dict())}
+
+    def students(self) -> Dict[str, Dict]:
+        """Tally of every student - O(number of students)"""
+        with self._lock:
+            return {k: v.to_dict() for k, v in self._state.students.items()}
+
+    # --- persistence ---
+    def checkpoint(self, force: bool = False) -> bool:
+        """Write counters to checkpoint_path atomically; skipped when nothing changed"""
+        if not self.checkpoint_path:
+            return False
+        with self._lock:
+            if not (self._dirty or force):
+                return False
+            now = time.time()
+            payload = {
+                'version': self.CHECKPOINT_VERSION,
+                'written_at': datetime.utcnow().isoformat(),
+                'state': self._state.to_dict(),
+                'recent_ids': [i for at, i in self._recent_ids if now - at <= RECENT_ID_WINDOW_SEC],
+            }
+            self._dirty = False
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(payload, f)
+            os.replace(tmp_path, self.checkpoint_path)
+            self.last_checkpoint_at = time.time()
+            return True
+        except Exception as e:
+            with self._lock:
+                self._dirty = True
+            logger.error(f"❌ Violation counter checkpoint failed: {e}")
+            return False
+
+    def load(self) -> bool:
+        """Restore counters from the checkpoint file; returns False when there is none"""
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return False
+        try:
+            with open(self.checkpoint_path) as f:
+                payload = json.load(f)
+            if payload.get('version') != self.CHECKPOINT_VERSION:
+                logger.warning(f"⚠️ Ignoring violation counter checkpoint with version {payload.get('version')}")
+                return False
+            state = _CounterState.from_dict(payload.get('state', {}))
+        except Exception as e:
+            logger.error(f"❌ Could not load violation counter checkpoint: {e}")
+            return False
+        with self._lock:
+            self._state = state
+            self._dirty = False
+            self._loaded_checkpoint = {
+                'written_at': payload.get('written_at'),
+                'recent_ids': set(payload.get('recent_ids', [])),
+            }
+        logger.info(f"📈 Violation counters restored: {state.overall.total} violations across {len(state.exams)} exams")
+        return True
+
+    def reconcile(self, iter_violations: Callable[[str], Iterable[Dict]]) -> int:
+        """
+        Count rows written after the loaded checkpoint. iter_violations(since_iso) must
+        yield rows (with id) whose timestamp >= since_iso; rows already counted by the
+        checkpoint or recorded live since startup are skipped. Returns rows added.
+        """
+        with self._lock:
+            checkpoint = self._loaded_checkpoint
+            self._loaded_checkpoint = None
+        if not checkpoint or not checkpoint.get('written_at'):
+            return 0
+        # older checkpoints carry no ids: start exactly at written_at
+        window = RECENT_ID_WINDOW_SEC if checkpoint['recent_ids'] else 0
+        since = (datetime.fromisoformat(checkpoint['written_at']) - timedelta(seconds=window)).isoformat()
+        with self._lock:
+            counted = checkpoint['recent_ids'] | {i for _, i in self._recent_ids}
+        missed = _CounterState()
+        added = 0
+        for row in iter_violations(since):
+            if row.get('id') in counted:
+                continue
+            missed.add(row.get('exam_id') or UNKNOWN_KEY, row.get('student_id') or UNKNOWN_KEY,
+                       row.get('violation_type') or UNKNOWN_KEY, row.get('severity') or UNKNOWN_KEY,
+                       1, row.get('timestamp'))
+            added += 1
+        if added:
+            with self._lock:
+                self._state.merge(missed)
+                self._dirty = True
+        logger.info(f"📈 Violation counters reconciled: {added} violations written after the checkpoint")
+        return added
+
+    def rebuild(self, iter_violations: Callable[[str], Iterable[Dict]]):
+        """
+        Recount from stored rows. iter_violations(before_iso) must yield rows with
+        timestamp < before_iso; violations recorded live while the scan runs are
+        merged in afterwards so none are lost or double counted.
+        """
+        started_at = datetime.utcnow().isoformat()
+        with self._lock:
+            self._rebuild_delta = _CounterState()
+        scanned = _CounterState()
+        try:
+            for row in iter_violations(started_at):
+                scanned.add(row.get('exam_id') or UNKNOWN_KEY, row.get('student_id') or UNKNOWN_KEY,
+                            row.get('violation_type') or UNKNOWN_KEY, row.get('severity') or UNKNOWN_KEY,
+                            1, row.get('timestamp'))
+        except Exception:
+            with self._lock:
+                self._rebuild_delta = None
+            raise
+        with self._lock:
+            scanned.merge(self._rebuild_delta)
+            self._state = scanned
+            self._rebuild_delta = None
+            self._dirty = True
+        logger.info(f"📈 Violation counters rebuilt: {scanned.overall.total} violations across {len(scanned.exams)} exams")
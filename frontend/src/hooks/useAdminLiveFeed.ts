@@ -0,0 +1,147 @@
+import { useEffect, useRef, useState, useCallback } from 'react';
+
+export interface LiveViolation {
+  id: string;
+  exam_id: string | null;
+  student_id: string | null;
+  violation_type: string;
+  severity: string;
+  timestamp: string;
+  image_url: string | null;
+  details: {
+    message?: string;
+    student_name?: string;
+    session_id?: string;
+    subject_code?: string;
+    subject_name?: string;
+  };
+}
+
+export interface LiveSession {
+  session_id: string;
+  exam_id: string | null;
+  status: 'connected' | 'active' | 'disconnected';
+  updated_at: string;
+  student_id?: string | null;
+  student_name?: string;
+  face_count?: number;
+  looking_away?: boolean;
+  violation_types?: string[];
+}
+
+export interface ExamDelta {
+  violations: LiveViolation[];
+  new_violations: number;
+  dropped_violations: number;
+  violations_by_type: Record<string, number>;
+  sessions: Record<string, LiveSession>;
+}
+
+interface UseAdminLiveFeedOptions {
+  // Exams to follow; undefined follows every exam
+  examIds?: string[];
+  onDelta: (exams: Record<string, ExamDelta>) => void;
+  onSnapshot?: (sessions: LiveSession[]) => void;
+  enabled?: boolean;
+}
+
+/**
+ * Admin push channel (/api/ws/admin): one coalesced delta per server tick
+ * instead of a realtime event per violation insert.
+ */
+export const useAdminLiveFeed = ({ examIds, onDelta, onSnapshot, enabled = true }: UseAdminLiveFeedOptions) => {
+  const wsRef = useRef<WebSocket | null>(null);
+  const reconnectTimeoutRef = useRef<NodeJS.Timeout | null>(null);
+  const reconnectAttemptsRef = useRef(0);
+  const onDeltaRef = useRef(onDelta);
+  const onSnapshotRef = useRef(onSnapshot);
+  const examIdsRef = useRef(examIds);
+  const [isConnected, setIsConnected] = useState(false);
+
+  const getWebSocketURL = () => {
+    if (import.meta.env.VITE_PROCTORING_WS_URL) {
+      return import.meta.env.VITE_PROCTORING_WS_URL;
+    }
+    const backendURL = import.meta.env.VITE_PROCTORING_API_URL || 'http://localhost:8001';
+    return backendURL.replace('https://', 'wss://').replace('http://', 'ws://');
+  };
+
+  useEffect(() => {
+    onDeltaRef.current = onDelta;
+    onSnapshotRef.current = onSnapshot;
+  }, [onDelta, onSnapshot]);
+
+  const connect = useCallback(() => {
+    if (!enabled) return;
+
+    const params = new URLSearchParams();
+    if (examIdsRef.current?.length) params.set('exam_ids', examIdsRef.current.join(','));
+    if (import.meta.env.VITE_ADMIN_API_TOKEN) params.set('token', import.meta.env.VITE_ADMIN_API_TOKEN);
+    const ws = new WebSocket(`${getWebSocketURL()}/api/ws/admin?${params.toString()}`);
+
+    ws.onopen = () => {
+      console.log('✅ Admin live feed connected');
+      reconnectAttemptsRef.current = 0;
+      setIsConnected(true);
+    };
+
+    ws.onmessage = (event) => {
+      try {
+        const message = JSON.parse(event.data);
+        if (message.type === 'delta') {
+          onDeltaRef.current(message.data.exams);
+        } else if (message.type === 'snapshot') {
+          onSnapshotRef.current?.(message.data.sessions);
+        }
+      } catch (error) {
+        console.error('❌ Error processing admin feed message:', error);
+      }
+    };
+
+    ws.onerror = (error) => {
+      console.error('❌ Admin live feed error:', error);
+    };
+
+    ws.onclose = () => {
+      setIsConnected(false);
+      if (wsRef.current !== ws) return;
+      const delay = Math.min(1000 * Math.pow(2, reconnectAttemptsRef.current), 30000);
+      reconnectAttemptsRef.current += 1;
+      reconnectTimeoutRef.current = setTimeout(connect, delay);
+    };
+
+    wsRef.current = ws;
+  }, [enabled]);
+
+  useEffect(() => {
+    connect();
+    return () => {
+      if (reconnectTimeoutRef.current) clearTimeout(reconnectTimeoutRef.current);
+      const ws = wsRef.current;
+      wsRef.current = null;
+      ws?.close();
+    };
+  }, [connect]);
+
+  // Change the exam filter without reconnecting
+  const examKey = examIds?.join(',') ?? '';
+  useEffect(() => {
+    examIdsRef.current = examIds;
+    if (wsRef.current?.readyState === WebSocket.OPEN) {
+      wsRef.current.send(JSON.stringify({ type: 'subscribe', exam_ids: examIds?.length ? examIds : null }));
+    }
+  }, [examKey]);
+
+  // Heartbeat to keep connection alive
+  useEffect(() => {
+    if (!isConnected) return;
+    const interval = setInterval(() => {
+      if (wsRef.current?.readyState === WebSocket.OPEN) {
+        wsRef.current.send(JSON.stringify({ type: 'ping' }));
+      }
+    }, 30000);
+    return () => clearInterval(interval);
+  }, [isConnected]);
+
+  return { isConnected };
+};
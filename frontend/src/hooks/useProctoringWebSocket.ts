@@ -1,5 +1,11 @@
 import { useEffect, useRef, useState, useCallback } from 'react';
 import { toast } from 'sonner';
+import {
+  CaptureProfile,
+  DEFAULT_CAPTURE_PROFILE,
+  captureFrame as encodeFrame,
+  parseCaptureProfile,
+} from '@/utils/frameCapture';
 
 interface ViolationData {
   type: string;
@@ -50,6 +56,9 @@ export const useProctoringWebSocket = ({
   const wsRef = useRef<WebSocket | null>(null);
   const reconnectTimeoutRef = useRef<NodeJS.Timeout | null>(null);
   const onViolationRef = useRef(onViolation);
+  const captureCanvasRef = useRef<HTMLCanvasElement | null>(null);
+  const captureProfileRef = useRef<CaptureProfile>(DEFAULT_CAPTURE_PROFILE);
+  const [captureProfile, setCaptureProfile] = useState<CaptureProfile>(DEFAULT_CAPTURE_PROFILE);
   const [isConnected, setIsConnected] = useState(false);
   const [reconnectAttempts, setReconnectAttempts] = useState(0);
   const maxReconnectAttempts = 50;
@@ -96,7 +105,12 @@ export const useProctoringWebSocket = ({
           const data = JSON.parse(event.data);
           console.log('📥 WebSocket message received:', data);
           
-          if (data.type === 'detection_result') {
+          if (data.type === 'capture_profile') {
+            const profile = parseCaptureProfile(data.data);
+            console.log('🎛️ Capture profile from backend:', profile);
+            captureProfileRef.current = profile;
+            setCaptureProfile(profile);
+          } else if (data.type === 'detection_result') {
             const result: DetectionResult = data.data;
             console.log('🔍 Detection result:', result);
             
@@ -202,6 +216,14 @@ export const useProctoringWebSocket = ({
     }
   }, [calibratedPitch, calibratedYaw, examId, studentId, studentName, subjectCode, subjectName]);
 
+  // Encode the current video frame with the backend's capture profile (downscaled JPEG)
+  const captureFrame = useCallback((video: HTMLVideoElement) => {
+    if (!captureCanvasRef.current) {
+      captureCanvasRef.current = document.createElement('canvas');
+    }
+    return encodeFrame(video, captureProfileRef.current, captureCanvasRef.current);
+  }, []);
+
   const sendAudioLevel = useCallback((audioLevel: number) => {
     if (wsRef.current?.readyState === WebSocket.OPEN) {
       wsRef.current.send(JSON.stringify({
@@ -273,6 +295,8 @@ export const useProctoringWebSocket = ({
 
   return {
     isConnected,
+    captureProfile,
+    captureFrame,
     sendFrame,
     sendAudioLevel,
     sendBrowserActivity,
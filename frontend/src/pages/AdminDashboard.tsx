@@ -1,4 +1,4 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useCallback, useRef } from "react";
 import { useNavigate } from "react-router-dom";
 import { Shield, Activity, Users, AlertTriangle, LogOut, Upload, RefreshCw, Download, FileText, Eye, Monitor } from "lucide-react";
 import { Button } from "@/components/ui/button";
@@ -8,11 +8,28 @@ import { toast } from "sonner";
 import { supabase } from "@/integrations/supabase/client";
 import { LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer } from 'recharts';
 import { pdfGenerator } from "@/utils/pdfGenerator";
+import { useAdminLiveFeed, ExamDelta } from "@/hooks/useAdminLiveFeed";
+
+// Live deltas update the totals immediately; the full reload they trigger is throttled to this interval
+const LIVE_RELOAD_INTERVAL_MS = 15000;
+// Violation rows the dashboard downloads: the latest activity (also the chart fallback) and evidence images
+const RECENT_VIOLATIONS_LIMIT = 100;
+const EVIDENCE_GALLERY_LIMIT = 8;
+
+// One tally from /api/violations/counters
+interface ViolationTally {
+  total: number;
+  by_type: Record<string, number>;
+  by_severity: Record<string, number>;
+  last_violation_at: string | null;
+}
 
 const AdminDashboard = () => {
   const navigate = useNavigate();
   const [examSessions, setExamSessions] = useState<any[]>([]);
   const [violations, setViolations] = useState<any[]>([]);
+  const [evidence, setEvidence] = useState<any[]>([]);
+  const [evidenceCount, setEvidenceCount] = useState(0);
   const [stats, setStats] = useState({
     totalSessions: 0,
     activeNow: 0,
@@ -24,6 +41,8 @@ const AdminDashboard = () => {
   });
   const [chartData, setChartData] = useState<any[]>([]);
   const [studentsWithViolations, setStudentsWithViolations] = useState<any[]>([]);
+  const reloadTimeoutRef = useRef<NodeJS.Timeout | null>(null);
+  const lastReloadRef = useRef(0);
 
   useEffect(() => {
     const isAuthenticated = sessionStorage.getItem('adminAuth');
@@ -35,30 +54,7 @@ const AdminDashboard = () => {
 
     loadDashboardData();
 
-    // Real-time subscriptions with better error handling
-    const violationSubscription = supabase
-      .channel('violations-channel-dashboard')
-      .on('postgres_changes', 
-        { event: '*', schema: 'public', table: 'violations' },
-        (payload) => {
-          console.log('Violation update in dashboard:', payload);
-          if (payload.eventType === 'INSERT') {
-            toast.error('New violation detected!', {
-              description: payload.new.violation_type?.replace(/_/g, ' ') || 'Unknown violation'
-            });
-          }
-          loadDashboardData();
-        }
-      )
-      .subscribe((status) => {
-        console.log('Violation subscription status:', status);
-        if (status === 'SUBSCRIBED') {
-          console.log('✅ Violations channel subscribed');
-        } else if (status === 'CHANNEL_ERROR') {
-          console.error('❌ Violations channel error');
-        }
-      });
-
+    // Exam status changes come from Supabase realtime; violations arrive through the backend live feed
     const examsSubscription = supabase
       .channel('exams-channel-dashboard')
       .on('postgres_changes',
@@ -77,17 +73,45 @@ const AdminDashboard = () => {
         }
       });
 
-    // Auto-refresh every 8 seconds as backup (reduced from 10 for faster updates)
-    const interval = setInterval(loadDashboardData, 8000);
-
     return () => {
-      clearInterval(interval);
-      supabase.removeChannel(violationSubscription);
+      if (reloadTimeoutRef.current) clearTimeout(reloadTimeoutRef.current);
       supabase.removeChannel(examsSubscription);
     };
   }, [navigate]);
 
+  const scheduleReload = useCallback(() => {
+    if (reloadTimeoutRef.current) return;
+    const wait = Math.max(0, lastReloadRef.current + LIVE_RELOAD_INTERVAL_MS - Date.now());
+    reloadTimeoutRef.current = setTimeout(() => {
+      reloadTimeoutRef.current = null;
+      loadDashboardData();
+    }, wait);
+  }, []);
+
+  const handleLiveDelta = useCallback((exams: Record<string, ExamDelta>) => {
+    const deltas = Object.values(exams);
+    const newCount = deltas.reduce((sum, delta) => sum + delta.new_violations, 0);
+    if (newCount === 0) return;
+
+    const firstType = deltas.find((delta) => delta.violations.length)?.violations[0]?.violation_type;
+    toast.error(newCount === 1 ? 'New violation detected!' : `${newCount} new violations detected!`, {
+      description: firstType?.replace(/_/g, ' ') || 'Unknown violation'
+    });
+    setStats((prev) => {
+      const totalViolations = prev.totalViolations + newCount;
+      return {
+        ...prev,
+        totalViolations,
+        avgViolationsPerStudent: prev.totalStudents > 0 ? Number((totalViolations / prev.totalStudents).toFixed(1)) : 0,
+      };
+    });
+    scheduleReload();
+  }, [scheduleReload]);
+
+  useAdminLiveFeed({ onDelta: handleLiveDelta });
+
   const loadDashboardData = async () => {
+    lastReloadRef.current = Date.now();
     try {
       const { data: examsData, error: examsError } = await supabase
         .from('exams')
@@ -120,18 +144,43 @@ const AdminDashboard = () => {
 
       if (examsError) throw examsError;
 
-      // Fetch all violations - don't require foreign key joins (allow NULLs)
-      const { data: violationsData } = await supabase
-        .from('violations')
-        .select('*')
-        .order('timestamp', { ascending: false });
-
-      setViolations(violationsData || []);
+      // Only the rows the page shows; counts come from the backend's rolling counters below
+      const [{ data: recentData }, { data: evidenceData, count: imageCount }] = await Promise.all([
+        supabase
+          .from('violations')
+          .select('*')
+          .order('timestamp', { ascending: false })
+          .limit(RECENT_VIOLATIONS_LIMIT),
+        supabase
+          .from('violations')
+          .select('*', { count: 'exact' })
+          .not('image_url', 'is', null)
+          .order('timestamp', { ascending: false })
+          .limit(EVIDENCE_GALLERY_LIMIT),
+      ]);
+
+      setViolations(recentData || []);
+      setEvidence(evidenceData || []);
+      setEvidenceCount(imageCount ?? evidenceData?.length ?? 0);
+
+      // Totals and per-student, per-type and per-severity breakdowns
+      let totalViolations = 0;
+      let studentTallies: Record<string, ViolationTally> = {};
+      try {
+        const backendUrl = import.meta.env.VITE_PROCTORING_API_URL || 'http://localhost:8001';
+        const countersResponse = await fetch(`${backendUrl}/api/violations/counters?include_students=true`);
+        if (!countersResponse.ok) throw new Error(`HTTP ${countersResponse.status}`);
+        const counters = await countersResponse.json();
+        totalViolations = counters.overall?.total ?? 0;
+        studentTallies = counters.students || {};
+      } catch (countersError) {
+        console.warn('Violation counters unavailable:', countersError);
+        toast.error("Violation counts unavailable - is the proctoring backend running?");
+      }
 
       // Calculate stats
       const activeCount = (examsData || []).filter(e => e.status === 'in_progress').length;
       const completedCount = (examsData || []).filter(e => e.status === 'completed').length;
-      const totalViolations = violationsData?.length || 0;
       const totalStudents = new Set((examsData || []).map(e => e.student_id)).size;
       
       const avgViolations = totalStudents > 0 ? (totalViolations / totalStudents).toFixed(1) : 0;
@@ -156,14 +205,34 @@ const AdminDashboard = () => {
       });
 
       setExamSessions(examsData || []);
-      prepareChartData(violationsData || []);
-      groupViolationsByStudent(examsData || [], violationsData || []);
+      await loadViolationTimeline(recentData || []);
+      groupViolationsByStudent(examsData || [], studentTallies);
 
     } catch (error) {
       console.error('Error loading dashboard data:', error);
     }
   };
 
+  // Last hour of violations in 1-minute buckets from the backend timeline
+  const loadViolationTimeline = async (violations: any[]) => {
+    try {
+      const backendUrl = import.meta.env.VITE_PROCTORING_API_URL || 'http://localhost:8001';
+      const start = new Date(Date.now() - 60 * 60 * 1000).toISOString();
+      const response = await fetch(
+        `${backendUrl}/api/violations/timeline?start=${encodeURIComponent(start)}&max_points=61`
+      );
+      if (!response.ok) throw new Error(`HTTP ${response.status}`);
+      const timeline = await response.json();
+      setChartData(timeline.points.map((point: { timestamp: string; count: number }) => ({
+        time: new Date(point.timestamp).toLocaleTimeString('en-US', { hour: '2-digit', minute: '2-digit', hour12: true }),
+        violations: point.count,
+      })));
+    } catch (timelineError) {
+      console.warn('Violation timeline unavailable, binning rows locally:', timelineError);
+      prepareChartData(violations);
+    }
+  };
+
   const prepareChartData = (violations: any[]) => {
     const hourlyData: { [key: string]: number } = {};
     
@@ -180,94 +249,50 @@ const AdminDashboard = () => {
     setChartData(data);
   };
 
-  const groupViolationsByStudent = (exams: any[], violations: any[]) => {
-    const studentMap: { [key: string]: any } = {};
-
-    // First, create a map of exam_id to exam for quick lookup
-    const examMap = new Map();
-    exams.forEach(exam => {
-      examMap.set(exam.id, exam);
-    });
-
-    // Group violations by matching them to exams first, then by student
-    violations.forEach(violation => {
-      const examId = violation.exam_id;
-      let exam = null;
-      let studentKey = null;
-      let studentName = null;
-      let studentId = null;
-      let subjectName = null;
-      let subjectCode = null;
-      
-      // Try to find the exam for this violation
-      if (examId) {
-        exam = examMap.get(examId);
-      }
-      
-      // If exam found, use exam's student info
-      if (exam && exam.students) {
-        studentName = exam.students.name;
-        studentId = exam.students.student_id || exam.students.id;
-        subjectName = exam.subject_name || exam.exam_templates?.subject_name || 'N/A';
-        subjectCode = exam.subject_code || exam.exam_templates?.subject_code || 'N/A';
-        // Use student name as key to consolidate all exams for same student
-        studentKey = studentName?.toLowerCase() || `student_${exam.students.id}`;
-      } else {
-        // Fallback to violation details
-        studentName = violation.details?.student_name || 'Unknown Student';
-        studentId = violation.details?.student_id || violation.student_id || 'unknown';
-        subjectName = violation.details?.subject_name || 'N/A';
-        subjectCode = violation.details?.subject_code || 'N/A';
-        // Use student name as key
-        studentKey = studentName?.toLowerCase() || `unknown_${studentId}`;
-      }
-      
-      // Initialize student entry if not exists
-      if (!studentMap[studentKey]) {
-        // Find all exams for this student to get the most complete info
-        const studentExams = exams.filter(e => 
-          (e.students?.name && studentName && e.students.name.toLowerCase() === studentName.toLowerCase()) ||
-          (e.students?.student_id && studentId && e.students.student_id === studentId) ||
-          (e.students?.id && violation.student_id && e.students.id === violation.student_id) ||
-          (e.id === examId && exam)
-        );
-        
-        // Sort exams: prefer ones with complete info (student_id and subject_name), then by most recent
-        const sortedExams = studentExams.sort((a, b) => {
-          const aComplete = (a.students?.student_id && a.exam_templates?.subject_name) ? 1 : 0;
-          const bComplete = (b.students?.student_id && b.exam_templates?.subject_name) ? 1 : 0;
-          if (aComplete !== bComplete) return bComplete - aComplete;
-          // If both complete or both incomplete, use most recent
-          const aTime = new Date(a.started_at || a.created_at || 0).getTime();
-          const bTime = new Date(b.started_at || b.created_at || 0).getTime();
-          return bTime - aTime;
-        });
-        
-        // Use the best exam (most complete info, most recent)
-        const bestExam = sortedExams[0] || exam;
-        
-        studentMap[studentKey] = {
-          name: bestExam?.students?.name || studentName,
-          studentId: bestExam?.students?.student_id || studentId || 'unknown',
-          id: bestExam?.students?.id || violation.student_id || 'unknown',
-          examId: bestExam?.id || examId || 'unknown',
-          violationCount: 0,
-          violationTypes: [],
-          violations: [],
-          subjectName: bestExam?.subject_name || bestExam?.exam_templates?.subject_name || subjectName || 'N/A',
-          subjectCode: bestExam?.subject_code || bestExam?.exam_templates?.subject_code || subjectCode || 'N/A',
+  const groupViolationsByStudent = (exams: any[], tallies: Record<string, ViolationTally>) => {
+    const students = Object.entries(tallies)
+      // violations saved without a student id cannot be attributed (or reported on)
+      .filter(([id, tally]) => id !== 'unknown' && tally.total > 0)
+      .map(([id, tally]) => {
+        // Prefer the exam with complete info (student_id and subject_name), then the most recent
+        const bestExam = exams
+          .filter(e => e.student_id === id)
+          .sort((a, b) => {
+            const aComplete = (a.students?.student_id && a.exam_templates?.subject_name) ? 1 : 0;
+            const bComplete = (b.students?.student_id && b.exam_templates?.subject_name) ? 1 : 0;
+            if (aComplete !== bComplete) return bComplete - aComplete;
+            const aTime = new Date(a.started_at || a.created_at || 0).getTime();
+            const bTime = new Date(b.started_at || b.created_at || 0).getTime();
+            return bTime - aTime;
+          })[0];
+
+        return {
+          name: bestExam?.students?.name || 'Unknown Student',
+          studentId: bestExam?.students?.student_id || id,
+          id,
+          examId: bestExam?.id || 'unknown',
+          violationCount: tally.total,
+          violationTypes: Object.keys(tally.by_type),
+          highSeverityCount: tally.by_severity.high || 0,
+          lastViolationAt: tally.last_violation_at || '',
+          subjectName: bestExam?.subject_name || bestExam?.exam_templates?.subject_name || 'N/A',
+          subjectCode: bestExam?.subject_code || bestExam?.exam_templates?.subject_code || 'N/A',
         };
-      }
-      
-      // Add violation to this student's collection
-      studentMap[studentKey].violationCount++;
-      if (!studentMap[studentKey].violationTypes.includes(violation.violation_type)) {
-        studentMap[studentKey].violationTypes.push(violation.violation_type);
-      }
-      studentMap[studentKey].violations.push(violation);
-    });
+      })
+      .sort((a, b) => b.lastViolationAt.localeCompare(a.lastViolationAt));
+
+    setStudentsWithViolations(students);
+  };
 
-    setStudentsWithViolations(Object.values(studentMap));
+  // A student's violation rows, fetched when a report or CSV export needs them
+  const loadStudentViolations = async (studentId: string) => {
+    const { data, error } = await supabase
+      .from('violations')
+      .select('*')
+      .eq('student_id', studentId)
+      .order('timestamp', { ascending: false });
+    if (error) throw error;
+    return data || [];
   };
 
   const handleLogout = () => {
@@ -278,7 +303,7 @@ const AdminDashboard = () => {
 
   const handleExportCSV = async (student: any) => {
     try {
-      const csvContent = await pdfGenerator.exportToCSV(student.violations);
+      const csvContent = await pdfGenerator.exportToCSV(await loadStudentViolations(student.id));
       const blob = new Blob([csvContent], { type: 'text/csv' });
       const url = window.URL.createObjectURL(blob);
       const a = document.createElement('a');
@@ -314,7 +339,7 @@ const AdminDashboard = () => {
       const pdfUrl = await pdfGenerator.generateStudentReport(
         student.name,
         student.studentId,
-        student.violations,
+        await loadStudentViolations(student.id),
         student.subjectName,
         student.subjectCode,
         examScore
@@ -339,15 +364,21 @@ const AdminDashboard = () => {
 
   const handleExportAllCSV = async () => {
     try {
-      const csvContent = await pdfGenerator.exportToCSV(violations);
-      const blob = new Blob([csvContent], { type: 'text/csv' });
-      const url = window.URL.createObjectURL(blob);
+      // Exports are admin endpoints, so the file is fetched with the admin token rather than opened as a link
+      const backendUrl = import.meta.env.VITE_PROCTORING_API_URL || 'http://localhost:8001';
+      const response = await fetch(`${backendUrl}/api/export/violations?format=csv&include_snapshots=true`, {
+        headers: { 'X-Admin-Token': import.meta.env.VITE_ADMIN_API_TOKEN || '' },
+      });
+      if (!response.ok) throw new Error(`HTTP ${response.status}`);
+      const url = window.URL.createObjectURL(await response.blob());
       const a = document.createElement('a');
       a.href = url;
       a.download = `all_violations_${Date.now()}.csv`;
       a.click();
+      window.URL.revokeObjectURL(url);
       toast.success("CSV exported");
     } catch (error) {
+      console.error('Error exporting violations:', error);
       toast.error("Failed to export");
     }
   };
@@ -371,7 +402,8 @@ const AdminDashboard = () => {
       'copy_paste': '📋',
       'window_blur': '💤',
       'eye_movement': '👁️',
-      'shoulder_movement': '🤸'
+      'shoulder_movement': '🤸',
+      'identity_mismatch': '🪪'
     };
     return icons[type] || '⚠️';
   };
@@ -526,42 +558,39 @@ const AdminDashboard = () => {
               <div className="flex items-center gap-2">
                 <Eye className="w-5 h-5" />
                 <h2 className="text-xl font-bold">Recent Violation Evidence Gallery</h2>
-                <Badge variant="secondary">{violations.filter(v => v.image_url).length} Images</Badge>
+                <Badge variant="secondary">{evidenceCount} Images</Badge>
               </div>
             </div>
             
             <div className="grid grid-cols-2 md:grid-cols-4 gap-4">
-              {violations
-                .filter(v => v.image_url)
-                .slice(0, 8)
-                .map((violation) => (
-                  <div key={violation.id} className="relative group">
-                    <div className="aspect-video rounded-lg overflow-hidden border-2 border-border hover:border-red-500 transition-colors">
-                      <img 
-                        src={violation.image_url} 
-                        alt={violation.violation_type}
-                        className="w-full h-full object-cover"
-                        onError={(e) => {
-                          e.currentTarget.src = '/placeholder.svg';
-                        }}
-                      />
-                    </div>
-                    <div className="absolute top-2 left-2">
-                      <Badge variant="destructive" className="text-xs">
-                        {getViolationTypeIcon(violation.violation_type)} {violation.violation_type.replace(/_/g, ' ')}
-                      </Badge>
-                    </div>
-                    <div className="mt-2">
-                      <p className="text-xs font-medium">{violation.details?.student_name || 'Unknown Student'}</p>
-                      <p className="text-xs text-muted-foreground">
-                        {formatDate(violation.timestamp)}
-                      </p>
-                    </div>
+              {evidence.map((violation) => (
+                <div key={violation.id} className="relative group">
+                  <div className="aspect-video rounded-lg overflow-hidden border-2 border-border hover:border-red-500 transition-colors">
+                    <img 
+                      src={violation.image_url} 
+                      alt={violation.violation_type}
+                      className="w-full h-full object-cover"
+                      onError={(e) => {
+                        e.currentTarget.src = '/placeholder.svg';
+                      }}
+                    />
+                  </div>
+                  <div className="absolute top-2 left-2">
+                    <Badge variant="destructive" className="text-xs">
+                      {getViolationTypeIcon(violation.violation_type)} {violation.violation_type.replace(/_/g, ' ')}
+                    </Badge>
                   </div>
-                ))}
+                  <div className="mt-2">
+                    <p className="text-xs font-medium">{violation.details?.student_name || 'Unknown Student'}</p>
+                    <p className="text-xs text-muted-foreground">
+                      {formatDate(violation.timestamp)}
+                    </p>
+                  </div>
+                </div>
+              ))}
             </div>
 
-            {violations.filter(v => v.image_url).length === 0 && (
+            {evidence.length === 0 && (
               <div className="text-center py-12 text-muted-foreground">
                 No violation evidence images found
               </div>
@@ -603,6 +632,11 @@ const AdminDashboard = () => {
                             {getViolationTypeIcon(type)} {type.replace(/_/g, ' ')}
                           </Badge>
                         ))}
+                        {student.highSeverityCount > 0 && (
+                          <Badge variant="destructive" className="text-xs">
+                            {student.highSeverityCount} high severity
+                          </Badge>
+                        )}
                       </div>
 
                       <div className="flex gap-2">
@@ -1,4 +1,4 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useCallback, useRef } from "react";
 import { useNavigate } from "react-router-dom";
 import { Shield, AlertTriangle, Users, ArrowLeft, RefreshCw, Camera } from "lucide-react";
 import { Button } from "@/components/ui/button";
@@ -6,6 +6,7 @@ import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import { Badge } from "@/components/ui/badge";
 import { toast } from "sonner";
 import { supabase } from "@/integrations/supabase/client";
+import { useAdminLiveFeed, ExamDelta } from "@/hooks/useAdminLiveFeed";
 
 interface ActiveExam {
   id: string;
@@ -44,7 +45,7 @@ const AdminMonitor = () => {
     loadActiveExams();
     loadRecentViolations();
 
-    // Set up real-time subscriptions with better error handling
+    // Exam status changes come from Supabase realtime; violations arrive through the backend live feed
     const examsChannel = supabase
       .channel('active-exams-monitor-live')
       .on('postgres_changes', 
@@ -67,39 +68,53 @@ const AdminMonitor = () => {
         }
       });
 
-    const violationsChannel = supabase
-      .channel('violations-monitor-live')
-      .on('postgres_changes', 
-        { event: '*', schema: 'public', table: 'violations' },
-        (payload) => {
-          console.log('Violation update in monitor:', payload);
-          if (payload.eventType === 'INSERT') {
-          toast.error(`New violation detected!`, {
-              description: payload.new.violation_type?.replace(/_/g, ' ') || 'Unknown violation',
-              duration: 3000
-          });
-          }
-          loadActiveExams();
-          loadRecentViolations();
-        }
-      )
-      .subscribe((status) => {
-        console.log('Violations monitor subscription status:', status);
-        if (status === 'SUBSCRIBED') {
-          console.log('✅ Violations monitor channel subscribed');
-        } else if (status === 'CHANNEL_ERROR') {
-          console.error('❌ Violations monitor channel error');
-        }
-      });
-
     // Real-time subscriptions handle updates, no need for auto-refresh interval
 
     return () => {
       supabase.removeChannel(examsChannel);
-      supabase.removeChannel(violationsChannel);
     };
   }, [navigate]);
 
+  // Violations and session status pushed by the backend, one coalesced delta per tick
+  const knownExamIdsRef = useRef<Set<string>>(new Set());
+  useEffect(() => {
+    knownExamIdsRef.current = new Set(activeExams.map((exam) => exam.id));
+  }, [activeExams]);
+
+  const handleLiveDelta = useCallback((exams: Record<string, ExamDelta>) => {
+    const deltas = Object.entries(exams);
+    const newViolations = deltas.flatMap(([, delta]) => delta.violations);
+    const newCount = deltas.reduce((sum, [, delta]) => sum + delta.new_violations, 0);
+
+    if (newCount > 0) {
+      toast.error(newCount === 1 ? 'New violation detected!' : `${newCount} new violations detected!`, {
+        description: newViolations[0]?.violation_type?.replace(/_/g, ' ') || 'Unknown violation',
+        duration: 3000
+      });
+      setActiveExams((prev) => prev.map((exam) => {
+        const delta = exams[exam.id];
+        return delta?.new_violations
+          ? { ...exam, violation_count: (exam.violation_count || 0) + delta.new_violations, last_activity: new Date().toISOString() }
+          : exam;
+      }));
+      setRecentViolations((prev) => [
+        ...newViolations.sort((a, b) => b.timestamp.localeCompare(a.timestamp)),
+        ...prev
+      ].slice(0, 10));
+    }
+
+    // A session joined an exam this page has not loaded yet
+    const unseenExam = deltas.some(([examId, delta]) =>
+      examId !== 'unknown' && !knownExamIdsRef.current.has(examId) &&
+      Object.values(delta.sessions).some((session) => session.status !== 'disconnected')
+    );
+    if (unseenExam) {
+      loadActiveExams();
+    }
+  }, []);
+
+  useAdminLiveFeed({ onDelta: handleLiveDelta });
+
   const loadActiveExams = async () => {
     try {
       const { data: examsData, error: examsError } = await supabase
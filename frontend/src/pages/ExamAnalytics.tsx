@@ -1,6 +1,6 @@
 import { useState, useEffect } from "react";
 import { useNavigate } from "react-router-dom";
-import { ArrowLeft, TrendingUp, Users, AlertTriangle, Award, RefreshCw, BarChart3 } from "lucide-react";
+import { ArrowLeft, TrendingUp, Users, AlertTriangle, Award, RefreshCw, BarChart3, ListChecks } from "lucide-react";
 import { Button } from "@/components/ui/button";
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import { Badge } from "@/components/ui/badge";
@@ -8,6 +8,7 @@ import { toast } from "sonner";
 import { supabase } from "@/integrations/supabase/client";
 import { BarChart, Bar, PieChart, Pie, Cell, XAxis, YAxis, CartesianGrid, Tooltip, Legend, ResponsiveContainer } from 'recharts';
 import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from "@/components/ui/table";
+import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "@/components/ui/select";
 
 interface AnalyticsData {
   totalStudents: number;
@@ -20,6 +21,32 @@ interface AnalyticsData {
   topViolators: { name: string; studentId: string; violations: number }[];
 }
 
+interface ItemOption {
+  answer: string;
+  count: number;
+  proportion: number;
+  is_key: boolean;
+}
+
+interface ItemStatistics {
+  question_number: number;
+  has_key: boolean;
+  difficulty: number | null;
+  discrimination: number | null;
+  point_biserial: number | null;
+  answered: number;
+  unanswered: number;
+  options: ItemOption[];
+}
+
+interface ItemAnalysis {
+  exam_count: number;
+  cronbach_alpha: number | null;
+  items: ItemStatistics[];
+}
+
+const formatStat = (value: number | null) => (value === null ? '—' : value.toFixed(2));
+
 const COLORS = ['hsl(var(--destructive))', 'hsl(var(--warning))', 'hsl(var(--primary))', 'hsl(var(--success))', 'hsl(var(--secondary))'];
 
 const ExamAnalytics = () => {
@@ -35,134 +62,36 @@ const ExamAnalytics = () => {
     topViolators: [],
   });
   const [loading, setLoading] = useState(true);
+  const [templates, setTemplates] = useState<{ id: string; template_name: string; subject_name: string }[]>([]);
+  const [selectedTemplate, setSelectedTemplate] = useState<string>("");
+  const [itemAnalysis, setItemAnalysis] = useState<ItemAnalysis | null>(null);
 
   const loadAnalytics = async () => {
     try {
       setLoading(true);
 
-      // Fetch all exams with student info
-      const { data: examsData, error: examsError } = await supabase
-        .from('exams')
-        .select(`
-          *,
-          students (
-            name,
-            student_id,
-            email
-          )
-        `);
-
-      if (examsError) throw examsError;
-
-      // Fetch all violations
-      const { data: violationsData, error: violationsError } = await supabase
-        .from('violations')
-        .select('*');
-
-      if (violationsError) throw violationsError;
-
-      // Fetch all answers for MCQ exams
-      const { data: answersData, error: answersError } = await supabase
-        .from('exam_answers')
-        .select('*');
-
-      if (answersError) throw answersError;
-
-      // Fetch all questions
-      const { data: questionsData, error: questionsError } = await supabase
-        .from('exam_questions')
-        .select('*');
-
-      if (questionsError) throw questionsError;
-
-      // Calculate statistics
-      const totalStudents = new Set(examsData?.map(e => e.student_id)).size;
-      const totalExams = examsData?.length || 0;
-      const completedExams = examsData?.filter(e => e.status === 'completed').length || 0;
-
-      // Calculate scores for MCQ questions
-      const scores: number[] = [];
-      const examScores = new Map<string, { correct: number; total: number }>();
-
-      examsData?.forEach(exam => {
-        if (!exam.exam_template_id) return;
-
-        const examAnswers = answersData?.filter(a => a.exam_id === exam.id) || [];
-        const examQuestions = questionsData?.filter(q => q.exam_template_id === exam.exam_template_id && q.question_type === 'mcq') || [];
-
-        if (examQuestions.length === 0) return;
-
-        let correct = 0;
-        let total = 0;
-
-        examAnswers.forEach(answer => {
-          const question = examQuestions.find(q => q.question_number === answer.question_number);
-          if (question && question.question_type === 'mcq') {
-            total++;
-            if (answer.answer?.trim() === question.correct_answer?.trim()) {
-              correct++;
-            }
-          }
-        });
-
-        if (total > 0) {
-          const score = Math.round((correct / total) * 100);
-          scores.push(score);
-          examScores.set(exam.id, { correct, total });
-        }
-      });
-
-      const avgScore = scores.length > 0 ? Math.round(scores.reduce((a, b) => a + b, 0) / scores.length) : 0;
-
-      // Score distribution
-      const scoreDistribution = [
-        { range: '0-20%', count: scores.filter(s => s >= 0 && s < 20).length },
-        { range: '20-40%', count: scores.filter(s => s >= 20 && s < 40).length },
-        { range: '40-60%', count: scores.filter(s => s >= 40 && s < 60).length },
-        { range: '60-80%', count: scores.filter(s => s >= 60 && s < 80).length },
-        { range: '80-100%', count: scores.filter(s => s >= 80 && s <= 100).length },
-      ];
-
-      // Violations by type
-      const violationCounts: { [key: string]: number } = {};
-      violationsData?.forEach(v => {
-        violationCounts[v.violation_type] = (violationCounts[v.violation_type] || 0) + 1;
-      });
-
-      const violationsByType = Object.entries(violationCounts)
-        .map(([type, count]) => ({ type: type.replace(/_/g, ' '), count }))
-        .sort((a, b) => b.count - a.count)
-        .slice(0, 5);
-
-      // Top violators
-      const violatorMap = new Map<string, { name: string; studentId: string; violations: number }>();
-      violationsData?.forEach(v => {
-        const exam = examsData?.find(e => e.id === v.exam_id);
-        if (exam && exam.students) {
-          const key = v.student_id;
-          const current = violatorMap.get(key) || { 
-            name: exam.students.name, 
-            studentId: exam.students.student_id || exam.students.email, 
-            violations: 0 
-          };
-          current.violations++;
-          violatorMap.set(key, current);
-        }
-      });
-
-      const topViolators = Array.from(violatorMap.values())
-        .sort((a, b) => b.violations - a.violations)
-        .slice(0, 5);
+      // Aggregates are computed (and briefly cached) server-side
+      const backendUrl = import.meta.env.VITE_PROCTORING_API_URL || 'http://localhost:8001';
+      const response = await fetch(`${backendUrl}/api/analytics/summary?top=5`);
+      if (!response.ok) throw new Error(`Analytics request failed: ${response.status}`);
+      const summary = await response.json();
 
       setAnalytics({
-        totalStudents,
-        totalExams,
-        completedExams,
-        avgScore,
-        totalViolations: violationsData?.length || 0,
-        violationsByType,
-        scoreDistribution,
-        topViolators,
+        totalStudents: summary.total_students,
+        totalExams: summary.total_exams,
+        completedExams: summary.completed_exams,
+        avgScore: summary.avg_score,
+        totalViolations: summary.total_violations,
+        violationsByType: summary.violations_by_type.map((v: { type: string; count: number }) => ({
+          type: v.type.replace(/_/g, ' '),
+          count: v.count,
+        })),
+        scoreDistribution: summary.score_distribution,
+        topViolators: summary.top_violators.map((v: { name: string; student_id: string; roll_number?: string; email?: string; violations: number }) => ({
+          name: v.name,
+          studentId: v.roll_number || v.email || v.student_id,
+          violations: v.violations,
+        })),
       });
 
       setLoading(false);
@@ -173,6 +102,31 @@ const ExamAnalytics = () => {
     }
   };
 
+  const loadItemAnalysis = async (templateId: string) => {
+    try {
+      // Computed server-side over the full answer matrix; cached until new submissions arrive
+      const backendUrl = import.meta.env.VITE_PROCTORING_API_URL || 'http://localhost:8001';
+      const response = await fetch(`${backendUrl}/api/analytics/items?exam_template_id=${encodeURIComponent(templateId)}`);
+      if (!response.ok) throw new Error(`Item analysis request failed: ${response.status}`);
+      setItemAnalysis(await response.json());
+    } catch (error) {
+      console.error('Error loading item analysis:', error);
+      toast.error("Failed to load item analysis");
+    }
+  };
+
+  useEffect(() => {
+    supabase
+      .from('exam_templates')
+      .select('id, template_name, subject_name')
+      .order('created_at', { ascending: false })
+      .then(({ data }) => setTemplates(data || []));
+  }, []);
+
+  useEffect(() => {
+    if (selectedTemplate) loadItemAnalysis(selectedTemplate);
+  }, [selectedTemplate]);
+
   useEffect(() => {
     const isAuthenticated = sessionStorage.getItem('adminAuth');
     if (!isAuthenticated) {
@@ -422,6 +376,80 @@ const ExamAnalytics = () => {
             )}
           </CardContent>
         </Card>
+
+        {/* Item Analysis */}
+        <Card className="mt-8">
+          <CardHeader>
+            <div className="flex items-center justify-between gap-4">
+              <CardTitle className="flex items-center gap-2">
+                <ListChecks className="w-5 h-5" />
+                Item Analysis
+              </CardTitle>
+              <div className="w-72">
+                <Select value={selectedTemplate} onValueChange={setSelectedTemplate}>
+                  <SelectTrigger>
+                    <SelectValue placeholder="Select an exam template" />
+                  </SelectTrigger>
+                  <SelectContent>
+                    {templates.map((template) => (
+                      <SelectItem key={template.id} value={template.id}>
+                        {template.template_name} ({template.subject_name})
+                      </SelectItem>
+                    ))}
+                  </SelectContent>
+                </Select>
+              </div>
+            </div>
+          </CardHeader>
+          <CardContent>
+            {!itemAnalysis ? (
+              <div className="text-center py-8 text-muted-foreground">
+                <p>Select a template to see per-question statistics</p>
+              </div>
+            ) : (
+              <>
+                <p className="text-sm text-muted-foreground mb-4">
+                  {itemAnalysis.exam_count} completed exams · Reliability (α): {formatStat(itemAnalysis.cronbach_alpha)}
+                </p>
+                <Table>
+                  <TableHeader>
+                    <TableRow>
+                      <TableHead className="w-16">Q#</TableHead>
+                      <TableHead className="text-right">Difficulty (p)</TableHead>
+                      <TableHead className="text-right">Discrimination</TableHead>
+                      <TableHead className="text-right">Point-biserial</TableHead>
+                      <TableHead>Answer choices</TableHead>
+                    </TableRow>
+                  </TableHeader>
+                  <TableBody>
+                    {itemAnalysis.items.map((item) => (
+                      <TableRow key={item.question_number}>
+                        <TableCell className="font-bold">{item.question_number}</TableCell>
+                        <TableCell className="text-right">{formatStat(item.difficulty)}</TableCell>
+                        <TableCell className="text-right">
+                          {item.discrimination !== null && item.discrimination < 0.2 ? (
+                            <Badge variant="outline" className="border-destructive text-destructive">{formatStat(item.discrimination)}</Badge>
+                          ) : (
+                            formatStat(item.discrimination)
+                          )}
+                        </TableCell>
+                        <TableCell className="text-right">{formatStat(item.point_biserial)}</TableCell>
+                        <TableCell className="text-muted-foreground">
+                          {item.options.slice(0, 4).map((option) => (
+                            <span key={option.answer} className={option.is_key ? 'font-semibold text-success mr-3' : 'mr-3'}>
+                              {option.answer}: {Math.round(option.proportion * 100)}%
+                            </span>
+                          ))}
+                          {item.unanswered > 0 && <span>blank: {item.unanswered}</span>}
+                        </TableCell>
+                      </TableRow>
+                    ))}
+                  </TableBody>
+                </Table>
+              </>
+            )}
+          </CardContent>
+        </Card>
       </div>
     </div>
   );
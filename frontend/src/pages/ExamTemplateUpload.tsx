@@ -179,6 +179,21 @@ const ExamTemplateUpload = () => {
 
       if (questionsError) throw questionsError;
 
+      // Drop any answer key the grading service cached for this template
+      try {
+        const backendUrl = import.meta.env.VITE_PROCTORING_API_URL || 'http://localhost:8001';
+        await fetch(`${backendUrl}/api/answer-keys/invalidate`, {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'application/json',
+            'X-Admin-Token': import.meta.env.VITE_ADMIN_API_TOKEN || '',
+          },
+          body: JSON.stringify({ exam_template_id: templateData.id })
+        });
+      } catch (invalidateError) {
+        console.warn('Could not invalidate cached answer key:', invalidateError);
+      }
+
       toast.success(`Template "${templateName}" uploaded with ${questions.length} questions for ${subjectName}!`);
       
       setTimeout(() => {
@@ -35,7 +35,7 @@ const StudentExam = () => {
   const analyserRef = useRef<AnalyserNode | null>(null);
 
   // WebSocket connection for Python backend
-  const { isConnected: wsConnected, sendFrame, sendAudioLevel, sendBrowserActivity } = useProctoringWebSocket({
+  const { isConnected: wsConnected, captureFrame, sendFrame, sendAudioLevel, sendBrowserActivity } = useProctoringWebSocket({
     sessionId: examId || '',
     examId: examId || '',
     studentId: studentData?.id || '',
@@ -337,22 +337,14 @@ const StudentExam = () => {
 
       try {
         console.log('📸 Capturing frame...');
-        // Capture frame from video
-        const canvas = document.createElement('canvas');
-        canvas.width = videoRef.current.videoWidth;
-        canvas.height = videoRef.current.videoHeight;
+        // Capture frame from video, scaled and encoded per the backend's capture profile
+        const snapshot = captureFrame(videoRef.current);
         
         // Skip if video hasn't loaded yet
-        if (canvas.width === 0 || canvas.height === 0) {
+        if (!snapshot) {
           console.warn('⚠️ Video not ready yet (dimensions 0x0)');
           return;
         }
-        
-        const ctx = canvas.getContext('2d');
-        if (!ctx) return;
-        
-        ctx.drawImage(videoRef.current, 0, 0);
-        const snapshot = canvas.toDataURL('image/jpeg', 0.8);
         console.log(`📷 Frame captured: ${snapshot.substring(0, 50)}... (${snapshot.length} bytes)`);
         
         // Get audio level and normalize to 0-100 scale
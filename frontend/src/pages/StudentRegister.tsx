@@ -204,6 +204,30 @@ const StudentRegister = () => {
     }
   };
 
+  // Store the face embedding used to verify identity before and during the exam.
+  // Registration still succeeds if the identity service is unavailable; verification
+  // then falls back to the uploaded photo.
+  const registerFaceIdentity = async (studentId: string) => {
+    try {
+      const apiUrl = import.meta.env.VITE_PROCTORING_API_URL || 'http://localhost:8001';
+      const response = await fetch(`${apiUrl}/api/identity/register`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ student_id: studentId, frame_base64: faceImageUrl })
+      });
+      if (!response.ok) {
+        console.warn('⚠️ Face identity registration unavailable:', response.status, await response.text());
+        return;
+      }
+      const result = await response.json();
+      if (!result.success) {
+        console.warn('⚠️ Face identity not registered:', result.message);
+      }
+    } catch (error) {
+      console.warn('⚠️ Face identity registration failed:', error);
+    }
+  };
+
   const handleRegister = async (e: React.FormEvent) => {
     e.preventDefault();
     
@@ -257,6 +281,8 @@ const StudentRegister = () => {
         .update({ face_image_url: faceUrl })
         .eq('id', studentData.id);
 
+      await registerFaceIdentity(studentData.id);
+
       // Create exam session
       const { error: examError } = await supabase
         .from('exams')
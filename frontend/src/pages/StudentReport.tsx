@@ -6,7 +6,6 @@ import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import { Badge } from "@/components/ui/badge";
 import { Separator } from "@/components/ui/separator";
 import { toast } from "sonner";
-import { supabase } from "@/integrations/supabase/client";
 import { pdfGenerator } from "@/utils/pdfGenerator";
 import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from "@/components/ui/table";
 
@@ -80,98 +79,17 @@ const StudentReport = () => {
     try {
       setLoading(true);
 
-      const { data: studentData, error: studentError } = await supabase
-        .from('students')
-        .select('id, name, email, student_id, subject_code, face_image_url, created_at')
-        .eq('id', studentId)
-        .single();
-
-      if (studentError) throw studentError;
-
-      const { data: examData, error: examError } = await supabase
-        .from('exams')
-        .select(`
-          *,
-          exam_templates (
-            subject_name,
-            subject_code,
-            duration_minutes
-          )
-        `)
-        .eq('id', examId)
-        .single();
-
-      if (examError) throw examError;
-
-      const { data: answersData, error: answersError } = await supabase
-        .from('exam_answers')
-        .select('*')
-        .eq('exam_id', examId)
-        .order('question_number');
-
-      if (answersError) throw answersError;
-
-      let questionsData = null;
-      if (examData.exam_template_id) {
-        const { data, error: questionsError } = await supabase
-          .from('exam_questions')
-          .select('*')
-          .eq('exam_template_id', examData.exam_template_id)
-          .order('question_number');
-
-        if (questionsError) throw questionsError;
-        questionsData = data;
-      }
-
-      const answersWithQuestions = (answersData || []).map(answer => {
-        const question = questionsData?.find(q => q.question_number === answer.question_number);
-        return {
-          question_number: answer.question_number,
-          question_text: question?.question_text || 'Question not found',
-          question_type: question?.question_type || 'short_answer',
-          answer: answer.answer || 'Not answered',
-          correct_answer: question?.correct_answer,
-          points: question?.points || 0,
-          options: question?.options,
-        };
-      });
-
-      let violationsData = [];
-
-      try {
-        const { data: violationsByExam } = await supabase
-          .from('violations')
-          .select('*')
-          .eq('exam_id', examId)
-          .order('timestamp');
-
-        const { data: violationsByStudent } = await supabase
-          .from('violations')
-          .select('*')
-          .eq('student_id', studentId)
-          .order('timestamp');
-
-        const { data: violationsByName } = await supabase
-          .from('violations')
-          .select('*')
-          .ilike('details->>student_name', `%${studentData.name}%`)
-          .order('timestamp');
-
-        const allViolationsMap = new Map();
-        
-        [...(violationsByExam || []), ...(violationsByStudent || []), ...(violationsByName || [])]
-          .forEach(v => {
-            if (v && v.id) {
-              allViolationsMap.set(v.id, v);
-            }
-          });
-        
-        violationsData = Array.from(allViolationsMap.values());
-        
-      } catch (error) {
-        console.error('Error fetching violations:', error);
-        violationsData = [];
+      // Student, exam, graded answers and violations are aggregated by the backend in one call
+      const backendUrl = import.meta.env.VITE_PROCTORING_API_URL || 'http://localhost:8001';
+      const response = await fetch(
+        `${backendUrl}/api/students/${encodeURIComponent(studentId!)}/report?exam_id=${encodeURIComponent(examId!)}`
+      );
+      if (!response.ok) {
+        throw new Error(`Report request failed: HTTP ${response.status}`);
       }
+      const report = await response.json();
+      const studentData = report.student;
+      const examData = report.exams[0];
 
       const finalStudentData = {
         id: studentData.id,
@@ -184,20 +102,28 @@ const StudentReport = () => {
         student: finalStudentData,
         exam: {
           id: examData.id,
-          subject_code: examData.subject_code || examData.exam_templates?.subject_code || 'N/A',
+          subject_code: examData.subject_code || 'N/A',
           started_at: examData.started_at,
           completed_at: examData.completed_at,
           status: examData.status,
-          subject_name: (examData as any).subject_name || examData.exam_templates?.subject_name || 'N/A',
-          duration_minutes: examData.exam_templates?.duration_minutes || examData.duration_minutes || 0,
-          total_score: (examData as any).total_score || 0,
-          max_score: (examData as any).max_score || 0,
-          graded: (examData as any).graded || false,
-          percentage: (examData as any).max_score > 0 ? Math.round(((examData as any).total_score / (examData as any).max_score) * 100) : 0,
-          grade_letter: (examData as any).grade_letter || null
+          subject_name: examData.subject_name || 'N/A',
+          duration_minutes: examData.duration_minutes || 0,
+          total_score: examData.total_score || 0,
+          max_score: examData.max_score || 0,
+          graded: examData.graded || false,
+          percentage: examData.max_score > 0 ? Math.round((examData.total_score / examData.max_score) * 100) : 0,
+          grade_letter: examData.grade_letter || null
         },
-        answers: answersWithQuestions,
-        violations: violationsData || [],
+        answers: report.answers.map((answer: any) => ({
+          question_number: answer.question_number,
+          question_text: answer.question_text || 'Question not found',
+          question_type: answer.question_type || 'short_answer',
+          answer: answer.answer || 'Not answered',
+          correct_answer: answer.correct_answer,
+          points: answer.points || 0,
+          options: answer.options,
+        })),
+        violations: report.violations || [],
       });
 
       setLoading(false);
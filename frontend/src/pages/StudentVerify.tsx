@@ -1,10 +1,15 @@
 import { useState, useEffect, useRef } from "react";
 import { useNavigate } from "react-router-dom";
-import { Shield, Camera, Mic, Sun, User, ArrowRight } from "lucide-react";
+import { Shield, Camera, Mic, Sun, User, UserCheck, ArrowRight } from "lucide-react";
 import { Button } from "@/components/ui/button";
 import { Card, CardContent } from "@/components/ui/card";
 import { Progress } from "@/components/ui/progress";
 import { toast } from "sonner";
+import { captureFrame, fetchCaptureProfile } from "@/utils/frameCapture";
+
+// Head pose calibration burst: frames captured back to back and sent in one request
+const CALIBRATION_BURST_FRAMES = 8;
+const CALIBRATION_BURST_INTERVAL_MS = 120;
 
 const StudentVerify = () => {
   const navigate = useNavigate();
@@ -14,6 +19,7 @@ const StudentVerify = () => {
     microphone: { status: 'waiting', message: 'Waiting...' },
     lighting: { status: 'waiting', message: 'Waiting...' },
     face: { status: 'waiting', message: 'Waiting...' },
+    identity: { status: 'waiting', message: 'Waiting...' },
   });
   const [verificationStarted, setVerificationStarted] = useState(false);
   const [progress, setProgress] = useState(0);
@@ -131,15 +137,11 @@ const StudentVerify = () => {
           console.log('Starting proctoring service verification...');
           console.log('Proctoring API URL:', PROCTORING_API_URL);
           
-          // Capture frame from video
+          // Capture frame from video, scaled and encoded per the backend's capture profile
+          const captureProfile = await fetchCaptureProfile(PROCTORING_API_URL);
           const canvas = document.createElement('canvas');
-          canvas.width = videoRef.current.videoWidth;
-          canvas.height = videoRef.current.videoHeight;
-          const ctx = canvas.getContext('2d');
-          if (!ctx) throw new Error('Failed to get canvas context');
-          
-          ctx.drawImage(videoRef.current, 0, 0);
-          const frameBase64 = canvas.toDataURL('image/jpeg');
+          const frameBase64 = captureFrame(videoRef.current, captureProfile, canvas);
+          if (!frameBase64) throw new Error('Camera is not ready yet');
           
           // Call proctoring service environment check
           console.log('Calling environment check at:', `${PROCTORING_API_URL}/api/environment-check`);
@@ -184,12 +186,55 @@ const StudentVerify = () => {
           }));
           setProgress(70);
 
-          // Calibration: Get head pose for future reference
+          // Identity: compare the live face with the one registered for this student
+          let identityMismatch = false;
+          if (envResult.face_detected) {
+            setChecks(prev => ({ ...prev, identity: { status: 'checking', message: 'Comparing with registration photo...' } }));
+            try {
+              const identityResponse = await fetch(`${PROCTORING_API_URL}/api/identity/verify`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ student_id: studentData.id, frame_base64: frameBase64 })
+              });
+              if (identityResponse.ok) {
+                const identity = await identityResponse.json();
+                console.log('Identity check result:', identity);
+                identityMismatch = identity.success && !identity.match;
+                setChecks(prev => ({
+                  ...prev,
+                  identity: {
+                    status: identity.success ? (identity.match ? 'success' : 'error') : 'warning',
+                    message: identity.success
+                      ? (identity.match ? 'Identity confirmed' : 'Face does not match your registration photo')
+                      : identity.message
+                  }
+                }));
+              } else {
+                // No registered face or service without the recognition model: don't block the exam
+                console.warn('Identity check unavailable:', identityResponse.status);
+                setChecks(prev => ({ ...prev, identity: { status: 'warning', message: 'Identity check unavailable' } }));
+              }
+            } catch (error) {
+              console.warn('Identity check failed:', error);
+              setChecks(prev => ({ ...prev, identity: { status: 'warning', message: 'Identity check unavailable' } }));
+            }
+          }
+
+          // Calibration: Get head pose for future reference from a short burst of frames
+          // (one request; the backend takes the median pose and rejects unstable bursts)
           if (envResult.face_detected) {
-            const calibrationResponse = await fetch(`${PROCTORING_API_URL}/api/calibrate`, {
+            const calibrationFrames = [frameBase64];
+            for (let i = 1; i < CALIBRATION_BURST_FRAMES; i++) {
+              await new Promise(resolve => setTimeout(resolve, CALIBRATION_BURST_INTERVAL_MS));
+              const frame = videoRef.current && captureFrame(videoRef.current, captureProfile, canvas);
+              if (!frame) break;
+              calibrationFrames.push(frame);
+            }
+            
+            const calibrationResponse = await fetch(`${PROCTORING_API_URL}/api/calibrate/burst`, {
               method: 'POST',
               headers: { 'Content-Type': 'application/json' },
-              body: JSON.stringify({ frame_base64: frameBase64 })
+              body: JSON.stringify({ frames: calibrationFrames })
             });
             
             if (calibrationResponse.ok) {
@@ -201,6 +246,9 @@ const StudentVerify = () => {
                   yaw: calibration.yaw
                 }));
                 toast.success('Proctoring system ready!');
+              } else {
+                console.warn('Calibration rejected:', calibration);
+                toast.warning(calibration.message || 'Calibration failed - please hold still and try again');
               }
             }
           }
@@ -226,7 +274,16 @@ const StudentVerify = () => {
             return; // Block exam start
           }
           
-          // Check 3: Lighting MUST be adequate (STRICT - NO LONGER JUST WARNING)
+          // Check 3: The face MUST match the registered student
+          if (identityMismatch) {
+            toast.error("Your face does not match the registration photo. Please make sure the registered student is taking the exam.", {
+              duration: 6000
+            });
+            setVerificationStarted(false);
+            return; // Block exam start
+          }
+          
+          // Check 4: Lighting MUST be adequate (STRICT - NO LONGER JUST WARNING)
           if (!envResult.lighting_ok) {
             toast.error("Poor lighting detected! Please improve lighting conditions and try verification again.", {
               description: "Move to a well-lit area or turn on lights",
@@ -245,7 +302,8 @@ const StudentVerify = () => {
           setChecks(prev => ({ 
             ...prev, 
             lighting: { status: 'error', message: 'Unable to verify - Service unavailable' },
-            face: { status: 'error', message: 'Unable to verify - Service unavailable' }
+            face: { status: 'error', message: 'Unable to verify - Service unavailable' },
+            identity: { status: 'error', message: 'Unable to verify - Service unavailable' }
           }));
           
           setProgress(60);
@@ -346,6 +404,14 @@ const StudentVerify = () => {
                     <p className="text-sm text-muted-foreground">{checks.face.message}</p>
                   </div>
                 </div>
+
+                <div className="flex items-center gap-3">
+                  {getStatusIcon(checks.identity.status, UserCheck)}
+                  <div className="flex-1">
+                    <p className="font-semibold">Identity</p>
+                    <p className="text-sm text-muted-foreground">{checks.identity.message}</p>
+                  </div>
+                </div>
               </div>
 
               {!verificationStarted && (
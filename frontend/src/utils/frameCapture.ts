@@ -0,0 +1,60 @@
+// Frame encoding settings advertised by the proctoring backend (capture_profile message
+// on WebSocket connect, or GET /api/capture-profile for the HTTP-only pages)
+export interface CaptureProfile {
+  width: number;
+  jpegQuality: number;
+  grayscale: boolean;
+}
+
+// Used until the backend has answered, and against backends that do not advertise a profile
+export const DEFAULT_CAPTURE_PROFILE: CaptureProfile = {
+  width: 640,
+  jpegQuality: 0.7,
+  grayscale: false,
+};
+
+export const parseCaptureProfile = (data: any): CaptureProfile => ({
+  width: Number(data?.width) > 0 ? Number(data.width) : DEFAULT_CAPTURE_PROFILE.width,
+  jpegQuality: Number(data?.jpeg_quality) > 0 && Number(data?.jpeg_quality) <= 1
+    ? Number(data.jpeg_quality)
+    : DEFAULT_CAPTURE_PROFILE.jpegQuality,
+  grayscale: Boolean(data?.grayscale),
+});
+
+export const fetchCaptureProfile = async (apiUrl: string): Promise<CaptureProfile> => {
+  try {
+    const response = await fetch(`${apiUrl}/api/capture-profile`);
+    if (response.ok) {
+      return parseCaptureProfile(await response.json());
+    }
+  } catch (error) {
+    console.warn('⚠️ Capture profile unavailable, using defaults:', error);
+  }
+  return DEFAULT_CAPTURE_PROFILE;
+};
+
+/**
+ * Draw the current video frame scaled down to the profile width (never up) and
+ * encode it as a JPEG data URL. Pass the same canvas on every call to avoid
+ * allocating one per frame. Returns null while the video has no dimensions yet.
+ */
+export const captureFrame = (
+  video: HTMLVideoElement,
+  profile: CaptureProfile,
+  canvas: HTMLCanvasElement = document.createElement('canvas'),
+): string | null => {
+  const { videoWidth, videoHeight } = video;
+  if (videoWidth === 0 || videoHeight === 0) return null;
+
+  const scale = Math.min(1, profile.width / videoWidth);
+  const width = Math.round(videoWidth * scale);
+  const height = Math.round(videoHeight * scale);
+  if (canvas.width !== width) canvas.width = width;
+  if (canvas.height !== height) canvas.height = height;
+
+  const ctx = canvas.getContext('2d');
+  if (!ctx) return null;
+  ctx.filter = profile.grayscale ? 'grayscale(1)' : 'none';
+  ctx.drawImage(video, 0, 0, width, height);
+  return canvas.toDataURL('image/jpeg', profile.jpegQuality);
+};
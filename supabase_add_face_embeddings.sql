@@ -0,0 +1,20 @@
+-- =====================================================
+-- ADD FACE EMBEDDINGS FOR IDENTITY VERIFICATION
+-- =====================================================
+
+-- 128-float SFace embedding of the registration photo (unit length).
+-- Written by the backend at /api/identity/register, or backfilled from
+-- face_image_url the first time a student without one is verified.
+ALTER TABLE public.students
+ADD COLUMN IF NOT EXISTS face_embedding REAL[];
+
+-- Add comment for documentation
+COMMENT ON COLUMN public.students.face_embedding IS 'SFace face embedding (128 floats, L2-normalised) used for identity verification';
+
+-- =====================================================
+-- MIGRATION COMPLETE
+-- =====================================================
+-- Summary:
+-- 1. Added students.face_embedding
+
+SELECT 'Face embedding column added successfully!' AS status;
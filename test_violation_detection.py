@@ -129,7 +129,7 @@ def test_violation_types_constraint():
         'no_person', 'no_face', 'phone_detected', 'phone', 'book_detected',
         'object_detected', 'object', 'tab_switch', 'copy_paste', 
         'excessive_noise', 'audio_violation', 'audio_noise',
-        'eye_movement', 'shoulder_movement', 'window_blur'
+        'eye_movement', 'shoulder_movement', 'window_blur', 'identity_mismatch'
     ]
     
     print(f"\n🔍 Testing {len(allowed_types)} violation types...")